@@ -4,6 +4,7 @@ import os
 
 class Config:
     DB_NAME = "support_tickets.db"
+    JOURNAL_MODE = "WAL"
     OUTPUT_DIR = "out"
     CONSOLE_WIDTH = 80
 
@@ -21,11 +22,119 @@ class Config:
         'low': '!'
     }
 
+    # Порядок приоритетов (меньше - важнее)
+    PRIORITY_ORDER = {
+        'high': 1,
+        'medium': 2,
+        'low': 3
+    }
+
     # Ширины колонок для таблицы
     COLUMN_WIDTHS = {
         'id': 6,
         'title': 25,
         'status': 12,
         'priority': 10,
-        'author': 25
-    }
\ No newline at end of file
+        'author': 25,
+        'replies': 6,
+        'last_reply': 13
+    }
+
+    # Колонки с датами (хранятся как INTEGER - микросекунды от начала эпохи)
+    TIMESTAMP_COLUMNS = ('created_at', 'updated_at')
+
+    # Количество строк таблицы, накапливаемых в буфере перед записью в консоль
+    RENDER_CHUNK_ROWS = 1000
+
+    # Количество назначений, фиксируемых диспетчером в одной транзакции
+    DISPATCH_BATCH_SIZE = 500
+
+    # Архивация: заявки в конечных статусах старше ARCHIVE_AFTER_DAYS дней
+    # переносятся в tickets_archive пачками по ARCHIVE_BATCH_SIZE
+    ARCHIVE_STATUSES = ('closed', 'resolved')
+    ARCHIVE_AFTER_DAYS = 90
+    ARCHIVE_BATCH_SIZE = 1000
+
+    # Шардирование заявок: при SHARD_COUNT > 1 заявки хранятся в SHARD_COUNT
+    # файлах по ключу created_by, пользователи - в общей базе DB_NAME
+    SHARD_COUNT = 1
+    SHARD_DB_TEMPLATE = "{base}_shard{index}{ext}"
+
+    # Журнал изменений: записи старше CHANGE_LOG_RETENTION_DAYS удаляются при
+    # компактификации даже непрочитанными; чтение и удаление идут пачками
+    CHANGE_LOG_RETENTION_DAYS = 30
+    CHANGE_LOG_BATCH_SIZE = 1000
+
+    # Комментариев на одной странице обсуждения заявки
+    COMMENTS_PAGE_SIZE = 20
+
+    # Поиск похожих заявок (MinHash + LSH): сигнатура из DUPLICATE_NUM_PERM
+    # значений делится на DUPLICATE_BANDS полос; в индексе - только заявки
+    # в статусах DUPLICATE_INDEX_STATUSES
+    DUPLICATE_INDEX_STATUSES = ('open', 'in_progress')
+    DUPLICATE_SHINGLE_SIZE = 5
+    DUPLICATE_NUM_PERM = 64
+    DUPLICATE_BANDS = 16
+    DUPLICATE_THRESHOLD = 0.5
+    DUPLICATE_MAX_CANDIDATES = 5
+    DUPLICATE_TEXT_LIMIT = 2000
+
+    # SLA-аналитика: переход в SLA_RESOLVED_STATUSES считается решением заявки;
+    # время решения копится в гистограмме с границами SLA_BUCKET_START секунд,
+    # растущими в SLA_BUCKET_RATIO раз (SLA_BUCKET_COUNT корзин)
+    SLA_RESOLVED_STATUSES = ('closed', 'resolved')
+    SLA_BUCKET_START = 60
+    SLA_BUCKET_RATIO = 1.25
+    SLA_BUCKET_COUNT = 64
+    SLA_PERCENTILES = (50, 90, 95)
+    SLA_REPORT_DAYS = 30
+
+    # Фоновый экспорт: EXPORT_WORKERS потоков, не более EXPORT_QUEUE_SIZE задач
+    # в ожидании; прогресс сообщается каждые EXPORT_PROGRESS_ROWS строк.
+    # Экспорт всей базы выгружает таблицы в EXPORT_DATABASE_WORKERS процессов
+    EXPORT_WORKERS = 2
+    EXPORT_DATABASE_WORKERS = 4
+    EXPORT_QUEUE_SIZE = 4
+    EXPORT_PROGRESS_ROWS = 500
+
+    # Экспорт читает таблицу страницами по EXPORT_CHECKPOINT_ROWS строк и после каждой
+    # сохраняет контрольную точку, с которой продолжается прерванный экспорт
+    EXPORT_CHECKPOINT_ROWS = 10000
+
+    # Секционированный экспорт: по месяцам created_at или по EXPORT_PARTITION_ROWS строк на секцию
+    EXPORT_PARTITION_ROWS = 100000
+
+    # Очередь записи: при WRITE_QUEUE изменения заявок и регистрация пользователей
+    # выполняются одним потоком-писателем, фиксирующим до WRITE_BATCH_SIZE операций
+    # одной транзакцией; группа ждет новые операции не дольше WRITE_BATCH_DELAY секунд
+    WRITE_QUEUE = False
+    WRITE_BATCH_SIZE = 200
+    WRITE_BATCH_DELAY = 0.005
+
+    # Эскалация SLA: заявка в статусах SLA_RESPONSE_STATUSES дольше
+    # SLA_RESPONSE_MINUTES[приоритет] минут нарушает срок реакции, в статусах
+    # SLA_RESOLVE_STATUSES дольше SLA_RESOLVE_MINUTES - срок решения. При нарушении
+    # (если SLA_ESCALATE_PRIORITY) приоритет повышается на ступень. Сервис спит до
+    # ближайшего срока, но не дольше SLA_ESCALATION_MAX_SLEEP секунд. Сервис работает,
+    # пока в консоли вошел саппорт
+    SLA_ESCALATION = False
+    SLA_RESPONSE_STATUSES = ('open',)
+    SLA_RESPONSE_MINUTES = {'high': 60, 'medium': 240, 'low': 1440}
+    SLA_RESOLVE_STATUSES = ('open', 'in_progress')
+    SLA_RESOLVE_MINUTES = {'high': 480, 'medium': 2880, 'low': 10080}
+    SLA_ESCALATE_PRIORITY = False
+    SLA_ESCALATION_MAX_SLEEP = 300
+
+    # Поиск заявок: сколько заявок показывать по умолчанию
+    QUERY_PAGE_SIZE = 50
+
+    # Вложения: содержимое читается и пишется блоками по ATTACHMENT_CHUNK_SIZE байт,
+    # размер одного файла - не больше ATTACHMENT_MAX_SIZE байт
+    ATTACHMENT_CHUNK_SIZE = 64 * 1024
+    ATTACHMENT_MAX_SIZE = 50 * 1024 * 1024
+
+    # Двоичные колонки, которые экспорт не выгружает: содержимое вложений и сигнатуры MinHash
+    EXPORT_EXCLUDED_COLUMNS = {'attachment_blobs': ('data',), 'ticket_signatures': ('signature',)}
+
+    # Пакетный режим: заявки из файла создаются транзакциями по CLI_BATCH_SIZE штук
+    CLI_BATCH_SIZE = 1000
@@ -0,0 +1,173 @@
+# SLA-аналитика по дневным агрегатам заявок
+import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from database.connection import DatabaseConnection
+from config import Config
+from utils.helpers import now_timestamp, timestamp_to_iso
+
+EPOCH_DATE = datetime.date(1970, 1, 1)
+
+
+class SlaAnalytics:
+    """Отчеты по открытым и решенным заявкам, остатку и времени решения.
+
+    Считаются по таблицам ticket_daily_stats и ticket_resolution_stats, которые
+    триггеры обновляют в той же транзакции, что и саму заявку, поэтому стоимость
+    отчета зависит от числа дней и групп, а не от числа заявок. Даты - по UTC.
+    """
+
+    # Допустимые группировки времени решения
+    GROUPINGS = {'priority': 'priority', 'assignee': 'assignee'}
+
+    def __init__(self, db_connection: DatabaseConnection):
+        self.db_connection = db_connection
+        self._bounds = None
+
+    def _fetch_all_shards(self, query: str, params: Tuple[Any, ...] = ()) -> List[tuple]:
+        """Результаты запроса по всем шардам"""
+        rows = []
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows.extend(cursor.fetchall())
+            conn.close()
+        return rows
+
+    def _day(self, date: datetime.date) -> int:
+        """Номер дня от начала эпохи"""
+        return (date - EPOCH_DATE).days
+
+    def _period(self, start: Optional[datetime.date], end: Optional[datetime.date]) -> Tuple[int, int]:
+        """Период в днях; по умолчанию - последние SLA_REPORT_DAYS дней"""
+        end_day = self._day(end) if end else self._day(datetime.datetime.now(datetime.timezone.utc).date())
+        start_day = self._day(start) if start else end_day - Config.SLA_REPORT_DAYS + 1
+        return start_day, end_day
+
+    def daily_stats(self, start: Optional[datetime.date] = None,
+                    end: Optional[datetime.date] = None) -> List[Dict[str, Any]]:
+        """Открытые, решенные, переоткрытые заявки и остаток на конец каждого дня периода"""
+        start_day, end_day = self._period(start, end)
+
+        # Остаток на начало периода - одна агрегирующая выборка по предыдущим дням
+        backlog = sum(row[0] or 0 for row in self._fetch_all_shards(
+            "SELECT SUM(opened - closed + reopened - deleted) FROM ticket_daily_stats WHERE day < ?",
+            (start_day,)))
+
+        totals = {}
+        for day, *counts in self._fetch_all_shards('''
+            SELECT day, opened, closed, reopened, deleted FROM ticket_daily_stats
+            WHERE day BETWEEN ? AND ?
+        ''', (start_day, end_day)):
+            current = totals.setdefault(day, [0, 0, 0, 0])
+            for i, count in enumerate(counts):
+                current[i] += count
+
+        stats = []
+        for day in range(start_day, end_day + 1):
+            opened, closed, reopened, deleted = totals.get(day, (0, 0, 0, 0))
+            backlog += opened - closed + reopened - deleted
+            stats.append({
+                'date': (EPOCH_DATE + datetime.timedelta(days=day)).isoformat(),
+                'opened': opened,
+                'closed': closed,
+                'reopened': reopened,
+                'deleted': deleted,
+                'backlog': backlog
+            })
+        return stats
+
+    def _bucket_bounds(self) -> List[Tuple[int, int]]:
+        """Границы корзин гистограммы: (нижняя, верхняя) в секундах"""
+        if self._bounds is None:
+            rows = self._fetch_all_shards("SELECT bucket, upper_seconds FROM sla_buckets ORDER BY bucket")
+            uppers = dict(rows)
+            self._bounds = [(uppers.get(bucket - 1, 0), uppers[bucket]) for bucket in sorted(uppers)]
+        return self._bounds
+
+    def _percentile(self, histogram: List[Tuple[int, int]], total: int, percentile: float) -> float:
+        """Перцентиль по гистограмме (линейная интерполяция внутри корзины)"""
+        bounds = self._bucket_bounds()
+        rank = total * percentile / 100
+        cumulative = 0
+        for bucket, count in histogram:
+            if cumulative + count >= rank:
+                lower, upper = bounds[bucket]
+                if bucket == len(bounds) - 1:
+                    # Последняя корзина не ограничена сверху
+                    return float(lower)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return float(bounds[histogram[-1][0]][1])
+
+    def resolution_stats(self, group_by: str = 'priority', start: Optional[datetime.date] = None,
+                         end: Optional[datetime.date] = None,
+                         percentiles: Iterable[float] = Config.SLA_PERCENTILES) -> List[Dict[str, Any]]:
+        """Число решенных заявок, среднее время решения и перцентили (в секундах) по группам"""
+        column = self.GROUPINGS.get(group_by)
+        if column is None:
+            raise ValueError(f"Неизвестная группировка: {group_by}")
+        start_day, end_day = self._period(start, end)
+
+        groups = {}
+        for key, bucket, resolved, total_seconds in self._fetch_all_shards(f'''
+            SELECT {column}, bucket, SUM(resolved), SUM(total_seconds)
+            FROM ticket_resolution_stats
+            WHERE day BETWEEN ? AND ?
+            GROUP BY {column}, bucket
+        ''', (start_day, end_day)):
+            histogram = groups.setdefault(key, {})
+            count, seconds = histogram.get(bucket, (0, 0))
+            histogram[bucket] = (count + resolved, seconds + total_seconds)
+
+        names = self._user_names(groups) if group_by == 'assignee' else {}
+
+        if group_by == 'priority':
+            order = lambda key: Config.PRIORITY_ORDER.get(key, len(Config.PRIORITY_ORDER) + 1)
+        else:
+            order = lambda key: key
+
+        stats = []
+        for key in sorted(groups, key=order):
+            histogram = sorted((bucket, count) for bucket, (count, _) in groups[key].items())
+            total = sum(count for _, count in histogram)
+            total_seconds = sum(seconds for _, seconds in groups[key].values())
+
+            if group_by == 'assignee':
+                row = {'assignee': key or None, 'assignee_name': names.get(key)}
+            else:
+                row = {'priority': key}
+            row['resolved'] = total
+            row['mean_seconds'] = total_seconds / total
+            for percentile in percentiles:
+                row[f'p{percentile:g}_seconds'] = self._percentile(histogram, total, percentile)
+            stats.append(row)
+        return stats
+
+    def _user_names(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Имена пользователей по ID"""
+        user_ids = [user_id for user_id in user_ids if user_id]
+        if not user_ids:
+            return {}
+
+        conn = self.db_connection.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, full_name FROM users WHERE id IN ({', '.join('?' * len(user_ids))})", user_ids)
+        names = dict(cursor.fetchall())
+        conn.close()
+        return names
+
+    def report(self, start: Optional[datetime.date] = None,
+               end: Optional[datetime.date] = None) -> Dict[str, Any]:
+        """Полный отчет в виде словаря, пригодного для сериализации в JSON"""
+        start_day, end_day = self._period(start, end)
+        start = EPOCH_DATE + datetime.timedelta(days=start_day)
+        end = EPOCH_DATE + datetime.timedelta(days=end_day)
+
+        return {
+            'generated_at': timestamp_to_iso(now_timestamp()),
+            'period': {'start': start.isoformat(), 'end': end.isoformat()},
+            'daily': self.daily_stats(start, end),
+            'by_priority': self.resolution_stats('priority', start, end),
+            'by_assignee': self.resolution_stats('assignee', start, end)
+        }
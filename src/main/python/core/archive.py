@@ -0,0 +1,121 @@
+# Архивация закрытых и решенных заявок
+from typing import List, Optional
+from database.connection import DatabaseConnection
+from config import Config
+from utils.helpers import now_timestamp, MICROSECONDS_PER_SECOND
+
+ARCHIVE_COLUMNS = "id, title, description, status, priority, created_by, assigned_to, created_at, updated_at"
+
+
+class ArchiveManager:
+    """Перенос старых заявок в конечных статусах из tickets в tickets_archive"""
+
+    def __init__(self, db_connection: DatabaseConnection):
+        self.db_connection = db_connection
+
+    def _cutoff(self, older_than_days: float) -> int:
+        """Граница по updated_at для архивации"""
+        return now_timestamp() - int(older_than_days * 86400 * MICROSECONDS_PER_SECOND)
+
+    def count_archivable(self, older_than_days: float = Config.ARCHIVE_AFTER_DAYS) -> int:
+        """Количество заявок, готовых к архивации"""
+        statuses = Config.ARCHIVE_STATUSES
+        cutoff = self._cutoff(older_than_days)
+        count = 0
+
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT COUNT(*) FROM tickets
+                WHERE status IN ({', '.join('?' * len(statuses))}) AND updated_at < ?
+            ''', (*statuses, cutoff))
+            count += cursor.fetchone()[0]
+            conn.close()
+
+        return count
+
+    def archive_tickets(self, older_than_days: float = Config.ARCHIVE_AFTER_DAYS,
+                        batch_size: int = Config.ARCHIVE_BATCH_SIZE,
+                        limit: Optional[int] = None) -> int:
+        """Архивация заявок пачками (каждая пачка - отдельная транзакция), возвращает число перенесенных"""
+        cutoff = self._cutoff(older_than_days)
+        statuses = Config.ARCHIVE_STATUSES
+        status_placeholders = ', '.join('?' * len(statuses))
+
+        archived = 0
+
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+
+            try:
+                while limit is None or archived < limit:
+                    size = batch_size if limit is None else min(batch_size, limit - archived)
+
+                    # Выборка идет по индексу (status, updated_at)
+                    cursor.execute(f'''
+                        SELECT id FROM tickets
+                        WHERE status IN ({status_placeholders}) AND updated_at < ?
+                        LIMIT ?
+                    ''', (*statuses, cutoff, size))
+                    ticket_ids = [row[0] for row in cursor.fetchall()]
+                    if not ticket_ids:
+                        break
+
+                    archived += self._move_batch(conn, ticket_ids)
+            finally:
+                conn.close()
+
+        return archived
+
+    def _move_batch(self, conn, ticket_ids: List[int]) -> int:
+        """Перенос одной пачки заявок в архив в одной транзакции.
+
+        Строки вставляются в архив до удаления из tickets, поэтому журнал изменений
+        записывает для них операцию 'archive', а не 'delete'.
+        """
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' * len(ticket_ids))
+
+        try:
+            cursor.execute(f'''
+                INSERT INTO tickets_archive ({ARCHIVE_COLUMNS}, archived_at)
+                SELECT {ARCHIVE_COLUMNS}, ? FROM tickets WHERE id IN ({placeholders})
+            ''', (now_timestamp(), *ticket_ids))
+            cursor.execute(f"DELETE FROM tickets WHERE id IN ({placeholders})", ticket_ids)
+            moved = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        return moved
+
+    def restore_tickets(self, ticket_ids: List[int]) -> int:
+        """Возврат заявок из архива в рабочую таблицу"""
+        shard_ids = {}
+        for ticket_id in ticket_ids:
+            shard_ids.setdefault(self.db_connection.shard_for_ticket(ticket_id), []).append(ticket_id)
+
+        restored = 0
+        for shard, ids in shard_ids.items():
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            placeholders = ', '.join('?' * len(ids))
+
+            try:
+                cursor.execute(f'''
+                    INSERT INTO tickets ({ARCHIVE_COLUMNS})
+                    SELECT {ARCHIVE_COLUMNS} FROM tickets_archive WHERE id IN ({placeholders})
+                ''', ids)
+                cursor.execute(f"DELETE FROM tickets_archive WHERE id IN ({placeholders})", ids)
+                restored += cursor.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+        return restored
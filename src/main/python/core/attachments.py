@@ -0,0 +1,197 @@
+# Вложения заявок: хранение содержимого по хешу и потоковое чтение/запись
+import hashlib
+import os
+import tempfile
+import uuid
+from typing import BinaryIO, Iterator, List, Optional
+from database.connection import DatabaseConnection
+from database.models import Attachment
+from utils.helpers import now_timestamp
+from config import Config
+
+
+class AttachmentStore:
+    """Вложения заявок с адресацией содержимого по SHA-256.
+
+    Метаданные лежат в ticket_attachments шарда заявки, содержимое - в
+    attachment_blobs общей базы, одна строка на уникальный файл. Содержимое
+    пишется и читается через Connection.blobopen блоками ATTACHMENT_CHUNK_SIZE,
+    поэтому файл целиком в память не загружается. Списки заявок и экспорт
+    видят только метаданные. Вложения удаленной заявки освобождает
+    TicketSystem.delete_ticket в транзакции удаления.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, ticket_system):
+        self.db_connection = db_connection
+        self.ticket_system = ticket_system
+        self.auth_manager = ticket_system.auth_manager
+
+    def _check_ticket(self, ticket_id: int):
+        """Проверка, что заявка существует и видна текущему пользователю"""
+        if not self.auth_manager.is_authenticated():
+            raise Exception("Пользователь не аутентифицирован")
+        if self.ticket_system.get_ticket(ticket_id) is None:
+            raise Exception("Заявка не найдена")
+
+    def _connect(self, ticket_id: int):
+        """Соединение с шардом заявки (общая база доступна как shared_schema)"""
+        return self.db_connection.get_ticket_connection(self.db_connection.shard_for_ticket(ticket_id))
+
+    def add_attachment(self, ticket_id: int, file_name: str, stream: BinaryIO, size: int) -> Attachment:
+        """Добавление вложения из потока размером size байт.
+
+        Содержимое за один проход пишется в заранее выделенный blob и хешируется;
+        если такой файл уже хранится, новая копия удаляется в той же транзакции
+        и увеличивается счетчик ссылок существующей.
+        """
+        self._check_ticket(ticket_id)
+        if size > Config.ATTACHMENT_MAX_SIZE:
+            raise Exception(f"Файл больше {Config.ATTACHMENT_MAX_SIZE // (1024 * 1024)} МБ")
+
+        schema = self.db_connection.shared_schema
+        user_id = self.auth_manager.current_user.id
+        conn = self._connect(ticket_id)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(f'''
+                INSERT INTO {schema}.attachment_blobs (hash, size, refs, data)
+                VALUES (?, ?, 0, zeroblob(?))
+            ''', (f"pending:{uuid.uuid4().hex}", size, size))
+            blob_id = cursor.lastrowid
+
+            digest = hashlib.sha256()
+            written = 0
+            with conn.blobopen('attachment_blobs', 'data', blob_id, name=schema) as blob:
+                while written < size:
+                    chunk = stream.read(min(Config.ATTACHMENT_CHUNK_SIZE, size - written))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    blob.write(chunk)
+                    written += len(chunk)
+            if written != size or stream.read(1):
+                raise Exception("Размер файла изменился во время загрузки")
+            content_hash = digest.hexdigest()
+
+            cursor.execute(f"SELECT id FROM {schema}.attachment_blobs WHERE hash = ?", (content_hash,))
+            existing = cursor.fetchone()
+            if existing:
+                cursor.execute(f"DELETE FROM {schema}.attachment_blobs WHERE id = ?", (blob_id,))
+                cursor.execute(f"UPDATE {schema}.attachment_blobs SET refs = refs + 1 WHERE id = ?", (existing[0],))
+            else:
+                cursor.execute(f"UPDATE {schema}.attachment_blobs SET hash = ?, refs = 1 WHERE id = ?",
+                               (content_hash, blob_id))
+
+            created_at = now_timestamp()
+            cursor.execute('''
+                INSERT INTO ticket_attachments (ticket_id, file_name, hash, size, uploaded_by, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (ticket_id, file_name, content_hash, size, user_id, created_at))
+            attachment_id = cursor.lastrowid
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        return Attachment(attachment_id, ticket_id, file_name, content_hash, size, user_id, created_at,
+                          self.auth_manager.current_user.full_name)
+
+    def attach_file(self, ticket_id: int, path: str) -> Attachment:
+        """Добавление файла с диска"""
+        with open(path, 'rb') as f:
+            return self.add_attachment(ticket_id, os.path.basename(path), f, os.fstat(f.fileno()).st_size)
+
+    def get_attachments(self, ticket_id: int) -> List[Attachment]:
+        """Метаданные вложений заявки (без содержимого)"""
+        self._check_ticket(ticket_id)
+
+        conn = self._connect(ticket_id)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT a.id, a.ticket_id, a.file_name, a.hash, a.size, a.uploaded_by, a.created_at, u.full_name
+            FROM ticket_attachments a
+            LEFT JOIN users u ON a.uploaded_by = u.id
+            WHERE a.ticket_id = ?
+            ORDER BY a.created_at, a.id
+        ''', (ticket_id,))
+        attachments = [Attachment(*row) for row in cursor.fetchall()]
+        conn.close()
+        return attachments
+
+    def _get_attachment(self, cursor, ticket_id: int, attachment_id: int) -> Attachment:
+        """Метаданные одного вложения заявки"""
+        cursor.execute('''
+            SELECT id, ticket_id, file_name, hash, size, uploaded_by, created_at
+            FROM ticket_attachments WHERE id = ? AND ticket_id = ?
+        ''', (attachment_id, ticket_id))
+        row = cursor.fetchone()
+        if row is None:
+            raise Exception("Вложение не найдено")
+        return Attachment(*row)
+
+    def iter_content(self, ticket_id: int, attachment_id: int,
+                     chunk_size: int = Config.ATTACHMENT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Содержимое вложения блоками по chunk_size байт"""
+        self._check_ticket(ticket_id)
+
+        schema = self.db_connection.shared_schema
+        conn = self._connect(ticket_id)
+        try:
+            # Транзакция чтения: blob не устареет, пока его читают
+            conn.execute("BEGIN")
+            cursor = conn.cursor()
+            attachment = self._get_attachment(cursor, ticket_id, attachment_id)
+            cursor.execute(f"SELECT id FROM {schema}.attachment_blobs WHERE hash = ?", (attachment.hash,))
+            blob_id = cursor.fetchone()[0]
+
+            with conn.blobopen('attachment_blobs', 'data', blob_id, readonly=True, name=schema) as blob:
+                for chunk in iter(lambda: blob.read(chunk_size), b''):
+                    yield chunk
+        finally:
+            conn.close()
+
+    def save_attachment(self, ticket_id: int, attachment_id: int, path: str) -> str:
+        """Сохранение вложения в файл (через временный файл и атомарное переименование)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in self.iter_content(ticket_id, attachment_id):
+                    f.write(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return path
+
+    def _release(self, cursor, attachments: List[tuple]):
+        """Удаление метаданных (id, hash) и содержимого, на которое больше нет ссылок"""
+        schema = self.db_connection.shared_schema
+        cursor.executemany("DELETE FROM ticket_attachments WHERE id = ?",
+                           [(attachment_id,) for attachment_id, _ in attachments])
+        cursor.executemany(f"UPDATE {schema}.attachment_blobs SET refs = refs - 1 WHERE hash = ?",
+                           [(content_hash,) for _, content_hash in attachments])
+        cursor.executemany(f"DELETE FROM {schema}.attachment_blobs WHERE hash = ? AND refs <= 0",
+                           [(content_hash,) for content_hash in {content_hash for _, content_hash in attachments}])
+
+    def delete_attachment(self, ticket_id: int, attachment_id: int):
+        """Удаление вложения (саппорт или загрузивший пользователь)"""
+        self._check_ticket(ticket_id)
+
+        conn = self._connect(ticket_id)
+        cursor = conn.cursor()
+        try:
+            attachment = self._get_attachment(cursor, ticket_id, attachment_id)
+            if not self.auth_manager.is_support() and attachment.uploaded_by != self.auth_manager.current_user.id:
+                raise Exception("Удалить вложение может только саппорт или автор")
+            self._release(cursor, [(attachment.id, attachment.hash)])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
@@ -1,14 +1,16 @@
 # Аутентификация и авторизация
 import sqlite3
-import datetime
 from typing import Optional, Tuple
 from database.connection import DatabaseConnection
 from database.models import User
+from utils.helpers import now_timestamp
 
 
 class AuthManager:
-    def __init__(self, db_connection: DatabaseConnection):
+    def __init__(self, db_connection: DatabaseConnection, write_queue=None):
         self.db_connection = db_connection
+        # Необязательная очередь записи (database/writer.py) для регистрации пользователей
+        self.write_queue = write_queue
         self.current_user = None
 
     def authenticate_user(self, username: str, password: str) -> Optional[User]:
@@ -33,33 +35,35 @@ class AuthManager:
 
     def register_user(self, username: str, password: str, full_name: str, role: str = "user") -> bool:
         """Регистрация нового пользователя"""
-        conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
+        password_hash = self.db_connection._hash_password(password)
 
-        try:
+        def operation(cursor) -> bool:
             # Проверяем, существует ли пользователь
             cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
             if cursor.fetchone():
-                conn.close()
                 return False
 
-            password_hash = self.db_connection._hash_password(password)
-            current_time = datetime.datetime.now().isoformat()
-
             cursor.execute('''
                 INSERT INTO users (username, password_hash, role, full_name, created_at)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (username, password_hash, role, full_name, current_time))
-
-            conn.commit()
-            conn.close()
+            ''', (username, password_hash, role, full_name, now_timestamp()))
             return True
+
+        try:
+            if self.write_queue is not None:
+                return self.write_queue.submit(None, operation).result()
+
+            conn = self.db_connection.get_connection()
+            try:
+                created = operation(conn.cursor())
+                conn.commit()
+                return created
+            finally:
+                conn.close()
         except sqlite3.IntegrityError:
-            conn.close()
             return False
         except Exception as e:
             print(f"Ошибка при регистрации: {e}")
-            conn.close()
             return False
 
     def login(self, username: str, password: str) -> bool:
@@ -0,0 +1,129 @@
+# Лента изменений (CDC) для внешних потребителей
+from typing import Iterator, List, Optional
+from database.connection import DatabaseConnection
+from database.models import Change
+from config import Config
+from utils.helpers import now_timestamp, MICROSECONDS_PER_SECOND
+
+
+class ChangeFeed:
+    """Чтение журнала change_log, который заполняют триггеры на users и tickets.
+
+    Номер seq монотонно растет, поэтому потребитель запоминает последний
+    прочитанный seq и читает только новые записи - время чтения пропорционально
+    объему изменений, а не размеру таблиц. При шардировании у каждого шарда
+    свой журнал заявок (shard=N), изменения пользователей - в общей базе (shard=None).
+
+    Операции: 'insert', 'update', 'delete' и 'archive' - заявка перенесена в
+    tickets_archive (ArchiveManager) и по-прежнему доступна с include_archived.
+    Возврат заявки из архива приходит как 'insert'.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection):
+        self.db_connection = db_connection
+
+    def _connect(self, shard: Optional[int]):
+        """Соединение с базой, в которой лежит журнал"""
+        if shard is None:
+            return self.db_connection.get_connection()
+        return self.db_connection.get_ticket_connection(shard)
+
+    def read_changes(self, after_seq: int = 0, limit: int = Config.CHANGE_LOG_BATCH_SIZE,
+                     shard: Optional[int] = None) -> List[Change]:
+        """Пачка изменений с seq больше after_seq"""
+        conn = self._connect(shard)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT seq, table_name, row_id, operation, changed_columns, changed_at
+            FROM change_log
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        ''', (after_seq, limit))
+
+        changes = [Change(*row) for row in cursor.fetchall()]
+        conn.close()
+        return changes
+
+    def iter_changes(self, after_seq: int = 0, batch_size: int = Config.CHANGE_LOG_BATCH_SIZE,
+                     shard: Optional[int] = None) -> Iterator[Change]:
+        """Все изменения после after_seq, читаемые пачками"""
+        while True:
+            changes = self.read_changes(after_seq, batch_size, shard)
+            yield from changes
+            if len(changes) < batch_size:
+                break
+            after_seq = changes[-1].seq
+
+    def get_position(self, consumer: str, shard: Optional[int] = None) -> int:
+        """Последний подтвержденный потребителем seq"""
+        conn = self._connect(shard)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT last_seq FROM change_consumers WHERE name = ?", (consumer,))
+        row = cursor.fetchone()
+        conn.close()
+
+        return row[0] if row else 0
+
+    def acknowledge(self, consumer: str, seq: int, shard: Optional[int] = None):
+        """Подтверждение обработки изменений до seq включительно"""
+        conn = self._connect(shard)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT INTO change_consumers (name, last_seq) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_seq = MAX(last_seq, excluded.last_seq)
+        ''', (consumer, seq))
+
+        conn.commit()
+        conn.close()
+
+    def poll(self, consumer: str, limit: int = Config.CHANGE_LOG_BATCH_SIZE,
+             shard: Optional[int] = None) -> List[Change]:
+        """Следующая пачка изменений для потребителя (подтверждение - через acknowledge)"""
+        return self.read_changes(self.get_position(consumer, shard), limit, shard)
+
+    def compact(self, retention_days: float = Config.CHANGE_LOG_RETENTION_DAYS,
+                batch_size: int = Config.CHANGE_LOG_BATCH_SIZE,
+                shard: Optional[int] = None) -> int:
+        """Удаление изменений, прочитанных всеми потребителями или старше срока хранения"""
+        cutoff = now_timestamp() - int(retention_days * 86400 * MICROSECONDS_PER_SECOND)
+
+        conn = self._connect(shard)
+        cursor = conn.cursor()
+
+        # Граница по seq: все, что подтвердили все потребители
+        cursor.execute("SELECT MIN(last_seq) FROM change_consumers")
+        acknowledged = cursor.fetchone()[0] or 0
+
+        # Граница по сроку хранения (по индексу changed_at)
+        cursor.execute("SELECT MAX(seq) FROM change_log WHERE changed_at < ?", (cutoff,))
+        expired = cursor.fetchone()[0] or 0
+
+        upper = max(acknowledged, expired)
+        cursor.execute("SELECT MIN(seq) FROM change_log")
+        lower = cursor.fetchone()[0]
+
+        deleted = 0
+        try:
+            # Удаление диапазонами seq, каждая пачка - отдельная короткая транзакция
+            while lower is not None and lower <= upper:
+                batch_end = min(lower + batch_size - 1, upper)
+                cursor.execute("DELETE FROM change_log WHERE seq BETWEEN ? AND ?", (lower, batch_end))
+                deleted += cursor.rowcount
+                conn.commit()
+                lower = batch_end + 1
+        finally:
+            conn.close()
+
+        return deleted
+
+    def compact_all(self, retention_days: float = Config.CHANGE_LOG_RETENTION_DAYS,
+                    batch_size: int = Config.CHANGE_LOG_BATCH_SIZE) -> int:
+        """Компактификация журнала общей базы и (при шардировании) журналов всех шардов"""
+        shards = [None]
+        if self.db_connection.shard_count > 1:
+            shards.extend(range(self.db_connection.shard_count))
+        return sum(self.compact(retention_days, batch_size, shard) for shard in shards)
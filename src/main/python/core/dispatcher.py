@@ -0,0 +1,212 @@
+# Автоматическое распределение заявок между саппортами
+import heapq
+from typing import Dict, List, Optional, Tuple
+from database.connection import DatabaseConnection
+from config import Config
+
+
+class TicketDispatcher:
+    """Распределяет открытые неназначенные заявки по приоритету на наименее загруженных саппортов.
+
+    Очередь заявок загружается один раз, затем перед каждым распределением
+    перечитываются только заявки из журнала change_log с последнего прочитанного
+    seq - так учитываются и изменения других процессов (CLI, других консолей).
+    Загрузка саппортов пересчитывается перед каждым распределением.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, ticket_system):
+        self.db_connection = db_connection
+        self.ticket_system = ticket_system
+
+        # Очередь заявок: (ранг приоритета, created_at, id)
+        self._ticket_heap: List[Tuple[int, int, int]] = []
+        self._queued: Dict[int, Tuple[int, int, int]] = {}
+
+        # Загрузка саппортов: (число активных заявок, id)
+        self._agent_heap: List[Tuple[int, int]] = []
+
+        # Последний учтенный seq журнала изменений каждого шарда
+        self._log_seq: Dict[int, int] = {}
+        self._tickets_dirty = True
+
+    def _priority_rank(self, priority: str) -> int:
+        """Ранг приоритета (меньше - важнее)"""
+        return Config.PRIORITY_ORDER.get(priority, len(Config.PRIORITY_ORDER) + 1)
+
+    def _push_ticket(self, ticket_id: int, priority: str, created_at: int):
+        """Добавление заявки в очередь"""
+        entry = (self._priority_rank(priority), created_at, ticket_id)
+        self._queued[ticket_id] = entry
+        heapq.heappush(self._ticket_heap, entry)
+
+    def _log_position(self, cursor) -> int:
+        """Последний выданный seq журнала изменений (не уменьшается при компактификации)"""
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def load_tickets(self):
+        """Загрузка всех открытых неназначенных заявок"""
+        self._queued = {}
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+
+            # Позиция берется до выборки: изменения между запросами перечитаются при следующей сверке
+            self._log_seq[shard] = self._log_position(cursor)
+            cursor.execute('''
+                SELECT id, priority, created_at
+                FROM tickets
+                WHERE status = 'open' AND assigned_to IS NULL
+            ''')
+
+            for ticket_id, priority, created_at in cursor.fetchall():
+                self._queued[ticket_id] = (self._priority_rank(priority), created_at, ticket_id)
+            conn.close()
+
+        self._ticket_heap = list(self._queued.values())
+        heapq.heapify(self._ticket_heap)
+        self._tickets_dirty = False
+
+    def load_agents(self):
+        """Загрузка саппортов и их текущей загрузки"""
+        conn = self.db_connection.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users WHERE role = 'support'")
+        workloads = {row[0]: 0 for row in cursor.fetchall()}
+        conn.close()
+
+        # Загрузка считается по индексу (assigned_to, status) в каждом шарде
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT assigned_to, COUNT(*)
+                FROM tickets
+                WHERE assigned_to IS NOT NULL AND status IN ('open', 'in_progress')
+                GROUP BY assigned_to
+            ''')
+            for user_id, count in cursor.fetchall():
+                if user_id in workloads:
+                    workloads[user_id] += count
+            conn.close()
+
+        self._agent_heap = [(workload, user_id) for user_id, workload in workloads.items()]
+
+        heapq.heapify(self._agent_heap)
+
+    def _refresh_tickets(self, ticket_ids: List[int]):
+        """Перечитывание состояния отдельных заявок после изменения"""
+        for ticket_id in ticket_ids:
+            self._queued.pop(ticket_id, None)
+
+        shard_ids = {}
+        for ticket_id in ticket_ids:
+            shard_ids.setdefault(self.db_connection.shard_for_ticket(ticket_id), []).append(ticket_id)
+
+        for shard, ids in shard_ids.items():
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor.execute(f'''
+                    SELECT id, priority, created_at
+                    FROM tickets
+                    WHERE id IN ({', '.join('?' * len(chunk))})
+                      AND status = 'open' AND assigned_to IS NULL
+                ''', chunk)
+                for ticket_id, priority, created_at in cursor.fetchall():
+                    self._push_ticket(ticket_id, priority, created_at)
+
+            conn.close()
+
+    def _sync_changes(self):
+        """Перечитывание заявок, измененных после последней сверки (по журналу change_log)"""
+        if self._tickets_dirty:
+            self.load_tickets()
+            return
+
+        changed = []
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            try:
+                last = self._log_seq.get(shard, 0)
+                position = self._log_position(cursor)
+                if position == last:
+                    continue
+
+                cursor.execute("SELECT MIN(seq) FROM change_log WHERE seq > ?", (last,))
+                if cursor.fetchone()[0] != last + 1:
+                    # Часть журнала удалена компактификацией - пропущенные изменения неизвестны
+                    self._tickets_dirty = True
+                    break
+
+                cursor.execute('''
+                    SELECT DISTINCT row_id FROM change_log
+                    WHERE seq > ? AND seq <= ? AND table_name = 'tickets'
+                ''', (last, position))
+                changed.extend(row[0] for row in cursor.fetchall())
+                self._log_seq[shard] = position
+            finally:
+                conn.close()
+
+        if self._tickets_dirty:
+            self.load_tickets()
+        elif changed:
+            self._refresh_tickets(changed)
+
+    def pending_count(self) -> int:
+        """Количество заявок в очереди на распределение"""
+        self._sync_changes()
+        return len(self._queued)
+
+    def _pop_ticket(self) -> Optional[int]:
+        """Извлечение самой приоритетной заявки (устаревшие записи пропускаются)"""
+        while self._ticket_heap:
+            entry = heapq.heappop(self._ticket_heap)
+            ticket_id = entry[2]
+            if self._queued.get(ticket_id) == entry:
+                del self._queued[ticket_id]
+                return ticket_id
+        return None
+
+    def dispatch(self, limit: Optional[int] = None,
+                 batch_size: int = Config.DISPATCH_BATCH_SIZE) -> List[Tuple[int, int]]:
+        """Распределение заявок, возвращает список пар (ID заявки, ID саппорта)"""
+        # Заявки и загрузку саппортов могли изменить другие процессы
+        self._sync_changes()
+        self.load_agents()
+
+        if not self._agent_heap:
+            return []
+
+        assignments = []
+        batch = []
+        while limit is None or len(assignments) + len(batch) < limit:
+            ticket_id = self._pop_ticket()
+            if ticket_id is None:
+                break
+
+            # Наименее загруженный саппорт получает заявку, загрузка растет на 1
+            workload, user_id = self._agent_heap[0]
+            heapq.heapreplace(self._agent_heap, (workload + 1, user_id))
+
+            batch.append((ticket_id, user_id))
+            if len(batch) >= batch_size:
+                assignments.extend(self._commit_batch(batch))
+                batch = []
+
+        if batch:
+            assignments.extend(self._commit_batch(batch))
+
+        return assignments
+
+    def _commit_batch(self, batch: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Фиксация пачки назначений одной транзакцией, возвращает примененные пары"""
+        applied = self.ticket_system.assign_tickets(batch)
+        if len(applied) != len(batch):
+            # Часть заявок успели изменить другие саппорты - пересчитаем загрузку
+            self.load_agents()
+        return applied
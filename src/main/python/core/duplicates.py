@@ -0,0 +1,268 @@
+# Поиск похожих (дублирующихся) заявок
+import hashlib
+import re
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+from database.connection import DatabaseConnection
+from config import Config
+
+class DuplicateDetector:
+    """Индекс MinHash + LSH по заголовку и описанию открытых заявок.
+
+    Для каждой заявки хранится сигнатура из DUPLICATE_NUM_PERM минимумов хешей
+    по символьным шинглам текста (одна перестановка: хеши раскладываются по
+    ячейкам, в каждой берется минимум), а сигнатура, разбитая на полосы, - в
+    таблице корзин. Кандидаты ищутся по индексу (band, bucket), поэтому поиск
+    не зависит от числа заявок; сходство затем оценивается по сигнатурам
+    кандидатов.
+    Индекс лежит в общей базе и обновляется по событиям TicketSystem.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, ticket_system):
+        self.db_connection = db_connection
+        self.ticket_system = ticket_system
+
+        self._rows_per_band = Config.DUPLICATE_NUM_PERM // Config.DUPLICATE_BANDS
+        self._checked = False
+
+        ticket_system.add_listener(self)
+
+    def _shingles(self, title: str, description: str) -> set:
+        """Символьные шинглы нормализованного текста"""
+        text = f"{title} {description}"[:Config.DUPLICATE_TEXT_LIMIT]
+        words = " ".join(re.findall(r"\w+", text.lower()))
+        size = Config.DUPLICATE_SHINGLE_SIZE
+        return {words[i:i + size] for i in range(max(1, len(words) - size + 1))}
+
+    def _hash(self, shingle: str) -> int:
+        """64-битный хеш шингла (стабильный между запусками)"""
+        return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'little')
+
+    def _minhash(self, hashes: Iterable[int]) -> array:
+        """Сигнатура по хешам шинглов за один проход.
+
+        Хеш попадает в ячейку hash % DUPLICATE_NUM_PERM, в ячейке остается
+        минимальный. Пустая ячейка берет значение ближайшей непустой справа
+        (по кругу), сдвинутое на расстояние до нее, чтобы совпадение пустых
+        ячеек у двух текстов оставалось тем же событием, что и совпадение
+        минимумов.
+        """
+        num_perm = Config.DUPLICATE_NUM_PERM
+        step = (1 << 64) // num_perm
+        # Проход по убыванию: в ячейке остается последний, т.е. минимальный хеш
+        bins = {value % num_perm: value // num_perm for value in sorted(hashes, reverse=True)}
+        if len(bins) == num_perm:
+            return array('Q', [bins[i] for i in range(num_perm)])
+
+        signature = [0] * num_perm
+        nearest = distance = 0
+        for position in range(2 * num_perm - 1, -1, -1):
+            value = bins.get(position % num_perm)
+            if value is not None:
+                nearest, distance = value, 0
+            else:
+                distance += 1
+            if position < num_perm:
+                signature[position] = nearest + distance * step
+        return array('Q', signature)
+
+    def signature(self, title: str, description: str) -> array:
+        """MinHash-сигнатура текста заявки"""
+        return self._minhash(map(self._hash, self._shingles(title, description)))
+
+    def signatures(self, texts: List[Tuple[str, str]]) -> List[array]:
+        """Сигнатуры пачки заявок: каждый шингл хешируется один раз на всю пачку"""
+        shingle_sets = [self._shingles(title, description) for title, description in texts]
+        hashes = {shingle: self._hash(shingle) for shingle in set().union(*shingle_sets)}
+        return [self._minhash(map(hashes.__getitem__, shingles)) for shingles in shingle_sets]
+
+    def _buckets(self, signature: array) -> List[Tuple[int, int]]:
+        """Пары (полоса, корзина) для сигнатуры"""
+        rows = self._rows_per_band
+        return [(band, zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes()))
+                for band in range(Config.DUPLICATE_BANDS)]
+
+    def _similarity(self, left: array, right: array) -> float:
+        """Оценка коэффициента Жаккара по двум сигнатурам"""
+        return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+    def find_duplicates(self, title: str, description: str,
+                        threshold: float = Config.DUPLICATE_THRESHOLD,
+                        limit: int = Config.DUPLICATE_MAX_CANDIDATES,
+                        exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Похожие открытые заявки: список (ID, оценка сходства) по убыванию сходства"""
+        self.ensure_index()
+        signature = self.signature(title, description)
+
+        conn = self.db_connection.get_connection()
+        cursor = conn.cursor()
+
+        # Кандидаты - заявки, совпавшие хотя бы в одной полосе (поиск по первичному ключу)
+        candidates = set()
+        for band, bucket in self._buckets(signature):
+            cursor.execute("SELECT ticket_id FROM ticket_lsh_buckets WHERE band = ? AND bucket = ?",
+                           (band, bucket))
+            candidates.update(row[0] for row in cursor.fetchall())
+        candidates.discard(exclude_id)
+
+        matches = []
+        candidates = list(candidates)
+        for start in range(0, len(candidates), 900):
+            chunk = candidates[start:start + 900]
+            cursor.execute(f'''
+                SELECT ticket_id, signature FROM ticket_signatures
+                WHERE ticket_id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            for ticket_id, blob in cursor.fetchall():
+                similarity = self._similarity(signature, array('Q', blob))
+                if similarity >= threshold:
+                    matches.append((ticket_id, similarity))
+
+        conn.close()
+
+        # Индекс обновляется только событиями этого процесса: заявки, закрытые или
+        # удаленные другими процессами, отбрасываются и убираются из индекса
+        tickets = self._fetch_tickets([ticket_id for ticket_id, _ in matches])
+        stale = [ticket_id for ticket_id, _ in matches
+                 if ticket_id not in tickets or tickets[ticket_id][2] not in Config.DUPLICATE_INDEX_STATUSES]
+        if stale:
+            self._apply({}, stale)
+            matches = [match for match in matches if match[0] not in stale]
+
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+    def _fetch_tickets(self, ticket_ids: Iterable[int]) -> Dict[int, Tuple[str, str, str]]:
+        """Заголовок, описание и статус заявок из их шардов"""
+        shard_ids = {}
+        for ticket_id in ticket_ids:
+            shard_ids.setdefault(self.db_connection.shard_for_ticket(ticket_id), []).append(ticket_id)
+
+        tickets = {}
+        for shard, ids in shard_ids.items():
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            for start in range(0, len(ids), 900):
+                chunk = ids[start:start + 900]
+                cursor.execute(f'''
+                    SELECT id, title, description, status FROM tickets
+                    WHERE id IN ({', '.join('?' * len(chunk))})
+                ''', chunk)
+                for ticket_id, title, description, status in cursor.fetchall():
+                    tickets[ticket_id] = (title, description, status)
+            conn.close()
+        return tickets
+
+    def _apply(self, to_add: Dict[int, Tuple[str, str]], to_remove: Iterable[int]):
+        """Добавление и удаление заявок в индексе одной транзакцией"""
+        rows = []
+        bucket_rows = []
+        for ticket_id, signature in zip(to_add, self.signatures(list(to_add.values()))):
+            rows.append((ticket_id, signature.tobytes()))
+            bucket_rows.extend((band, bucket, ticket_id) for band, bucket in self._buckets(signature))
+
+        conn = self.db_connection.get_connection()
+        cursor = conn.cursor()
+        try:
+            removed = [(ticket_id,) for ticket_id in to_remove]
+            cursor.executemany("DELETE FROM ticket_signatures WHERE ticket_id = ?", removed)
+            cursor.executemany("DELETE FROM ticket_lsh_buckets WHERE ticket_id = ?", removed)
+            cursor.executemany("INSERT OR REPLACE INTO ticket_signatures (ticket_id, signature) VALUES (?, ?)", rows)
+            cursor.executemany("INSERT OR IGNORE INTO ticket_lsh_buckets (band, bucket, ticket_id) VALUES (?, ?, ?)",
+                               bucket_rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _indexed_ids(self, ticket_ids: Optional[List[int]] = None) -> set:
+        """ID заявок, уже находящихся в индексе"""
+        conn = self.db_connection.get_connection()
+        cursor = conn.cursor()
+        if ticket_ids is None:
+            cursor.execute("SELECT ticket_id FROM ticket_signatures")
+            indexed = {row[0] for row in cursor.fetchall()}
+        else:
+            indexed = set()
+            for start in range(0, len(ticket_ids), 900):
+                chunk = ticket_ids[start:start + 900]
+                cursor.execute(f'''
+                    SELECT ticket_id FROM ticket_signatures
+                    WHERE ticket_id IN ({', '.join('?' * len(chunk))})
+                ''', chunk)
+                indexed.update(row[0] for row in cursor.fetchall())
+        conn.close()
+        return indexed
+
+    def refresh(self, ticket_ids: List[int], added: bool = False):
+        """Обновление индекса для измененных (added=True - только что созданных) заявок"""
+        tickets = self._fetch_tickets(ticket_ids)
+        indexed = set() if added else self._indexed_ids(ticket_ids)
+
+        to_add = {}
+        to_remove = []
+        for ticket_id in ticket_ids:
+            ticket = tickets.get(ticket_id)
+            if ticket is not None and ticket[2] in Config.DUPLICATE_INDEX_STATUSES:
+                # Текст заявок не редактируется, поэтому повторно индексировать не нужно
+                if ticket_id not in indexed:
+                    to_add[ticket_id] = ticket[:2]
+            elif ticket_id in indexed:
+                to_remove.append(ticket_id)
+
+        if to_add or to_remove:
+            self._apply(to_add, to_remove)
+
+    def sync(self):
+        """Сверка индекса со всеми шардами (после операций над неизвестным набором заявок)"""
+        statuses = Config.DUPLICATE_INDEX_STATUSES
+        open_ids = set()
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id FROM tickets WHERE status IN ({', '.join('?' * len(statuses))})", statuses)
+            open_ids.update(row[0] for row in cursor.fetchall())
+            conn.close()
+
+        indexed = self._indexed_ids()
+        missing = list(open_ids - indexed)
+        to_add = {ticket_id: ticket[:2] for ticket_id, ticket in self._fetch_tickets(missing).items()}
+        to_remove = indexed - open_ids
+
+        if to_add or to_remove:
+            self._apply(to_add, to_remove)
+        self._checked = True
+
+    def _index_built(self) -> bool:
+        """В индексе есть хотя бы одна заявка"""
+        conn = self.db_connection.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM ticket_signatures LIMIT 1")
+        built = cursor.fetchone() is not None
+        conn.close()
+        return built
+
+    def ensure_index(self):
+        """Первичное построение индекса для базы, созданной до его появления"""
+        if self._checked:
+            return
+
+        if self._index_built():
+            self._checked = True
+        else:
+            self.sync()
+
+    def ticket_changed(self, event: str, ticket_ids: Optional[List[int]]):
+        """Обработка изменения заявок в TicketSystem"""
+        if event == 'commented':
+            return
+
+        # Если индекс еще не построен, sync учтет и эти изменения
+        if ticket_ids is None or not (self._checked or self._index_built()):
+            self.sync()
+        else:
+            self._checked = True
+            self.refresh(list(ticket_ids), added=event == 'added')
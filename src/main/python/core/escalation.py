@@ -0,0 +1,215 @@
+# Эскалация заявок, нарушивших сроки SLA
+import heapq
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+from database.connection import DatabaseConnection
+from utils.helpers import now_timestamp, MICROSECONDS_PER_MINUTE, MICROSECONDS_PER_SECOND
+from config import Config
+
+
+@dataclass
+class SlaBreach:
+    """Нарушение срока SLA: kind - 'response' (реакция) или 'resolve' (решение)"""
+    ticket_id: int
+    kind: str
+    priority: str
+    created_at: int
+    deadline: int
+    new_priority: Optional[str] = None
+
+
+class SlaEscalator:
+    """Фоновый сервис, который находит заявки с истекшими сроками и эскалирует их.
+
+    Нарушения ищутся по индексу (status, priority, created_at): для каждого статуса
+    и приоритета читается только диапазон created_at <= now - срок, из которого
+    исключаются уже зафиксированные нарушения, поэтому стоимость проверки зависит
+    от числа нарушений, а не от размера таблицы. Время следующей проверки берется
+    из кучи ближайших сроков (самая старая еще не просроченная заявка каждой
+    группы находится одним поиском по тому же индексу).
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, ticket_system,
+                 hook: Optional[Callable[[SlaBreach], None]] = None,
+                 escalate_priority: bool = Config.SLA_ESCALATE_PRIORITY):
+        self.db_connection = db_connection
+        self.ticket_system = ticket_system
+        self.hook = hook
+        self.escalate_priority = escalate_priority
+
+        # Правила: (вид нарушения, статусы, срок в минутах по приоритетам)
+        self.rules = [
+            ('response', Config.SLA_RESPONSE_STATUSES, Config.SLA_RESPONSE_MINUTES),
+            ('resolve', Config.SLA_RESOLVE_STATUSES, Config.SLA_RESOLVE_MINUTES)
+        ]
+
+        # Ближайшие сроки: (срок, вид, статус или 'escalated', исходный приоритет, шард)
+        self._deadlines: List[Tuple[int, str, str, str, int]] = []
+        self._dirty = True
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        # Текст ошибки последней проверки в фоновом потоке (None - ошибок нет)
+        self.last_error = None
+
+        ticket_system.add_listener(self)
+
+    def _next_priority(self, priority: str) -> Optional[str]:
+        """Следующий по важности приоритет (None - приоритет уже наивысший)"""
+        rank = Config.PRIORITY_ORDER.get(priority)
+        if rank is None:
+            return None
+        for name, other in sorted(Config.PRIORITY_ORDER.items(), key=lambda item: -item[1]):
+            if other < rank:
+                return name
+        return None
+
+    def _find_breaches(self, now: int) -> List[SlaBreach]:
+        """Заявки, нарушившие сроки и еще не эскалированные по этому виду нарушения.
+
+        Сроки считаются от исходного приоритета: у эскалированной заявки он сохранен
+        в ticket_escalations, поэтому повышенный приоритет не сокращает ее сроки.
+        """
+        breaches = []
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            for kind, statuses, minutes in self.rules:
+                status_list = ', '.join('?' * len(statuses))
+                for priority, limit in minutes.items():
+                    deadline_offset = limit * MICROSECONDS_PER_MINUTE
+                    # Еще не эскалированные заявки - по индексу (status, priority, created_at)
+                    cursor.execute(f'''
+                        SELECT t.id, t.created_at FROM tickets t
+                        WHERE t.status IN ({status_list})
+                          AND t.priority = ? AND t.created_at <= ?
+                          AND NOT EXISTS (SELECT 1 FROM ticket_escalations e WHERE e.ticket_id = t.id)
+                    ''', (*statuses, priority, now - deadline_offset))
+                    rows = cursor.fetchall()
+                    # Заявки, эскалированные по другому виду нарушения, - с исходным приоритетом
+                    cursor.execute(f'''
+                        SELECT DISTINCT t.id, t.created_at FROM ticket_escalations e
+                        JOIN tickets t ON t.id = e.ticket_id
+                        WHERE e.priority = ? AND e.kind != ?
+                          AND t.status IN ({status_list}) AND t.created_at <= ?
+                          AND NOT EXISTS (SELECT 1 FROM ticket_escalations x
+                                          WHERE x.ticket_id = t.id AND x.kind = ?)
+                    ''', (priority, kind, *statuses, now - deadline_offset, kind))
+                    rows.extend(cursor.fetchall())
+                    for ticket_id, created_at in rows:
+                        breaches.append(SlaBreach(ticket_id, kind, priority, created_at,
+                                                  created_at + deadline_offset))
+            conn.close()
+
+        breaches.sort(key=lambda breach: breach.deadline)
+        return breaches
+
+    def _schedule(self, now: int):
+        """Перестроение кучи ближайших сроков"""
+        deadlines = []
+        for shard in range(self.db_connection.shard_count):
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            for kind, statuses, minutes in self.rules:
+                for priority, limit in minutes.items():
+                    deadline_offset = limit * MICROSECONDS_PER_MINUTE
+                    for status in statuses:
+                        # MIN по префиксу индекса - один поиск, без просмотра группы
+                        cursor.execute('''
+                            SELECT MIN(created_at) FROM tickets
+                            WHERE status = ? AND priority = ? AND created_at > ?
+                        ''', (status, priority, now - deadline_offset))
+                        created_at = cursor.fetchone()[0]
+                        if created_at is not None:
+                            deadlines.append((created_at + deadline_offset, kind, status, priority, shard))
+
+                    # Эскалированные заявки ждут срока по исходному приоритету
+                    cursor.execute(f'''
+                        SELECT MIN(t.created_at) FROM ticket_escalations e
+                        JOIN tickets t ON t.id = e.ticket_id
+                        WHERE e.priority = ? AND e.kind != ?
+                          AND t.status IN ({', '.join('?' * len(statuses))}) AND t.created_at > ?
+                          AND NOT EXISTS (SELECT 1 FROM ticket_escalations x
+                                          WHERE x.ticket_id = t.id AND x.kind = ?)
+                    ''', (priority, kind, *statuses, now - deadline_offset, kind))
+                    created_at = cursor.fetchone()[0]
+                    if created_at is not None:
+                        deadlines.append((created_at + deadline_offset, kind, 'escalated', priority, shard))
+            conn.close()
+
+        heapq.heapify(deadlines)
+        self._deadlines = deadlines
+
+    def scan(self, now: Optional[int] = None) -> List[SlaBreach]:
+        """Проверка сроков: эскалация новых нарушений и перепланирование"""
+        with self._lock:
+            now = now or now_timestamp()
+            self._dirty = False
+
+            escalated = []
+            for breach in self._find_breaches(now):
+                if self.escalate_priority:
+                    breach.new_priority = self._next_priority(breach.priority)
+                if self.ticket_system.escalate_ticket(breach.ticket_id, breach.kind, breach.priority,
+                                                      breach.new_priority):
+                    escalated.append(breach)
+                    if self.hook is not None:
+                        self.hook(breach)
+
+            self._schedule(now)
+            return escalated
+
+    def next_deadline(self) -> Optional[int]:
+        """Ближайший срок (микросекунды от эпохи) или None, если сроков нет"""
+        return self._deadlines[0][0] if self._deadlines else None
+
+    def ticket_changed(self, event: str, ticket_ids: Optional[List[int]]):
+        """Новые заявки и смена статусов меняют ближайшие сроки"""
+        if event in ('commented', 'escalated'):
+            return
+        self._dirty = True
+        self._wakeup.set()
+
+    def _run(self):
+        """Цикл фонового потока: проверка и сон до ближайшего срока"""
+        while not self._stopped.is_set():
+            deadline = self.next_deadline()
+            failed = False
+            if self._dirty or (deadline is not None and deadline <= now_timestamp()):
+                try:
+                    self.scan()
+                    self.last_error = None
+                except Exception as e:
+                    # Фоновый поток не пишет в консоль - ошибку показывает интерфейс
+                    self.last_error = str(e)
+                    failed = True
+                deadline = self.next_deadline()
+
+            # После ошибки в расписании остается прошедший срок: без паузы
+            # scan() повторялся бы без остановки, поэтому поток спит полный интервал
+            timeout = Config.SLA_ESCALATION_MAX_SLEEP
+            if deadline is not None and not failed:
+                timeout = min(timeout, max(0.0, (deadline - now_timestamp()) / MICROSECONDS_PER_SECOND))
+            woken = self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+            if not woken and timeout >= Config.SLA_ESCALATION_MAX_SLEEP:
+                # Заявки, измененные другими процессами, учитываются при периодической перепроверке
+                self._dirty = True
+
+    def start(self):
+        """Запуск фонового потока"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='sla-escalation', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Остановка фонового потока"""
+        if self._thread is not None:
+            self._stopped.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,148 @@
+# Составные запросы к заявкам: фильтры, сортировка и лимит
+import functools
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+from utils.helpers import timestamp_bound
+from config import Config
+
+# Колонки выборки (в порядке полей TicketWithRelations)
+SELECT_COLUMNS = '''
+    t.id, t.title, t.description, t.status, t.priority,
+    t.created_by, t.assigned_to, t.created_at, t.updated_at,
+    u1.full_name as created_by_name, u2.full_name as assigned_to_name
+'''
+
+# Колонки сортировки: позиция в строке результата (для слияния шардов)
+SORT_COLUMNS = {'id': 0, 'priority': 4, 'created_at': 7, 'updated_at': 8}
+
+
+@dataclass
+class TicketQuery:
+    """Фильтр списка заявок, компилируемый в один параметризованный SELECT.
+
+    statuses, priorities - допустимые значения (пусто - любые);
+    assigned_to - ID исполнителя, unassigned=True - только неназначенные;
+    created_from, created_to - границы даты создания включительно
+    (datetime, date, ISO-строка или микросекунды);
+    order_by - колонки из SORT_COLUMNS, "-колонка" - по убыванию; priority
+    сортируется по важности. Условия накладываются на сами колонки, поэтому
+    SQLite использует индексы (status, priority, created_at),
+    (assigned_to, status) и (created_by, created_at).
+    """
+    statuses: List[str] = field(default_factory=list)
+    priorities: List[str] = field(default_factory=list)
+    assigned_to: Optional[int] = None
+    unassigned: bool = False
+    created_by: Optional[int] = None
+    created_from: Any = None
+    created_to: Any = None
+    order_by: List[str] = field(default_factory=lambda: ['priority', '-created_at'])
+    limit: Optional[int] = None
+    include_archived: bool = False
+
+    def shape(self) -> tuple:
+        """Структура запроса без значений - ключ кеша скомпилированного SQL"""
+        for item in self.order_by:
+            if item.lstrip('-') not in SORT_COLUMNS:
+                raise ValueError(f"Сортировка по {item} не поддерживается")
+        return (len(self.statuses), len(self.priorities), self.assigned_to is not None, self.unassigned,
+                self.created_by is not None, self.created_from is not None, self.created_to is not None,
+                tuple(self.order_by), self.limit is not None, self.include_archived)
+
+    def params(self) -> List[Any]:
+        """Параметры запроса в порядке заполнителей SQL"""
+        params = list(self.statuses) + list(self.priorities)
+        if self.assigned_to is not None:
+            params.append(self.assigned_to)
+        if self.created_by is not None:
+            params.append(self.created_by)
+        if self.created_from is not None:
+            params.append(timestamp_bound(self.created_from))
+        if self.created_to is not None:
+            params.append(timestamp_bound(self.created_to, upper=True))
+        if self.limit is not None:
+            params.append(self.limit)
+        return params
+
+    def compile(self) -> Tuple[str, List[Any]]:
+        """SQL-запрос и параметры"""
+        return compile_shape(self.shape()), self.params()
+
+    def sort_key(self):
+        """Ключ сортировки строк результата, совпадающий с ORDER BY (для слияния шардов)"""
+        fields = []
+        for item in self.order_by:
+            column = item.lstrip('-')
+            fields.append((SORT_COLUMNS[column], column == 'priority', item.startswith('-')))
+
+        def key(row: tuple):
+            values = []
+            for index, is_priority, descending in fields:
+                value = row[index]
+                if is_priority:
+                    value = Config.PRIORITY_ORDER.get(value, len(Config.PRIORITY_ORDER) + 1)
+                values.append(-value if descending else value)
+            return tuple(values)
+
+        return key
+
+
+def _priority_rank_sql() -> str:
+    """Выражение ранга приоритета для ORDER BY"""
+    cases = " ".join(f"WHEN '{name}' THEN {rank}" for name, rank in Config.PRIORITY_ORDER.items())
+    return f"CASE t.priority {cases} ELSE {len(Config.PRIORITY_ORDER) + 1} END"
+
+
+@functools.lru_cache(maxsize=256)
+def compile_shape(shape: tuple) -> str:
+    """SQL для структуры запроса (кешируется: запросы с одинаковым набором фильтров
+    отличаются только параметрами)"""
+    (statuses, priorities, assigned, unassigned, created_by, created_from, created_to,
+     order_by, limit, include_archived) = shape
+
+    conditions = []
+    if statuses:
+        conditions.append(f"t.status IN ({', '.join('?' * statuses)})")
+    if priorities:
+        conditions.append(f"t.priority IN ({', '.join('?' * priorities)})")
+    if assigned:
+        conditions.append("t.assigned_to = ?")
+    if unassigned:
+        conditions.append("t.assigned_to IS NULL")
+    if created_by:
+        conditions.append("t.created_by = ?")
+    if created_from:
+        conditions.append("t.created_at >= ?")
+    if created_to:
+        conditions.append("t.created_at <= ?")
+
+    if include_archived:
+        source = '''(
+            SELECT id, title, description, status, priority, created_by, assigned_to, created_at, updated_at
+            FROM tickets
+            UNION ALL
+            SELECT id, title, description, status, priority, created_by, assigned_to, created_at, updated_at
+            FROM tickets_archive
+        )'''
+    else:
+        source = "tickets"
+
+    query = f'''
+        SELECT {SELECT_COLUMNS}
+        FROM {source} t
+        LEFT JOIN users u1 ON t.created_by = u1.id
+        LEFT JOIN users u2 ON t.assigned_to = u2.id
+    '''
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    order = []
+    for item in order_by:
+        column = item.lstrip('-')
+        expression = _priority_rank_sql() if column == 'priority' else f"t.{column}"
+        order.append(f"{expression} DESC" if item.startswith('-') else expression)
+    if order:
+        query += " ORDER BY " + ", ".join(order)
+    if limit:
+        query += " LIMIT ?"
+    return query
@@ -1,49 +1,227 @@
 # Логика работы с заявками
+import collections
+import dataclasses
+import heapq
+import itertools
 import sqlite3
-import datetime
-from typing import List, Optional
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from database.connection import DatabaseConnection
-from database.models import Ticket, TicketWithRelations
+from database.models import Comment, Ticket, TicketHistoryEntry, TicketWithRelations
+from core.query import TicketQuery
+from utils.helpers import now_timestamp
+from config import Config
 
 
 class TicketSystem:
-    def __init__(self, db_connection: DatabaseConnection, auth_manager):
+    # Колонки, по которым разрешено фильтровать массовые операции
+    BULK_FILTER_COLUMNS = ('status', 'priority', 'created_by', 'assigned_to')
+
+    def __init__(self, db_connection: DatabaseConnection, auth_manager, write_queue=None):
         self.db_connection = db_connection
         self.auth_manager = auth_manager
+        # Необязательная очередь записи (database/writer.py): изменения выполняет ее поток
+        self.write_queue = write_queue
+        self.listeners = []
+        # Подписчики (очереди диспетчера и т.п.) не потокобезопасны: уведомления из фоновых
+        # потоков копятся здесь и доставляются в потоке, создавшем TicketSystem (process_events)
+        self._owner_thread = threading.get_ident()
+        self._pending_events = collections.deque()
+
+    def add_listener(self, listener):
+        """Подписка на изменения заявок (объект с методом ticket_changed(event, ticket_ids))"""
+        self.listeners.append(listener)
+
+    def _notify(self, event: str, ticket_ids: Optional[List[int]]):
+        """Уведомление подписчиков; ticket_ids=None означает неизвестный набор заявок"""
+        if threading.get_ident() != self._owner_thread:
+            self._pending_events.append((event, ticket_ids))
+            return
+        for listener in self.listeners:
+            listener.ticket_changed(event, ticket_ids)
+
+    def process_events(self):
+        """Доставка уведомлений, накопленных фоновыми потоками (вызывается в основном потоке)"""
+        if threading.get_ident() != self._owner_thread:
+            return
+        while self._pending_events:
+            self._notify(*self._pending_events.popleft())
+
+    def _group_by_shard(self, ticket_ids: Iterable[int]) -> Dict[int, List[int]]:
+        """Группировка ID заявок по шардам"""
+        groups = {}
+        for ticket_id in ticket_ids:
+            groups.setdefault(self.db_connection.shard_for_ticket(ticket_id), []).append(ticket_id)
+        return groups
+
+    def _map_shards(self, func) -> List[Any]:
+        """Вызов func(shard) для всех шардов (параллельно, если шардов несколько)"""
+        shard_count = self.db_connection.shard_count
+        if shard_count == 1:
+            return [func(0)]
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=shard_count) as executor:
+            return list(executor.map(func, range(shard_count)))
+
+    def _fetch_shard(self, shard: int, query: str, params: Tuple[Any, ...] = ()) -> List[tuple]:
+        """Выполнение запроса в одном шарде"""
+        conn = self.db_connection.get_ticket_connection(shard)
+        try:
+            return conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+    def _write(self, shard: int, operation) -> Any:
+        """Выполнение operation(cursor) в транзакции шарда или через очередь записи"""
+        if self.write_queue is not None:
+            return self.write_queue.submit(shard, operation).result()
+
+        conn = self.db_connection.get_ticket_connection(shard)
+        cursor = conn.cursor()
+        try:
+            result = operation(cursor)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _ticket_sort_key(self, row: tuple):
+        """Ключ сортировки списка заявок: приоритет, затем новые выше"""
+        return Config.PRIORITY_ORDER.get(row[4], len(Config.PRIORITY_ORDER) + 1), -row[7]
 
-    def add_ticket(self, title: str, description: str, priority: str = "medium") -> int:
-        """Добавление новой заявки"""
+    def add_ticket(self, title: str, description: str, priority: str = "medium",
+                   duplicate_of: Optional[int] = None) -> int:
+        """Добавление новой заявки (duplicate_of - ID заявки, дубликатом которой она отмечается)"""
         if not self.auth_manager.is_authenticated():
             raise Exception("Пользователь не аутентифицирован")
 
-        conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
+        user_id = self.auth_manager.current_user.id
+        shard = self.db_connection.shard_for_user(user_id)
+
+        def operation(cursor):
+            current_time = now_timestamp()
+            new_id = self.db_connection.next_ticket_id(cursor, shard)
+
+            cursor.execute('''
+                INSERT INTO tickets (id, title, description, priority, created_by, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (new_id, title, description, priority, user_id, current_time, current_time))
+
+            ticket_id = cursor.lastrowid
+            if duplicate_of is not None:
+                self._link_duplicate(cursor, ticket_id, duplicate_of, current_time, user_id)
+            return ticket_id
 
-        current_time = datetime.datetime.now().isoformat()
+        ticket_id = self._write(shard, operation)
 
+        self._notify('added', [ticket_id])
+        return ticket_id
+
+    def add_tickets(self, tickets: Iterable[Tuple[str, str, str]]) -> List[int]:
+        """Добавление нескольких заявок (заголовок, описание, приоритет) одной транзакцией"""
+        if not self.auth_manager.is_authenticated():
+            raise Exception("Пользователь не аутентифицирован")
+
+        user_id = self.auth_manager.current_user.id
+        shard = self.db_connection.shard_for_user(user_id)
+
+        def operation(cursor) -> List[int]:
+            current_time = now_timestamp()
+            ticket_ids = []
+            for title, description, priority in tickets:
+                cursor.execute('''
+                    INSERT INTO tickets (id, title, description, priority, created_by, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (self.db_connection.next_ticket_id(cursor, shard), title, description, priority,
+                      user_id, current_time, current_time))
+                ticket_ids.append(cursor.lastrowid)
+            return ticket_ids
+
+        ticket_ids = self._write(shard, operation)
+
+        if ticket_ids:
+            self._notify('added', ticket_ids)
+        return ticket_ids
+
+    def _link_duplicate(self, cursor, ticket_id: int, duplicate_of: int, current_time: int,
+                        linked_by: Optional[int] = None):
+        """Отметка заявки как дубликата другой заявки"""
+        if linked_by is None:
+            linked_by = self.auth_manager.current_user.id
         cursor.execute('''
-            INSERT INTO tickets (title, description, priority, created_by, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (title, description, priority, self.auth_manager.current_user.id, current_time, current_time))
+            INSERT OR REPLACE INTO ticket_links (ticket_id, duplicate_of, linked_by, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', (ticket_id, duplicate_of, linked_by, current_time))
 
-        ticket_id = cursor.lastrowid
-        conn.commit()
+    def get_duplicate_of(self, ticket_id: int) -> Optional[int]:
+        """ID заявки, дубликатом которой отмечена заявка"""
+        conn = self.db_connection.get_ticket_connection(self.db_connection.shard_for_ticket(ticket_id))
+        cursor = conn.cursor()
+        cursor.execute("SELECT duplicate_of FROM ticket_links WHERE ticket_id = ?", (ticket_id,))
+        row = cursor.fetchone()
         conn.close()
+        return row[0] if row else None
 
-        return ticket_id
+    def merge_ticket(self, ticket_id: int, into_id: int):
+        """Объединение дубликата с основной заявкой: описание переносится комментарием, дубликат закрывается"""
+        if not self.auth_manager.is_support():
+            raise Exception("Только саппорт может объединять заявки")
+        if ticket_id == into_id:
+            raise Exception("Нельзя объединить заявку саму с собой")
+
+        ticket = self.get_ticket(ticket_id)
+        if not ticket or not self.get_ticket(into_id):
+            raise Exception("Заявка не найдена")
 
-    def get_all_tickets(self) -> List[TicketWithRelations]:
-        """Получение всех заявок"""
-        conn = self.db_connection.get_connection()
+        self.add_comment(into_id, f"Объединена заявка #{ticket_id} ({ticket.created_by_name}): "
+                                  f"{ticket.title}\n{ticket.description}")
+
+        conn = self.db_connection.get_ticket_connection(self.db_connection.shard_for_ticket(ticket_id))
         cursor = conn.cursor()
+        current_time = now_timestamp()
+
+        try:
+            self._link_duplicate(cursor, ticket_id, into_id, current_time)
+            self._record_changes(cursor, {'status': 'closed'}, "id = ?", [(ticket_id,)], current_time)
+            cursor.execute("UPDATE tickets SET status = 'closed', updated_at = ? WHERE id = ?",
+                           (current_time, ticket_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        self._notify('status', [ticket_id])
+
+    def _tickets_source(self, include_archived: bool) -> str:
+        """Источник заявок для SELECT: только рабочая таблица или вместе с архивом"""
+        if not include_archived:
+            return "tickets"
+        return '''(
+            SELECT id, title, description, status, priority, created_by, assigned_to, created_at, updated_at
+            FROM tickets
+            UNION ALL
+            SELECT id, title, description, status, priority, created_by, assigned_to, created_at, updated_at
+            FROM tickets_archive
+        )'''
+
+    def get_all_tickets(self, include_archived: bool = False) -> List[TicketWithRelations]:
+        """Получение всех заявок (архивные - только при include_archived=True)"""
+        source = self._tickets_source(include_archived)
 
         if self.auth_manager.is_support():
-            # Саппорт видит все заявки
-            cursor.execute('''
+            # Саппорт видит все заявки: запрос выполняется в каждом шарде параллельно,
+            # отсортированные результаты сливаются k-way слиянием
+            query = f'''
                 SELECT t.id, t.title, t.description, t.status, t.priority, 
                        t.created_by, t.assigned_to, t.created_at, t.updated_at,
                        u1.full_name as created_by_name, u2.full_name as assigned_to_name
-                FROM tickets t
+                FROM {source} t
                 LEFT JOIN users u1 ON t.created_by = u1.id
                 LEFT JOIN users u2 ON t.assigned_to = u2.id
                 ORDER BY 
@@ -53,14 +231,20 @@ class TicketSystem:
                         WHEN 'low' THEN 3
                     END,
                     t.created_at DESC
-            ''')
+            '''
+            shard_rows = self._map_shards(lambda shard: self._fetch_shard(shard, query))
+            if len(shard_rows) == 1:
+                tickets_data = shard_rows[0]
+            else:
+                tickets_data = heapq.merge(*shard_rows, key=self._ticket_sort_key)
         else:
-            # Пользователь видит только свои заявки
-            cursor.execute('''
+            # Пользователь видит только свои заявки (все они в одном шарде)
+            user_id = self.auth_manager.current_user.id
+            tickets_data = self._fetch_shard(self.db_connection.shard_for_user(user_id), f'''
                 SELECT t.id, t.title, t.description, t.status, t.priority, 
                        t.created_by, t.assigned_to, t.created_at, t.updated_at,
                        u1.full_name as created_by_name, u2.full_name as assigned_to_name
-                FROM tickets t
+                FROM {source} t
                 LEFT JOIN users u1 ON t.created_by = u1.id
                 LEFT JOIN users u2 ON t.assigned_to = u2.id
                 WHERE t.created_by = ?
@@ -71,10 +255,7 @@ class TicketSystem:
                         WHEN 'low' THEN 3
                     END,
                     t.created_at DESC
-            ''', (self.auth_manager.current_user.id,))
-
-        tickets_data = cursor.fetchall()
-        conn.close()
+            ''', (user_id,))
 
         tickets = []
         for ticket_data in tickets_data:
@@ -82,27 +263,72 @@ class TicketSystem:
 
         return tickets
 
-    def get_ticket(self, ticket_id: int) -> Optional[TicketWithRelations]:
-        """Получение конкретной заявки по ID"""
-        conn = self.db_connection.get_connection()
+    def find_tickets(self, query: TicketQuery) -> List[TicketWithRelations]:
+        """Заявки по фильтру, сортировке и лимиту; пользователь видит только свои заявки"""
+        if not self.auth_manager.is_authenticated():
+            raise Exception("Пользователь не аутентифицирован")
+
+        if not self.auth_manager.is_support():
+            query = dataclasses.replace(query, created_by=self.auth_manager.current_user.id)
+
+        sql, params = query.compile()
+        if query.created_by is not None:
+            # Заявки автора лежат в одном шарде
+            shard_rows = [self._fetch_shard(self.db_connection.shard_for_user(query.created_by), sql, params)]
+        else:
+            shard_rows = self._map_shards(lambda shard: self._fetch_shard(shard, sql, params))
+
+        if len(shard_rows) == 1:
+            rows = shard_rows[0]
+        else:
+            # Каждый шард вернул не больше limit строк в нужном порядке - сливаем и обрезаем
+            rows = itertools.islice(heapq.merge(*shard_rows, key=query.sort_key()), query.limit)
+
+        return [TicketWithRelations(*row) for row in rows]
+
+    def count_tickets(self) -> Dict[str, Any]:
+        """Число заявок по статусам и приоритетам (пользователь - только по своим заявкам)"""
+        if not self.auth_manager.is_authenticated():
+            raise Exception("Пользователь не аутентифицирован")
+
+        query = "SELECT status, priority, COUNT(*) FROM tickets"
+        if self.auth_manager.is_support():
+            shard_rows = self._map_shards(lambda shard: self._fetch_shard(shard, query + " GROUP BY status, priority"))
+        else:
+            user_id = self.auth_manager.current_user.id
+            shard_rows = [self._fetch_shard(self.db_connection.shard_for_user(user_id),
+                                            query + " WHERE created_by = ? GROUP BY status, priority", (user_id,))]
+
+        by_status = {}
+        by_priority = {}
+        for rows in shard_rows:
+            for status, priority, count in rows:
+                by_status[status] = by_status.get(status, 0) + count
+                by_priority[priority] = by_priority.get(priority, 0) + count
+        return {'by_status': by_status, 'by_priority': by_priority, 'total': sum(by_status.values())}
+
+    def get_ticket(self, ticket_id: int, include_archived: bool = False) -> Optional[TicketWithRelations]:
+        """Получение конкретной заявки по ID (архивные - только при include_archived=True)"""
+        conn = self.db_connection.get_ticket_connection(self.db_connection.shard_for_ticket(ticket_id))
         cursor = conn.cursor()
+        source = self._tickets_source(include_archived)
 
         if self.auth_manager.is_support():
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT t.id, t.title, t.description, t.status, t.priority, 
                        t.created_by, t.assigned_to, t.created_at, t.updated_at,
                        u1.full_name as created_by_name, u2.full_name as assigned_to_name
-                FROM tickets t
+                FROM {source} t
                 LEFT JOIN users u1 ON t.created_by = u1.id
                 LEFT JOIN users u2 ON t.assigned_to = u2.id
                 WHERE t.id = ?
             ''', (ticket_id,))
         else:
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT t.id, t.title, t.description, t.status, t.priority, 
                        t.created_by, t.assigned_to, t.created_at, t.updated_at,
                        u1.full_name as created_by_name, u2.full_name as assigned_to_name
-                FROM tickets t
+                FROM {source} t
                 LEFT JOIN users u1 ON t.created_by = u1.id
                 LEFT JOIN users u2 ON t.assigned_to = u2.id
                 WHERE t.id = ? AND t.created_by = ?
@@ -120,52 +346,435 @@ class TicketSystem:
         if not self.auth_manager.is_authenticated():
             raise Exception("Пользователь не аутентифицирован")
 
-        conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
+        actor_id = self.auth_manager.current_user.id
 
-        current_time = datetime.datetime.now().isoformat()
+        def operation(cursor):
+            current_time = now_timestamp()
 
-        cursor.execute('''
-            UPDATE tickets 
-            SET status = ?, updated_at = ?
-            WHERE id = ?
-        ''', (status, current_time, ticket_id))
+            self._record_changes(cursor, {'status': status}, "id = ?", [(ticket_id,)], current_time, actor_id)
+            cursor.execute('''
+                UPDATE tickets 
+                SET status = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, current_time, ticket_id))
 
-        conn.commit()
-        conn.close()
+        self._write(self.db_connection.shard_for_ticket(ticket_id), operation)
+
+        self._notify('status', [ticket_id])
 
     def assign_ticket(self, ticket_id: int, user_id: int):
         """Назначение заявки на саппорта"""
         if not self.auth_manager.is_support():
             raise Exception("Только саппорт может назначать заявки")
 
-        conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
+        actor_id = self.auth_manager.current_user.id
 
-        current_time = datetime.datetime.now().isoformat()
+        def operation(cursor):
+            current_time = now_timestamp()
 
-        cursor.execute('''
-            UPDATE tickets 
-            SET assigned_to = ?, updated_at = ?, status = 'in_progress'
-            WHERE id = ?
-        ''', (user_id, current_time, ticket_id))
+            self._record_changes(cursor, {'assigned_to': user_id, 'status': 'in_progress'},
+                                 "id = ?", [(ticket_id,)], current_time, actor_id)
+            cursor.execute('''
+                UPDATE tickets 
+                SET assigned_to = ?, updated_at = ?, status = 'in_progress'
+                WHERE id = ?
+            ''', (user_id, current_time, ticket_id))
 
-        conn.commit()
-        conn.close()
+        self._write(self.db_connection.shard_for_ticket(ticket_id), operation)
+
+        self._notify('assigned', [ticket_id])
 
     def delete_ticket(self, ticket_id: int):
         """Удаление заявки"""
         if not self.auth_manager.is_authenticated():
             raise Exception("Пользователь не аутентифицирован")
 
-        conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
+        is_support = self.auth_manager.is_support()
+        user_id = self.auth_manager.current_user.id
 
-        if self.auth_manager.is_support():
-            cursor.execute('DELETE FROM tickets WHERE id = ?', (ticket_id,))
+        def operation(cursor):
+            if is_support:
+                cursor.execute('DELETE FROM tickets WHERE id = ?', (ticket_id,))
+            else:
+                cursor.execute('DELETE FROM tickets WHERE id = ? AND created_by = ?', (ticket_id, user_id))
+
+            if cursor.rowcount:
+                cursor.execute('DELETE FROM comments WHERE ticket_id = ?', (ticket_id,))
+                cursor.execute('DELETE FROM ticket_escalations WHERE ticket_id = ?', (ticket_id,))
+                self._delete_attachments(cursor, ticket_id)
+
+        self._write(self.db_connection.shard_for_ticket(ticket_id), operation)
+
+        self._notify('deleted', [ticket_id])
+
+    def _delete_attachments(self, cursor, ticket_id: int):
+        """Удаление вложений заявки: метаданные и содержимое, на которое больше нет ссылок"""
+        schema = self.db_connection.shared_schema
+        cursor.execute(f'''
+            UPDATE {schema}.attachment_blobs
+            SET refs = refs - (SELECT COUNT(*) FROM ticket_attachments a
+                               WHERE a.ticket_id = ? AND a.hash = attachment_blobs.hash)
+            WHERE hash IN (SELECT hash FROM ticket_attachments WHERE ticket_id = ?)
+        ''', (ticket_id, ticket_id))
+        cursor.execute(f'''
+            DELETE FROM {schema}.attachment_blobs
+            WHERE refs <= 0 AND hash IN (SELECT hash FROM ticket_attachments WHERE ticket_id = ?)
+        ''', (ticket_id,))
+        cursor.execute('DELETE FROM ticket_attachments WHERE ticket_id = ?', (ticket_id,))
+
+    def escalate_ticket(self, ticket_id: int, kind: str, priority: str,
+                        new_priority: Optional[str] = None) -> bool:
+        """Фиксация нарушения SLA вида kind и повышение приоритета до new_priority.
+
+        priority - исходный приоритет заявки, от которого считаются сроки.
+
+        Выполняется сервисом эскалации, который работает только в сессии саппорта;
+        изменение записывается от имени системы (actor_id в истории - NULL).
+        Возвращает False, если нарушение уже зафиксировано (например, другим процессом).
+        """
+        if not self.auth_manager.is_support():
+            raise Exception("Только саппорт может эскалировать заявки")
+
+        def operation(cursor) -> bool:
+            current_time = now_timestamp()
+            cursor.execute('''
+                INSERT OR IGNORE INTO ticket_escalations (ticket_id, kind, priority, escalated_at)
+                VALUES (?, ?, ?, ?)
+            ''', (ticket_id, kind, priority, current_time))
+            if not cursor.rowcount:
+                return False
+
+            if new_priority is not None:
+                # Повышается только исходный приоритет: повторная эскалация (по другому виду
+                # нарушения) и приоритет, измененный вручную, не трогаются
+                cursor.execute('''
+                    INSERT INTO ticket_history (ticket_id, field, old_value, new_value, actor_id, ts)
+                    SELECT id, 'priority', priority, ?, NULL, ? FROM tickets
+                    WHERE id = ? AND priority = ? AND priority IS NOT ?
+                ''', (new_priority, current_time, ticket_id, priority, new_priority))
+                cursor.execute("UPDATE tickets SET priority = ?, updated_at = ? WHERE id = ? AND priority = ?",
+                               (new_priority, current_time, ticket_id, priority))
+            return True
+
+        escalated = self._write(self.db_connection.shard_for_ticket(ticket_id), operation)
+        if escalated:
+            self._notify('escalated', [ticket_id])
+        return escalated
+
+    def _build_bulk_filter(self, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """Формирование условия WHERE для массовых операций"""
+        conditions = []
+        params = []
+        for column, value in filters.items():
+            if column not in self.BULK_FILTER_COLUMNS:
+                raise ValueError(f"Недопустимое поле фильтра: {column}")
+            if value is None:
+                conditions.append(f"{column} IS NULL")
+            elif isinstance(value, (list, tuple, set)):
+                values = list(value)
+                if not values:
+                    conditions.append("0")
+                    continue
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+
+        if not conditions:
+            raise ValueError("Фильтр массовой операции не может быть пустым")
+        return " AND ".join(conditions), params
+
+    def _record_history(self, cursor, field: str, where: str, rows: List[Tuple[Any, ...]], current_time: int,
+                        actor_id: Optional[int] = None):
+        """Запись старого и нового значения поля в ticket_history перед UPDATE, в той же транзакции.
+
+        rows - кортежи (новое значение, *параметры условия where); строки, где значение
+        не меняется, в историю не попадают. actor_id по умолчанию - текущий пользователь.
+        """
+        if actor_id is None:
+            actor_id = self.auth_manager.current_user.id
+        cursor.executemany(f'''
+            INSERT INTO ticket_history (ticket_id, field, old_value, new_value, actor_id, ts)
+            SELECT id, '{field}', {field}, ?, ?, ? FROM tickets
+            WHERE ({where}) AND {field} IS NOT ?
+        ''', [(row[0], actor_id, current_time, *row[1:], row[0]) for row in rows])
+
+    def _record_changes(self, cursor, changes: Dict[str, Any], where: str,
+                        where_rows: List[Tuple[Any, ...]], current_time: int, actor_id: Optional[int] = None):
+        """Запись в историю одинаковых новых значений полей для всех строк условия"""
+        for field, new_value in changes.items():
+            self._record_history(cursor, field, where, [(new_value, *params) for params in where_rows],
+                                 current_time, actor_id)
+
+    def _bulk_update(self, event: str, changes: Dict[str, Any],
+                     ticket_ids: Optional[Iterable[int]], filters: Optional[Dict[str, Any]]) -> int:
+        """Массовое обновление заявок по списку ID или фильтру (одна транзакция на шард)"""
+        if ticket_ids is None and filters is None:
+            raise ValueError("Нужно указать список ID или фильтр")
+
+        if ticket_ids is not None:
+            ticket_ids = list(dict.fromkeys(ticket_ids))
+            shard_ids = self._group_by_shard(ticket_ids)
+            shards = list(shard_ids)
         else:
-            cursor.execute('DELETE FROM tickets WHERE id = ? AND created_by = ?',
-                           (ticket_id, self.auth_manager.current_user.id))
+            where, params = self._build_bulk_filter(filters)
+            shards = range(self.db_connection.shard_count)
+
+        current_time = now_timestamp()
+        assignments = ", ".join(f"{column} = ?" for column in changes) + ", updated_at = ?"
+        values = tuple(changes.values()) + (current_time,)
+
+        # Одна транзакция на шард (в обычном режиме шард один)
+        affected = 0
+        for shard in shards:
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            try:
+                if ticket_ids is not None:
+                    where_rows = [(ticket_id,) for ticket_id in shard_ids[shard]]
+                    self._record_changes(cursor, changes, "id = ?", where_rows, current_time)
+                    cursor.executemany(
+                        f"UPDATE tickets SET {assignments} WHERE id = ?",
+                        [values + row for row in where_rows]
+                    )
+                else:
+                    self._record_changes(cursor, changes, where, [tuple(params)], current_time)
+                    cursor.execute(f"UPDATE tickets SET {assignments} WHERE {where}", list(values) + params)
+
+                affected += cursor.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+        self._notify(event, ticket_ids)
+        return affected
+
+    def bulk_update_status(self, status: str, ticket_ids: Optional[Iterable[int]] = None,
+                           filters: Optional[Dict[str, Any]] = None) -> int:
+        """Массовое изменение статуса заявок, возвращает число измененных заявок"""
+        if not self.auth_manager.is_support():
+            raise Exception("Только саппорт может выполнять массовые операции")
+
+        return self._bulk_update('status', {'status': status}, ticket_ids, filters)
+
+    def bulk_assign(self, user_id: int, ticket_ids: Optional[Iterable[int]] = None,
+                    filters: Optional[Dict[str, Any]] = None) -> int:
+        """Массовое назначение заявок на саппорта, возвращает число назначенных заявок"""
+        if not self.auth_manager.is_support():
+            raise Exception("Только саппорт может назначать заявки")
+
+        return self._bulk_update('assigned', {'assigned_to': user_id, 'status': 'in_progress'},
+                                 ticket_ids, filters)
+
+    def assign_tickets(self, assignments: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Назначение пар (ID заявки, ID саппорта) одной транзакцией на шард, только для открытых неназначенных заявок.
+
+        Возвращает примененные пары: заявки, которые успели назначить или закрыть, пропускаются.
+        """
+        if not self.auth_manager.is_support():
+            raise Exception("Только саппорт может назначать заявки")
+
+        current_time = now_timestamp()
+        user_for_ticket = dict(assignments)
+
+        applied = []
+        for shard, ticket_ids in self._group_by_shard(user_for_ticket).items():
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+            try:
+                where = "id = ? AND status = 'open' AND assigned_to IS NULL"
+                self._record_history(cursor, 'assigned_to', where,
+                                     [(user_for_ticket[ticket_id], ticket_id) for ticket_id in ticket_ids],
+                                     current_time)
+                self._record_history(cursor, 'status', where,
+                                     [('in_progress', ticket_id) for ticket_id in ticket_ids], current_time)
+                # UPDATE по одной паре: rowcount показывает, применено ли назначение
+                shard_applied = []
+                for ticket_id in ticket_ids:
+                    cursor.execute(f'''
+                        UPDATE tickets 
+                        SET assigned_to = ?, updated_at = ?, status = 'in_progress'
+                        WHERE {where}
+                    ''', (user_for_ticket[ticket_id], current_time, ticket_id))
+                    if cursor.rowcount:
+                        shard_applied.append((ticket_id, user_for_ticket[ticket_id]))
+
+                conn.commit()
+                applied.extend(shard_applied)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+        if applied:
+            self._notify('assigned', [ticket_id for ticket_id, _ in applied])
+        return applied
+
+    def add_comment(self, ticket_id: int, body: str) -> int:
+        """Добавление комментария (ответа) к заявке"""
+        if not self.auth_manager.is_authenticated():
+            raise Exception("Пользователь не аутентифицирован")
+
+        # Пользователь может писать только в свои заявки, саппорт - в любые
+        if not self.auth_manager.is_support() and not self.get_ticket(ticket_id):
+            raise Exception(f"Заявка #{ticket_id} не найдена")
+
+        conn = self.db_connection.get_ticket_connection(self.db_connection.shard_for_ticket(ticket_id))
+        cursor = conn.cursor()
+
+        current_time = now_timestamp()
 
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        try:
+            cursor.execute('''
+                INSERT INTO comments (ticket_id, author_id, body, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (ticket_id, self.auth_manager.current_user.id, body, current_time))
+            comment_id = cursor.lastrowid
+
+            cursor.execute('UPDATE tickets SET updated_at = ? WHERE id = ?', (current_time, ticket_id))
+            if cursor.rowcount == 0:
+                raise Exception(f"Заявка #{ticket_id} не найдена")
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        self._notify('commented', [ticket_id])
+        return comment_id
+
+    def get_comments(self, ticket_id: int, limit: int = Config.COMMENTS_PAGE_SIZE,
+                     after: Optional[Comment] = None) -> List[Comment]:
+        """Страница обсуждения заявки в хронологическом порядке (after - последний комментарий предыдущей страницы)"""
+        if not self.auth_manager.is_support() and not self.get_ticket(ticket_id):
+            return []
+
+        conn = self.db_connection.get_ticket_connection(self.db_connection.shard_for_ticket(ticket_id))
+        cursor = conn.cursor()
+
+        # Постраничная выборка по ключу (created_at, id) идет по индексу (ticket_id, created_at)
+        after_created_at, after_id = (after.created_at, after.id) if after else (-1, -1)
+        cursor.execute('''
+            SELECT c.id, c.ticket_id, c.author_id, c.body, c.created_at, u.full_name
+            FROM comments c
+            LEFT JOIN users u ON c.author_id = u.id
+            WHERE c.ticket_id = ? AND (c.created_at, c.id) > (?, ?)
+            ORDER BY c.created_at, c.id
+            LIMIT ?
+        ''', (ticket_id, after_created_at, after_id, limit))
+
+        comments = [Comment(*row) for row in cursor.fetchall()]
+        conn.close()
+        return comments
+
+    def attach_comment_stats(self, tickets: List[TicketWithRelations]) -> List[TicketWithRelations]:
+        """Заполняет число комментариев и время последнего ответа для страницы заявок"""
+        by_id = {ticket.id: ticket for ticket in tickets}
+
+        # Один агрегирующий запрос на шард (ID передаются пачками из-за лимита параметров)
+        for shard, ticket_ids in self._group_by_shard(by_id).items():
+            conn = self.db_connection.get_ticket_connection(shard)
+            cursor = conn.cursor()
+
+            for start in range(0, len(ticket_ids), 900):
+                chunk = ticket_ids[start:start + 900]
+                cursor.execute(f'''
+                    SELECT ticket_id, COUNT(*), MAX(created_at)
+                    FROM comments
+                    WHERE ticket_id IN ({', '.join('?' * len(chunk))})
+                    GROUP BY ticket_id
+                ''', chunk)
+                for ticket_id, count, last_reply_at in cursor.fetchall():
+                    by_id[ticket_id].comment_count = count
+                    by_id[ticket_id].last_reply_at = last_reply_at
+
+            conn.close()
+
+        return tickets
+
+    def get_ticket_history(self, ticket_id: int, start_ts: Optional[int] = None,
+                           end_ts: Optional[int] = None) -> List[TicketHistoryEntry]:
+        """Хронология изменений заявки (по индексу (ticket_id, ts)), при необходимости - за период"""
+        if not self.auth_manager.is_support() and not self.get_ticket(ticket_id, include_archived=True):
+            return []
+
+        conn = self.db_connection.get_ticket_connection(self.db_connection.shard_for_ticket(ticket_id))
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT h.id, h.ticket_id, h.field, h.old_value, h.new_value, h.actor_id, h.ts, u.full_name
+            FROM ticket_history h
+            LEFT JOIN users u ON h.actor_id = u.id
+            WHERE h.ticket_id = ? AND h.ts BETWEEN ? AND ?
+            ORDER BY h.ts, h.id
+        ''', (ticket_id, -1 if start_ts is None else start_ts, end_ts if end_ts is not None else 2 ** 63 - 1))
+
+        history = [TicketHistoryEntry(*row) for row in cursor.fetchall()]
+        conn.close()
+        return history
+
+    def get_history_between(self, start_ts: int, end_ts: int,
+                            limit: Optional[int] = None) -> List[TicketHistoryEntry]:
+        """Все изменения заявок за период (по индексу ts), из всех шардов в порядке времени"""
+        if not self.auth_manager.is_support():
+            raise Exception("Только саппорт может просматривать общую историю изменений")
+
+        query = f'''
+            SELECT h.id, h.ticket_id, h.field, h.old_value, h.new_value, h.actor_id, h.ts, u.full_name
+            FROM ticket_history h
+            LEFT JOIN users u ON h.actor_id = u.id
+            WHERE h.ts BETWEEN ? AND ?
+            ORDER BY h.ts, h.id
+            {'LIMIT ?' if limit is not None else ''}
+        '''
+        params = (start_ts, end_ts) + ((limit,) if limit is not None else ())
+
+        # Каждый шард уже отсортирован по ts - достаточно слияния
+        merged = heapq.merge(*self._map_shards(lambda shard: self._fetch_shard(shard, query, params)),
+                             key=lambda row: (row[6], row[0]))
+        history = [TicketHistoryEntry(*row) for row in merged]
+        return history[:limit] if limit is not None else history
+
+    def get_ticket_state_at(self, ticket_id: int, ts: int) -> Optional[TicketWithRelations]:
+        """Состояние заявки на момент ts: текущая запись с откатом более поздних изменений из истории"""
+        ticket = self.get_ticket(ticket_id, include_archived=True)
+        if ticket is None or ts < ticket.created_at:
+            return None
+
+        conn = self.db_connection.get_ticket_connection(self.db_connection.shard_for_ticket(ticket_id))
+        cursor = conn.cursor()
+
+        # Читаются только изменения после ts - от новых к старым
+        cursor.execute('''
+            SELECT field, old_value FROM ticket_history
+            WHERE ticket_id = ? AND ts > ?
+            ORDER BY ts DESC, id DESC
+        ''', (ticket_id, ts))
+        rows = cursor.fetchall()
+        for field, old_value in rows:
+            setattr(ticket, field, old_value)
+
+        if rows:
+            # Время последнего изменения к моменту ts: история или комментарии
+            cursor.execute('''
+                SELECT MAX(last_change) FROM (
+                    SELECT MAX(ts) AS last_change FROM ticket_history WHERE ticket_id = ? AND ts <= ?
+                    UNION ALL
+                    SELECT MAX(created_at) FROM comments WHERE ticket_id = ? AND created_at <= ?
+                )
+            ''', (ticket_id, ts, ticket_id, ts))
+            ticket.updated_at = cursor.fetchone()[0] or ticket.created_at
+
+            cursor.execute("SELECT full_name FROM users WHERE id = ?", (ticket.assigned_to,))
+            row = cursor.fetchone()
+            ticket.assigned_to_name = row[0] if row else None
+
+        conn.close()
+        return ticket
@@ -1,11 +1,21 @@
 # Подключение к базе данных и инициализация
 import sqlite3
-import datetime
 import hashlib
+from typing import Optional
 from config import Config
+from utils.helpers import iso_to_timestamp, now_timestamp, MICROSECONDS_PER_DAY, MICROSECONDS_PER_SECOND
 
 
 class DatabaseConnection:
+    # Версия схемы хранится в PRAGMA user_version
+    SCHEMA_VERSION = 13
+
+    # Хранилище заявок может быть разбито на шарды (см. database/sharding.py);
+    # в обычном режиме все заявки лежат в одной базе - шард 0
+    shard_count = 1
+    # Имя схемы общей базы в соединении get_ticket_connection (для blobopen)
+    shared_schema = 'main'
+
     def __init__(self, db_path: str = Config.DB_NAME):
         self.db_path = db_path
 
@@ -13,11 +23,61 @@ class DatabaseConnection:
         """Возвращает соединение с базой данных"""
         return sqlite3.connect(self.db_path)
 
+    def get_ticket_connection(self, shard: int = 0):
+        """Возвращает соединение с базой, в которой хранятся заявки шарда"""
+        return self.get_connection()
+
+    def shard_for_user(self, user_id: int) -> int:
+        """Номер шарда для заявок пользователя"""
+        return 0
+
+    def shard_for_ticket(self, ticket_id: int) -> int:
+        """Номер шарда, в котором хранится заявка"""
+        return 0
+
+    def next_ticket_id(self, cursor, shard: int) -> Optional[int]:
+        """ID для новой заявки (None - выдается AUTOINCREMENT)"""
+        return None
+
     def init_database(self):
         """Инициализация базы данных"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        # Теплый старт: схема уже актуальна, DDL и проверка пользователей не нужны
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if version == self.SCHEMA_VERSION:
+            conn.close()
+            return
+
+        self._set_journal_mode(cursor)
+        self._create_users_table(cursor)
+        self._create_ticket_tables(cursor)
+
+        conn.commit()
+
+        if version < 1:
+            self._migrate_epoch_timestamps(conn)
+
+        self._create_indexes(cursor)
+        self._create_change_log(cursor, ('users', 'tickets'))
+        self._create_duplicate_index(cursor, version)
+        self._create_attachment_storage(cursor)
+        self._create_sla_rollups(cursor)
+        cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+        conn.commit()
+        conn.close()
+
+        self._create_default_users()
+
+    def _set_journal_mode(self, cursor):
+        """Включение журнала WAL: читатели (в т.ч. экспорт) не блокируют писателей"""
+        cursor.execute(f"PRAGMA journal_mode = {Config.JOURNAL_MODE}")
+
+    def _create_users_table(self, cursor):
+        """Создание таблицы пользователей"""
         # Таблица пользователей
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -26,10 +86,12 @@ class DatabaseConnection:
                 password_hash TEXT NOT NULL,
                 role TEXT NOT NULL DEFAULT 'user',
                 full_name TEXT NOT NULL,
-                created_at TEXT NOT NULL
+                created_at INTEGER NOT NULL
             )
         ''')
 
+    def _create_ticket_tables(self, cursor):
+        """Создание таблиц заявок и архива"""
         # Таблица заявок
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS tickets (
@@ -40,17 +102,414 @@ class DatabaseConnection:
                 priority TEXT NOT NULL DEFAULT 'medium',
                 created_by INTEGER NOT NULL,
                 assigned_to INTEGER,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
                 FOREIGN KEY (created_by) REFERENCES users(id),
                 FOREIGN KEY (assigned_to) REFERENCES users(id)
             )
         ''')
 
-        conn.commit()
-        conn.close()
+        # Архив закрытых и решенных заявок (та же структура + время архивации)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tickets_archive (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                status TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                created_by INTEGER NOT NULL,
+                assigned_to INTEGER,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
+                archived_at INTEGER NOT NULL,
+                FOREIGN KEY (created_by) REFERENCES users(id),
+                FOREIGN KEY (assigned_to) REFERENCES users(id)
+            )
+        ''')
 
-        self._create_default_users()
+        # Комментарии и ответы по заявкам (хранятся рядом с заявкой, в том же шарде)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS comments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket_id INTEGER NOT NULL,
+                author_id INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                FOREIGN KEY (ticket_id) REFERENCES tickets(id),
+                FOREIGN KEY (author_id) REFERENCES users(id)
+            )
+        ''')
+
+        # История изменений полей заявок (только добавление записей)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                old_value,
+                new_value,
+                actor_id INTEGER,
+                ts INTEGER NOT NULL,
+                FOREIGN KEY (actor_id) REFERENCES users(id)
+            )
+        ''')
+        # Связи "заявка - дубликат другой заявки" (хранятся в шарде дубликата)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_links (
+                ticket_id INTEGER PRIMARY KEY,
+                duplicate_of INTEGER NOT NULL,
+                linked_by INTEGER,
+                created_at INTEGER NOT NULL,
+                FOREIGN KEY (linked_by) REFERENCES users(id)
+            )
+        ''')
+        # Вложения заявок: метаданные; содержимое - в attachment_blobs общей базы по хешу
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_attachments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket_id INTEGER NOT NULL,
+                file_name TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                uploaded_by INTEGER,
+                created_at INTEGER NOT NULL,
+                FOREIGN KEY (ticket_id) REFERENCES tickets(id),
+                FOREIGN KEY (uploaded_by) REFERENCES users(id)
+            )
+        ''')
+        # Зафиксированные нарушения SLA: kind - 'response' (срок реакции) или 'resolve' (срок решения)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_escalations (
+                ticket_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                escalated_at INTEGER NOT NULL,
+                PRIMARY KEY (ticket_id, kind)
+            ) WITHOUT ROWID
+        ''')
+
+        for operation in ('UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_ticket_history_no_{operation.lower()}
+                BEFORE {operation} ON ticket_history
+                BEGIN
+                    SELECT RAISE(ABORT, 'История заявок доступна только для добавления');
+                END
+            ''')
+
+    def _create_indexes(self, cursor):
+        """Создание индексов"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_created_by_created_at ON tickets (created_by, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_status_created_at ON tickets (status, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_created_at ON tickets (created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_updated_at ON tickets (updated_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_assigned_to_status ON tickets (assigned_to, status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_status_updated_at ON tickets (status, updated_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_status_priority_created_at '
+                       'ON tickets (status, priority, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_archive_created_by ON tickets_archive (created_by, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_ticket_created_at ON comments (ticket_id, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticket_history_ticket_ts ON ticket_history (ticket_id, ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticket_history_ts ON ticket_history (ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticket_attachments_ticket ON ticket_attachments (ticket_id)')
+
+    def _create_sla_rollups(self, cursor):
+        """Дневные агрегаты для SLA-аналитики и триггеры, которые обновляют их при изменении заявок"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ticket_daily_stats'")
+        exists = cursor.fetchone() is not None
+
+        # Открытые, решенные, переоткрытые и удаленные до решения заявки по дням (UTC)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_daily_stats (
+                day INTEGER PRIMARY KEY,
+                opened INTEGER NOT NULL DEFAULT 0,
+                closed INTEGER NOT NULL DEFAULT 0,
+                reopened INTEGER NOT NULL DEFAULT 0,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        # Гистограмма времени решения по дню решения, приоритету и исполнителю (0 - не назначена)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_resolution_stats (
+                day INTEGER NOT NULL,
+                priority TEXT NOT NULL,
+                assignee INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                resolved INTEGER NOT NULL,
+                total_seconds INTEGER NOT NULL,
+                PRIMARY KEY (day, priority, assignee, bucket)
+            ) WITHOUT ROWID
+        ''')
+
+        # Верхние границы корзин гистограммы в секундах (последняя - без ограничения)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sla_buckets (
+                bucket INTEGER PRIMARY KEY,
+                upper_seconds INTEGER NOT NULL
+            )
+        ''')
+        bounds = [int(Config.SLA_BUCKET_START * Config.SLA_BUCKET_RATIO ** i)
+                  for i in range(Config.SLA_BUCKET_COUNT - 1)] + [2 ** 62]
+        cursor.executemany("INSERT OR REPLACE INTO sla_buckets (bucket, upper_seconds) VALUES (?, ?)",
+                           list(enumerate(bounds)))
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_sla_buckets_upper ON sla_buckets (upper_seconds)")
+
+        day = f"/ {MICROSECONDS_PER_DAY}"
+        resolved = ", ".join(f"'{status}'" for status in Config.SLA_RESOLVED_STATUSES)
+        seconds = f"MAX(0, (NEW.updated_at - NEW.created_at) / {MICROSECONDS_PER_SECOND})"
+
+        # Заявка, возвращаемая из архива, уже учтена при создании
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_tickets_stats_opened AFTER INSERT ON tickets
+            WHEN NOT EXISTS (SELECT 1 FROM tickets_archive WHERE id = NEW.id)
+            BEGIN
+                INSERT INTO ticket_daily_stats (day, opened) VALUES (NEW.created_at {day}, 1)
+                ON CONFLICT(day) DO UPDATE SET opened = opened + 1;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_tickets_stats_resolved AFTER UPDATE OF status ON tickets
+            WHEN NEW.status IN ({resolved}) AND OLD.status NOT IN ({resolved})
+            BEGIN
+                INSERT INTO ticket_daily_stats (day, closed) VALUES (NEW.updated_at {day}, 1)
+                ON CONFLICT(day) DO UPDATE SET closed = closed + 1;
+                INSERT INTO ticket_resolution_stats (day, priority, assignee, bucket, resolved, total_seconds)
+                VALUES (NEW.updated_at {day}, NEW.priority, COALESCE(NEW.assigned_to, 0),
+                        (SELECT MIN(bucket) FROM sla_buckets WHERE upper_seconds >= {seconds}), 1, {seconds})
+                ON CONFLICT(day, priority, assignee, bucket) DO UPDATE
+                SET resolved = resolved + 1, total_seconds = total_seconds + excluded.total_seconds;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_tickets_stats_reopened AFTER UPDATE OF status ON tickets
+            WHEN OLD.status IN ({resolved}) AND NEW.status NOT IN ({resolved})
+            BEGIN
+                INSERT INTO ticket_daily_stats (day, reopened) VALUES (NEW.updated_at {day}, 1)
+                ON CONFLICT(day) DO UPDATE SET reopened = reopened + 1;
+            END
+        ''')
+        # Архивируются только решенные заявки, поэтому их удаление на остаток не влияет
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_tickets_stats_deleted AFTER DELETE ON tickets
+            WHEN OLD.status NOT IN ({resolved})
+            BEGIN
+                INSERT INTO ticket_daily_stats (day, deleted) VALUES (CAST(strftime('%s', 'now') AS INTEGER) / 86400, 1)
+                ON CONFLICT(day) DO UPDATE SET deleted = deleted + 1;
+            END
+        ''')
+
+        if not exists:
+            self._backfill_sla_rollups(cursor, day, resolved)
+
+    def _backfill_sla_rollups(self, cursor, day: str, resolved: str):
+        """Первичное заполнение агрегатов по уже существующим заявкам (время решения - updated_at)"""
+        source = '''(SELECT priority, status, assigned_to, created_at, updated_at FROM tickets
+                     UNION ALL
+                     SELECT priority, status, assigned_to, created_at, updated_at FROM tickets_archive)'''
+        cursor.execute(f'''
+            INSERT INTO ticket_daily_stats (day, opened, closed)
+            SELECT day, SUM(opened), SUM(closed) FROM (
+                SELECT created_at {day} AS day, 1 AS opened, 0 AS closed FROM {source}
+                UNION ALL
+                SELECT updated_at {day}, 0, 1 FROM {source} WHERE status IN ({resolved})
+            )
+            GROUP BY day
+        ''')
+        cursor.execute(f'''
+            INSERT INTO ticket_resolution_stats (day, priority, assignee, bucket, resolved, total_seconds)
+            SELECT day, priority, assignee,
+                   (SELECT MIN(bucket) FROM sla_buckets WHERE upper_seconds >= seconds) AS bucket,
+                   COUNT(*), SUM(seconds)
+            FROM (
+                SELECT updated_at {day} AS day, priority, COALESCE(assigned_to, 0) AS assignee,
+                       MAX(0, (updated_at - created_at) / {MICROSECONDS_PER_SECOND}) AS seconds
+                FROM {source} WHERE status IN ({resolved})
+            )
+            GROUP BY day, priority, assignee, bucket
+        ''')
+
+    def _create_attachment_storage(self, cursor):
+        """Содержимое вложений с адресацией по SHA-256 (в общей базе).
+
+        Одинаковые файлы хранятся один раз, refs - число ссылок из ticket_attachments.
+        data - последняя колонка: чтение метаданных не затрагивает страницы содержимого.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attachment_blobs (
+                id INTEGER PRIMARY KEY,
+                hash TEXT NOT NULL UNIQUE,
+                size INTEGER NOT NULL,
+                refs INTEGER NOT NULL DEFAULT 0,
+                data BLOB NOT NULL
+            )
+        ''')
+
+    def _create_duplicate_index(self, cursor, version: int):
+        """Индекс похожих заявок: MinHash-сигнатуры и LSH-корзины (в общей базе)"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_signatures (
+                ticket_id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_lsh_buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                ticket_id INTEGER NOT NULL,
+                PRIMARY KEY (band, bucket, ticket_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticket_lsh_buckets_ticket ON ticket_lsh_buckets (ticket_id)')
+
+        # До версии 13 сигнатуры считались по XOR-маскам - пустой индекс строится заново
+        if version < 13:
+            cursor.execute("DELETE FROM ticket_signatures")
+            cursor.execute("DELETE FROM ticket_lsh_buckets")
+
+    # Колонки, изменения которых попадают в журнал изменений (change_log)
+    CHANGE_LOG_COLUMNS = {
+        'users': ('username', 'password_hash', 'role', 'full_name', 'created_at'),
+        'tickets': ('title', 'description', 'status', 'priority', 'created_by',
+                    'assigned_to', 'created_at', 'updated_at'),
+    }
+
+    def _create_change_log(self, cursor, tables):
+        """Журнал изменений (CDC) и триггеры, которые его заполняют"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                operation TEXT NOT NULL,
+                changed_columns TEXT,
+                changed_at INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_log_changed_at ON change_log (changed_at)')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_consumers (
+                name TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        # Текущее время в микросекундах от эпохи средствами SQLite
+        now_sql = "CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER)"
+
+        for table in tables:
+            columns = self.CHANGE_LOG_COLUMNS[table]
+            all_columns = ",".join(columns)
+            changed = " || ".join(
+                f"CASE WHEN OLD.{column} IS NOT NEW.{column} THEN '{column},' ELSE '' END"
+                for column in columns
+            )
+            any_changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in columns)
+
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_cdc_insert AFTER INSERT ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, operation, changed_columns, changed_at)
+                    VALUES ('{table}', NEW.id, 'insert', '{all_columns}', {now_sql});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_cdc_update AFTER UPDATE ON {table}
+                WHEN {any_changed}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, operation, changed_columns, changed_at)
+                    VALUES ('{table}', NEW.id, 'update', rtrim({changed}, ','), {now_sql});
+                END
+            ''')
+            # Перенос заявки в архив (строка уже вставлена в tickets_archive) - не удаление
+            archived = "EXISTS (SELECT 1 FROM tickets_archive WHERE id = OLD.id)" if table == 'tickets' else None
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_cdc_delete")
+            cursor.execute(f'''
+                CREATE TRIGGER trg_{table}_cdc_delete AFTER DELETE ON {table}
+                {f'WHEN NOT {archived}' if archived else ''}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, operation, changed_columns, changed_at)
+                    VALUES ('{table}', OLD.id, 'delete', NULL, {now_sql});
+                END
+            ''')
+            if archived:
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_cdc_archive AFTER DELETE ON {table}
+                    WHEN {archived}
+                    BEGIN
+                        INSERT INTO change_log (table_name, row_id, operation, changed_columns, changed_at)
+                        VALUES ('{table}', OLD.id, 'archive', NULL, {now_sql});
+                    END
+                ''')
+
+    def _migrate_epoch_timestamps(self, conn):
+        """Миграция: created_at/updated_at из TEXT (ISO) в INTEGER (микросекунды от эпохи)"""
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(users)")
+        users_types = {col[1]: col[2].upper() for col in cursor.fetchall()}
+        cursor.execute("PRAGMA table_info(tickets)")
+        tickets_types = {col[1]: col[2].upper() for col in cursor.fetchall()}
+
+        if users_types.get('created_at') != 'TEXT' and tickets_types.get('created_at') != 'TEXT':
+            return
+
+        conn.create_function('iso_to_timestamp', 1, iso_to_timestamp, deterministic=True)
+
+        # Пересоздаем таблицы в одной транзакции (SQLite не умеет менять тип колонки)
+        cursor.execute("BEGIN")
+        try:
+            if users_types.get('created_at') == 'TEXT':
+                cursor.execute('''
+                    CREATE TABLE users_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        username TEXT UNIQUE NOT NULL,
+                        password_hash TEXT NOT NULL,
+                        role TEXT NOT NULL DEFAULT 'user',
+                        full_name TEXT NOT NULL,
+                        created_at INTEGER NOT NULL
+                    )
+                ''')
+                cursor.execute('''
+                    INSERT INTO users_new (id, username, password_hash, role, full_name, created_at)
+                    SELECT id, username, password_hash, role, full_name, iso_to_timestamp(created_at)
+                    FROM users
+                ''')
+                cursor.execute("DROP TABLE users")
+                cursor.execute("ALTER TABLE users_new RENAME TO users")
+
+            if tickets_types.get('created_at') == 'TEXT':
+                cursor.execute('''
+                    CREATE TABLE tickets_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        title TEXT NOT NULL,
+                        description TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'open',
+                        priority TEXT NOT NULL DEFAULT 'medium',
+                        created_by INTEGER NOT NULL,
+                        assigned_to INTEGER,
+                        created_at INTEGER NOT NULL,
+                        updated_at INTEGER NOT NULL,
+                        FOREIGN KEY (created_by) REFERENCES users(id),
+                        FOREIGN KEY (assigned_to) REFERENCES users(id)
+                    )
+                ''')
+                cursor.execute('''
+                    INSERT INTO tickets_new (id, title, description, status, priority,
+                                             created_by, assigned_to, created_at, updated_at)
+                    SELECT id, title, description, status, priority, created_by, assigned_to,
+                           iso_to_timestamp(created_at), iso_to_timestamp(updated_at)
+                    FROM tickets
+                ''')
+                cursor.execute("DROP TABLE tickets")
+                cursor.execute("ALTER TABLE tickets_new RENAME TO tickets")
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
     def _hash_password(self, password: str) -> str:
         """Хеширование пароля"""
@@ -69,14 +528,14 @@ class DatabaseConnection:
             cursor.execute('''
                 INSERT INTO users (username, password_hash, role, full_name, created_at)
                 VALUES (?, ?, ?, ?, ?)
-            ''', ("user", user_password, "user", "Обычный пользователь", datetime.datetime.now().isoformat()))
+            ''', ("user", user_password, "user", "Обычный пользователь", now_timestamp()))
 
             # Создаем саппорта
             support_password = self._hash_password("support123")
             cursor.execute('''
                 INSERT INTO users (username, password_hash, role, full_name, created_at)
                 VALUES (?, ?, ?, ?, ?)
-            ''', ("support", support_password, "support", "Специалист поддержки", datetime.datetime.now().isoformat()))
+            ''', ("support", support_password, "support", "Специалист поддержки", now_timestamp()))
 
             print("Созданы пользователи по умолчанию:")
             print("  Пользователь: логин 'user', пароль 'user123'")
@@ -1,7 +1,8 @@
 # Модели данных
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Optional
 import datetime
+from utils.helpers import timestamp_to_iso
 
 
 @dataclass
@@ -10,7 +11,7 @@ class User:
     username: str
     role: str
     full_name: str
-    created_at: str
+    created_at: int
 
 
 @dataclass
@@ -22,12 +23,60 @@ class Ticket:
     priority: str
     created_by: int
     assigned_to: Optional[int]
-    created_at: str
-    updated_at: str
+    created_at: int
+    updated_at: int
     created_by_name: Optional[str] = None
     assigned_to_name: Optional[str] = None
 
 
+@dataclass
+class Comment:
+    id: int
+    ticket_id: int
+    author_id: int
+    body: str
+    created_at: int
+    author_name: Optional[str] = None
+
+
+@dataclass
+class TicketHistoryEntry:
+    id: int
+    ticket_id: int
+    field: str
+    old_value: Any
+    new_value: Any
+    actor_id: Optional[int]
+    ts: int
+    actor_name: Optional[str] = None
+
+
+@dataclass
+class Attachment:
+    id: int
+    ticket_id: int
+    file_name: str
+    hash: str
+    size: int
+    uploaded_by: Optional[int]
+    created_at: int
+    uploaded_by_name: Optional[str] = None
+
+
+@dataclass
+class Change:
+    seq: int
+    table_name: str
+    row_id: int
+    operation: str
+    changed_columns: Optional[str]
+    changed_at: int
+
+    @property
+    def columns(self):
+        return self.changed_columns.split(',') if self.changed_columns else []
+
+
 @dataclass
 class TicketWithRelations:
     id: int
@@ -37,10 +86,12 @@ class TicketWithRelations:
     priority: str
     created_by: int
     assigned_to: Optional[int]
-    created_at: str
-    updated_at: str
+    created_at: int
+    updated_at: int
     created_by_name: Optional[str] = None
     assigned_to_name: Optional[str] = None
+    comment_count: int = 0
+    last_reply_at: Optional[int] = None
 
     def to_dict(self):
         return {
@@ -51,8 +102,10 @@ class TicketWithRelations:
             'priority': self.priority,
             'created_by': self.created_by,
             'assigned_to': self.assigned_to,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at,
+            'created_at': timestamp_to_iso(self.created_at),
+            'updated_at': timestamp_to_iso(self.updated_at),
             'created_by_name': self.created_by_name,
-            'assigned_to_name': self.assigned_to_name
+            'assigned_to_name': self.assigned_to_name,
+            'comment_count': self.comment_count,
+            'last_reply_at': timestamp_to_iso(self.last_reply_at)
         }
\ No newline at end of file
@@ -0,0 +1,65 @@
+# Постоянные соединения на время одного запуска (пакетный режим)
+import threading
+from typing import Dict, Optional
+from database.connection import DatabaseConnection
+
+
+class _KeptConnection:
+    """Соединение, которое не закрывается вызовом close().
+
+    close() только откатывает незавершенную транзакцию, чтобы следующая
+    операция начиналась с чистого состояния, как с новым соединением.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class PersistentConnection:
+    """Обертка над DatabaseConnection (в т.ч. шардированным) с одним соединением на базу.
+
+    Код приложения открывает соединение на каждую операцию; в пакетном режиме
+    тысячи операций подряд выполняются через одни и те же соединения, без
+    повторного открытия файла и разбора схемы. Соединения кешируются только
+    для потока, создавшего обертку: sqlite3 не разрешает использовать их из
+    других потоков, поэтому там соединения открываются как обычно.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection):
+        self.db_connection = db_connection
+        self._owner = threading.get_ident()
+        self._connections: Dict[Optional[int], _KeptConnection] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.db_connection, name)
+
+    def _kept(self, shard: Optional[int], factory):
+        """Постоянное соединение для шарда (None - общая база)"""
+        if threading.get_ident() != self._owner:
+            return factory()
+        conn = self._connections.get(shard)
+        if conn is None:
+            conn = self._connections[shard] = _KeptConnection(factory())
+        return conn
+
+    def get_connection(self):
+        """Постоянное соединение с общей базой"""
+        return self._kept(None, self.db_connection.get_connection)
+
+    def get_ticket_connection(self, shard: int = 0):
+        """Постоянное соединение с шардом заявок"""
+        return self._kept(shard, lambda: self.db_connection.get_ticket_connection(shard))
+
+    def close(self):
+        """Закрытие всех постоянных соединений"""
+        for conn in self._connections.values():
+            conn.close()
+            conn._conn.close()
+        self._connections = {}
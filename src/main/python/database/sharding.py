@@ -0,0 +1,101 @@
+# Шардированное хранилище заявок в нескольких файлах SQLite
+import os
+import sqlite3
+from typing import List, Optional
+from database.connection import DatabaseConnection
+from config import Config
+
+
+class ShardedDatabaseConnection(DatabaseConnection):
+    """Пользователи хранятся в общей базе, заявки - в N шардах по ключу created_by.
+
+    ID заявок глобально уникальны: шард s выдает ID s+1, s+1+N, s+1+2N, ...
+    из собственного счетчика, поэтому шард заявки определяется по ее ID без
+    обращения к общей базе, а вставки в разные шарды не конкурируют за блокировку.
+    """
+
+    def __init__(self, db_path: str = Config.DB_NAME, shard_count: int = Config.SHARD_COUNT,
+                 shard_paths: Optional[List[str]] = None):
+        super().__init__(db_path)
+        if shard_paths is None:
+            base, ext = os.path.splitext(db_path)
+            shard_paths = [Config.SHARD_DB_TEMPLATE.format(base=base, index=i, ext=ext)
+                           for i in range(shard_count)]
+        if not shard_paths:
+            raise ValueError("Нужен хотя бы один шард")
+
+        self.shard_paths = shard_paths
+        self.shard_count = len(shard_paths)
+        self.shared_schema = 'shared'
+
+    def get_ticket_connection(self, shard: int = 0):
+        """Соединение с шардом; общая база подключена через ATTACH, поэтому JOIN с users работает"""
+        conn = sqlite3.connect(self.shard_paths[shard])
+        conn.execute("ATTACH DATABASE ? AS shared", (self.db_path,))
+        return conn
+
+    def shard_for_user(self, user_id: int) -> int:
+        """Номер шарда для заявок пользователя"""
+        return user_id % self.shard_count
+
+    def shard_for_ticket(self, ticket_id: int) -> int:
+        """Номер шарда, в котором хранится заявка"""
+        return (ticket_id - 1) % self.shard_count
+
+    def next_ticket_id(self, cursor, shard: int) -> Optional[int]:
+        """Следующий ID из счетчика шарда (в транзакции вставки заявки)"""
+        cursor.execute("UPDATE shard_sequence SET value = value + ? RETURNING value", (self.shard_count,))
+        return cursor.fetchone()[0]
+
+    def _is_initialized(self) -> bool:
+        """Теплый старт: общая база и все шарды уже имеют актуальную схему"""
+        for path in [self.db_path] + self.shard_paths:
+            if not os.path.exists(path):
+                return False
+            conn = sqlite3.connect(path)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            conn.close()
+            if version != self.SCHEMA_VERSION:
+                return False
+        return True
+
+    def init_database(self):
+        """Инициализация общей базы и всех шардов"""
+        if self._is_initialized():
+            return
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        self._set_journal_mode(cursor)
+        self._create_users_table(cursor)
+        self._create_change_log(cursor, ('users',))
+        self._create_duplicate_index(cursor, version)
+        self._create_attachment_storage(cursor)
+        cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.commit()
+        conn.close()
+
+        for shard, shard_path in enumerate(self.shard_paths):
+            conn = sqlite3.connect(shard_path)
+            cursor = conn.cursor()
+
+            self._set_journal_mode(cursor)
+            self._create_ticket_tables(cursor)
+            self._create_indexes(cursor)
+            self._create_change_log(cursor, ('tickets',))
+            self._create_sla_rollups(cursor)
+
+            cursor.execute("CREATE TABLE IF NOT EXISTS shard_sequence (value INTEGER NOT NULL)")
+            cursor.execute("SELECT COUNT(*) FROM shard_sequence")
+            if cursor.fetchone()[0] == 0:
+                # Первый выданный ID шарда будет равен shard + 1
+                cursor.execute("INSERT INTO shard_sequence (value) VALUES (?)",
+                               (shard + 1 - self.shard_count,))
+
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.commit()
+            conn.close()
+
+        self._create_default_users()
@@ -0,0 +1,151 @@
+# Очередь записи: все изменения выполняет один поток с групповой фиксацией
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from database.connection import DatabaseConnection
+from config import Config
+
+# Операция записи: получает курсор открытой транзакции и возвращает результат
+Operation = Callable[[Any], Any]
+
+
+class WriteQueue:
+    """Сериализатор записи: операции из любых потоков выполняет один поток-писатель.
+
+    Писатель держит открытыми соединения с общей базой и шардами, собирает
+    операции в группу (до WRITE_BATCH_SIZE штук или WRITE_BATCH_DELAY секунд
+    с первой) и фиксирует ее одним COMMIT на шард. Каждая операция выполняется
+    в своей точке сохранения, поэтому ошибка одной откатывает только ее. Результат
+    возвращается через Future после фиксации шарда операции.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_connection: DatabaseConnection, batch_size: int = Config.WRITE_BATCH_SIZE,
+                 batch_delay: float = Config.WRITE_BATCH_DELAY):
+        self.db_connection = db_connection
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.batches = 0
+        self.operations = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, shard: Optional[int], operation: Operation) -> Future:
+        """Постановка операции в очередь; shard=None - запись в общую базу (пользователи)"""
+        if self._closed:
+            raise Exception("Очередь записи закрыта")
+        future = Future()
+        self._queue.put((shard, operation, future))
+        return future
+
+    def close(self):
+        """Выполнение оставшихся операций и остановка потока-писателя"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _connect(self, shard: Optional[int]):
+        """Соединение писателя; транзакциями управляет сам писатель"""
+        if shard is None:
+            conn = self.db_connection.get_connection()
+        else:
+            conn = self.db_connection.get_ticket_connection(shard)
+        conn.isolation_level = None
+        return conn
+
+    def _next_batch(self) -> Tuple[List[tuple], bool]:
+        """Группа операций: ожидание первой, затем добор до размера или таймаута"""
+        item = self._queue.get()
+        if item is self._STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        """Цикл потока-писателя"""
+        connections: Dict[Optional[int], Any] = {}
+        try:
+            stop = False
+            while not stop:
+                batch, stop = self._next_batch()
+                if batch:
+                    self._execute(batch, connections)
+        finally:
+            for conn in connections.values():
+                conn.close()
+
+    def _execute(self, batch: List[tuple], connections: Dict[Optional[int], Any]):
+        """Выполнение группы операций: каждый шард фиксируется и отвечает отдельно"""
+        # Операции разных шардов независимы; порядок внутри шарда сохраняется
+        by_shard: Dict[Optional[int], List[tuple]] = {}
+        for shard, operation, future in batch:
+            by_shard.setdefault(shard, []).append((operation, future))
+
+        for shard, items in by_shard.items():
+            self._execute_shard(shard, items, connections)
+        self.batches += 1
+
+    def _execute_shard(self, shard: Optional[int], items: List[tuple], connections: Dict[Optional[int], Any]):
+        """Выполнение операций одного шарда одной транзакцией.
+
+        Futures завершаются сразу после COMMIT этого шарда, поэтому ошибка
+        фиксации другого шарда не выдает уже зафиксированные изменения за ошибку.
+        """
+        results = []
+        conn = None
+        try:
+            for operation, future in items:
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                if conn is None:
+                    conn = connections.get(shard)
+                    if conn is None:
+                        conn = connections[shard] = self._connect(shard)
+                    # Блокировка записи берется сразу: без конфликтов при повышении блокировки
+                    conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.cursor()
+
+                cursor.execute("SAVEPOINT operation")
+                try:
+                    result = operation(cursor)
+                    cursor.execute("RELEASE operation")
+                    results.append((future, result, None))
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO operation")
+                    cursor.execute("RELEASE operation")
+                    results.append((future, None, e))
+
+            if conn is not None:
+                conn.execute("COMMIT")
+        except Exception as e:
+            if conn is not None and conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in items:
+                if future.running():
+                    future.set_exception(e)
+            return
+
+        self.operations += len(results)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
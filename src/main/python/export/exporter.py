@@ -1,39 +1,154 @@
 # Экспорт данных в различные форматы
+# Библиотеки форматов (csv, xml, yaml) импортируются при первом экспорте,
+# чтобы не замедлять запуск приложения
 import sqlite3
 import json
-import csv
-import xml.etree.ElementTree as ET
-import xml.dom.minidom
-import yaml
 import os
-from typing import List, Dict, Any
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
 from database.connection import DatabaseConnection
+from export.query import ExportQuery
 from config import Config
+from utils.helpers import timestamp_to_iso
 
 
 class DataExporter:
     """Класс для экспорта данных в различные форматы"""
 
-    def __init__(self, db_connection: DatabaseConnection):
+    # Форматы экспорта; каждая строка пишется в FORMAT_COUNT файлов (для подсчета прогресса)
+    FORMATS = ('json', 'csv', 'xml', 'yaml')
+    FORMAT_COUNT = len(FORMATS)
+
+    def __init__(self, db_connection: DatabaseConnection, verbose: bool = True):
+        # Экспорт читает одну базу: в шардированном режиме данные шардов в него не попали бы
+        if db_connection.shard_count > 1:
+            raise Exception("Экспорт шардированной базы (SHARD_COUNT > 1) не поддерживается")
         self.db_connection = db_connection
         self.output_dir = Config.OUTPUT_DIR
+        self.verbose = verbose
+        self._snapshot_conn = None
+        self._related_cache = {}
+        self._pending_files = None
+        self._progress = None
+        self._rows_written = 0
+        self._rows_total = 0
+        self._file_name = "data"
+        self.written_files = []
         self._ensure_output_dir()
 
+    def _log(self, message: str):
+        """Вывод сообщения о ходе экспорта (в фоновых задачах отключен)"""
+        if self.verbose:
+            print(message)
+
+    @contextmanager
+    def _output_files(self, pending: Optional[List[Tuple[str, str]]] = None):
+        """Все файлы экспорта пишутся во временные и переименовываются только после записи последнего.
+
+        pending - уже начатые временные файлы (temp_path, output_path) при продолжении
+        экспорта. При ошибке или отмене временные файлы удаляются - частичных файлов
+        не остается; при прерывании процесса (KeyboardInterrupt, SystemExit) они
+        остаются для продолжения с контрольной точки.
+        """
+        self._pending_files = list(pending or [])
+        try:
+            yield
+            for temp_path, output_path in self._pending_files:
+                os.replace(temp_path, output_path)
+            self.written_files = [output_path for _, output_path in self._pending_files]
+        except Exception:
+            for temp_path, _ in self._pending_files:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            raise
+        finally:
+            self._pending_files = None
+
+    def _temp_path(self, output_path: str) -> str:
+        """Новый временный файл рядом с output_path (переименовывается в него в конце экспорта)"""
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(output_path) or '.',
+                                         prefix=f".{os.path.basename(output_path)}.", suffix='.tmp')
+        os.close(fd)
+        return temp_path
+
+    def _advance(self):
+        """Учет записанной строки; прогресс сообщается каждые EXPORT_PROGRESS_ROWS строк"""
+        self._rows_written += 1
+        if self._progress is not None and (self._rows_written % Config.EXPORT_PROGRESS_ROWS == 0
+                                           or self._rows_written == self._rows_total):
+            self._progress(self._rows_written, self._rows_total)
+
     def _ensure_output_dir(self):
         """Создает папку out, если её нет"""
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
 
-    def get_table_structure(self, table_name: str) -> List[Dict[str, str]]:
-        """Получает структуру таблицы"""
+    @contextmanager
+    def snapshot(self):
+        """Снимок базы на момент начала экспорта: все чтения внутри блока согласованы.
+
+        В режиме WAL это одна читающая транзакция - писатели ее не ждут.
+        Без WAL база копируется во временный файл через online backup API,
+        и экспорт читает уже копию.
+        """
+        if self._snapshot_conn is not None:
+            yield self._snapshot_conn
+            return
+
         conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
+        snapshot_path = None
+        try:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if mode.lower() == 'wal':
+                # Транзакция чтения фиксирует снимок при первом SELECT
+                conn.execute("BEGIN")
+                conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            else:
+                fd, snapshot_path = tempfile.mkstemp(suffix='.db')
+                os.close(fd)
+                snapshot = sqlite3.connect(snapshot_path)
+                # Одним шагом: пошаговое копирование начинается заново после каждой записи в базу
+                conn.backup(snapshot)
+                conn.close()
+                conn = snapshot
+
+            self._snapshot_conn = conn
+            self._related_cache = {}
+            yield conn
+        finally:
+            self._snapshot_conn = None
+            self._related_cache = {}
+            conn.rollback()
+            conn.close()
+            if snapshot_path:
+                os.remove(snapshot_path)
+
+    @contextmanager
+    def _connection(self):
+        """Соединение снимка, если экспорт уже идет, иначе новое соединение"""
+        if self._snapshot_conn is not None:
+            yield self._snapshot_conn
+            return
+
+        conn = self.db_connection.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
 
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = cursor.fetchall()
+    def get_table_structure(self, table_name: str) -> List[Dict[str, str]]:
+        """Получает структуру таблицы (без колонок из EXPORT_EXCLUDED_COLUMNS)"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            columns = cursor.fetchall()
 
+        excluded = Config.EXPORT_EXCLUDED_COLUMNS.get(table_name, ())
         structure = []
         for col in columns:
+            if col[1] in excluded:
+                continue
             structure.append({
                 'name': col[1],
                 'type': col[2],
@@ -42,16 +157,14 @@ class DataExporter:
                 'pk': col[5]
             })
 
-        conn.close()
         return structure
 
     def get_foreign_keys(self, table_name: str) -> List[Dict[str, str]]:
         """Получает информацию о внешних ключах"""
-        conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(f"PRAGMA foreign_key_list({table_name})")
-        foreign_keys = cursor.fetchall()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"PRAGMA foreign_key_list({table_name})")
+            foreign_keys = cursor.fetchall()
 
         fk_info = []
         for fk in foreign_keys:
@@ -61,172 +174,417 @@ class DataExporter:
                 'to': fk[4]
             })
 
-        conn.close()
         return fk_info
 
     def get_related_data(self, table_name: str, foreign_key: str, related_table: str, key_value: Any) -> Dict[str, Any]:
         """Получает связанные данные по внешнему ключу"""
-        conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(f"SELECT * FROM {related_table} WHERE id = ?", (key_value,))
-        related_row = cursor.fetchone()
-
-        if not related_row:
-            conn.close()
-            return {}
+        # Внутри снимка данные не меняются, поэтому связанные строки кешируются
+        cache_key = (related_table, key_value)
+        if self._snapshot_conn is not None and cache_key in self._related_cache:
+            return dict(self._related_cache[cache_key])
 
-        # Получаем названия колонок
-        cursor.execute(f"PRAGMA table_info({related_table})")
-        columns = [col[1] for col in cursor.fetchall()]
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        related_data = dict(zip(columns, related_row))
-        conn.close()
+            cursor.execute(f"SELECT * FROM {related_table} WHERE id = ?", (key_value,))
+            related_row = cursor.fetchone()
 
-        return related_data
+            if not related_row:
+                return {}
 
-    def export_table_data(self, table_name: str):
-        """Экспортирует данные таблицы во все форматы"""
-        print(f"\nЭкспорт данных из таблицы: {table_name}")
+            # Получаем названия колонок
+            columns = [description[0] for description in cursor.description]
 
-        # Получаем данные
-        data = self._get_table_data_with_relations(table_name)
+        related_data = self._convert_timestamps(dict(zip(columns, related_row)))
+        if self._snapshot_conn is not None:
+            self._related_cache[cache_key] = dict(related_data)
 
-        # Экспорт в различные форматы
-        self._export_to_json(data)
-        self._export_to_csv(data)
-        self._export_to_xml(data, table_name)
-        self._export_to_yaml(data)
+        return related_data
 
-        print("  Экспорт завершен! Файлы созданы в папке 'out'")
+    def export_table_data(self, table_name: str, query: Optional[ExportQuery] = None,
+                          progress: Optional[Callable[[int, int], None]] = None,
+                          file_name: str = "data") -> int:
+        """Экспортирует данные таблицы во все форматы, возвращает число строк.
+
+        query - колонки, фильтры и сортировка; file_name - имя файлов без расширения.
+        progress(записано строк, всего строк) вызывается по ходу записи; исключение
+        из него прерывает экспорт без частично записанных файлов.
+
+        Строки читаются страницами по EXPORT_CHECKPOINT_ROWS и сразу дописываются во
+        временные файлы всех форматов. После каждой страницы размеры файлов и ключ
+        последней строки сохраняются в <file_name>.<хеш запроса>.checkpoint.json;
+        если процесс был прерван, экспорт того же запроса продолжается с контрольной точки
+        (файлы обрезаются до сохраненных размеров, чтение - по ключу после
+        последней строки). Готовые файлы появляются переименованием в конце.
+        """
+        self._log(f"\nЭкспорт данных из таблицы: {table_name}")
+        self._file_name = file_name
+        self.written_files = []
+        if query is None:
+            query = ExportQuery(table_name)
+
+        # Данные читаются из согласованного снимка базы
+        with self.snapshot() as conn:
+            plan = self._plan_export(conn, table_name, query)
+            checkpoint = self._load_checkpoint(plan)
+            if checkpoint is None:
+                formats = [fmt for fmt in self.FORMATS if fmt != 'csv' or plan['total']]
+                checkpoint = {
+                    'signature': plan['signature'],
+                    'files': {fmt: self._temp_path(self._output_path(fmt)) for fmt in formats},
+                    'sizes': None,
+                    'after': None,
+                    'rows': 0
+                }
+                self._save_checkpoint(checkpoint)
+            else:
+                self._log(f"  Продолжение с контрольной точки: {checkpoint['rows']} из {plan['total']} строк")
+
+            pending = [(path, self._output_path(fmt)) for fmt, path in checkpoint['files'].items()]
+            self._progress = progress
+            self._rows_written = checkpoint['rows'] * self.FORMAT_COUNT
+            self._rows_total = plan['total'] * self.FORMAT_COUNT
+            try:
+                if progress is not None:
+                    progress(self._rows_written, self._rows_total)
+
+                with self._output_files(pending):
+                    self._write_files(conn, plan, checkpoint)
+                self._remove_checkpoint(checkpoint)
+            except Exception:
+                self._remove_checkpoint(checkpoint)
+                raise
+            finally:
+                self._progress = None
+
+        for path in self.written_files:
+            self._log(f"  {os.path.splitext(path)[1][1:].upper()}: {path}")
+        self._log(f"  Экспорт завершен! Файлы созданы в папке '{self.output_dir}'")
+        return plan['total']
+
+    def _output_path(self, fmt: str) -> str:
+        """Путь к файлу экспорта в формате fmt"""
+        return os.path.join(self.output_dir, f"{self._file_name}.{fmt}")
+
+    def _plan_export(self, conn, table_name: str, query: ExportQuery) -> Dict[str, Any]:
+        """Параметры выборки: SQL, колонки, связи, порядок для чтения по ключу и число строк"""
+        structure = self.get_table_structure(table_name)
+        available = [col['name'] for col in structure]
+        sql, params = query.compile(available)
+        column_names = query.selected_columns(available)
+
+        # Связанные данные подгружаются только для выбранных колонок внешних ключей
+        foreign_keys = [fk for fk in self.get_foreign_keys(table_name) if fk['from'] in column_names]
+        total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+        return {
+            'table': table_name,
+            'query': query,
+            'available': available,
+            'sql': sql,
+            'params': params,
+            'columns': column_names,
+            'foreign_keys': foreign_keys,
+            'order': query.keyset_order(structure),
+            'total': total,
+            'fieldnames': self._csv_fieldnames(conn, sql, params, column_names, foreign_keys) if total else [],
+            # Контрольная точка подходит только для того же запроса в ту же папку
+            'signature': json.loads(json.dumps({'table': table_name, 'sql': sql, 'params': params,
+                                                'output': os.path.abspath(self._output_path('json'))}))
+        }
+
+    def _checkpoint_path(self, signature: Dict[str, Any]) -> str:
+        """Файл контрольной точки экспорта рядом с файлами данных.
+
+        Имя включает хеш сигнатуры, поэтому экспорты разных запросов с одинаковым
+        file_name не используют и не удаляют контрольные точки друг друга.
+        """
+        import hashlib
+        key = hashlib.sha256(json.dumps(signature, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.output_dir, f"{self._file_name}.{key}.checkpoint.json")
+
+    def _load_checkpoint(self, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Контрольная точка прерванного экспорта того же запроса (файлы обрезаются до сохраненных размеров).
+
+        Неполная контрольная точка этого запроса удаляется вместе с ее временными файлами,
+        контрольная точка другого запроса не трогается.
+        """
+        path = self._checkpoint_path(plan['signature'])
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except ValueError:
+            os.remove(path)
+            return None
+
+        if checkpoint.get('signature') != plan['signature']:
+            return None
+
+        usable = (checkpoint.get('sizes') is not None and plan['order'] is not None
+                  and all(os.path.exists(temp_path) and os.path.getsize(temp_path) >= checkpoint['sizes'][fmt]
+                          for fmt, temp_path in checkpoint['files'].items()))
+        if not usable:
+            self._remove_checkpoint(checkpoint)
+            return None
+
+        for fmt, temp_path in checkpoint['files'].items():
+            with open(temp_path, 'r+b') as f:
+                f.truncate(checkpoint['sizes'][fmt])
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        """Атомарная запись контрольной точки"""
+        self._write_json(self._checkpoint_path(checkpoint['signature']), checkpoint)
+
+    def _remove_checkpoint(self, checkpoint: Dict[str, Any]):
+        """Удаление контрольной точки и оставшихся временных файлов"""
+        for temp_path in checkpoint.get('files', {}).values():
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        path = self._checkpoint_path(checkpoint['signature'])
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _write_files(self, conn, plan: Dict[str, Any], checkpoint: Dict[str, Any]):
+        """Запись страниц выборки во все форматы с контрольной точкой после каждой страницы"""
+        import csv
+        import yaml
+
+        resumed = checkpoint['sizes'] is not None
+        files = {fmt: open(temp_path, 'a' if resumed else 'w', encoding='utf-8',
+                           newline='' if fmt == 'csv' else None)
+                 for fmt, temp_path in checkpoint['files'].items()}
+        try:
+            if not resumed:
+                if 'csv' in files:
+                    csv.DictWriter(files['csv'], fieldnames=plan['fieldnames']).writeheader()
+                files['json'].write('[')
+                files['xml'].write(self._xml_header(plan))
+
+            rows = checkpoint['rows']
+            for page, after in self._read_pages(conn, plan, checkpoint['after'], rows):
+                self._json_rows(files['json'], page, rows)
+                if 'csv' in files:
+                    self._csv_rows(files['csv'], page, plan['fieldnames'])
+                self._xml_rows(files['xml'], page)
+                yaml.dump(page, files['yaml'], allow_unicode=True, default_flow_style=False)
+                for _ in page:
+                    self._advance()
+                rows += len(page)
+
+                if plan['order'] is not None:
+                    # Сначала данные на диск, затем контрольная точка, которая на них ссылается
+                    sizes = {}
+                    for fmt, f in files.items():
+                        f.flush()
+                        os.fsync(f.fileno())
+                        sizes[fmt] = os.fstat(f.fileno()).st_size
+                    checkpoint.update(sizes=sizes, after=after, rows=rows)
+                    self._save_checkpoint(checkpoint)
+
+            files['json'].write('\n]' if rows else ']')
+            if rows:
+                files['xml'].write('\n</data>')
+            else:
+                yaml.dump([], files['yaml'], allow_unicode=True, default_flow_style=False)
+        finally:
+            for f in files.values():
+                f.close()
+
+    def _read_pages(self, conn, plan: Dict[str, Any], after: Optional[List[Any]],
+                    done: int) -> Iterator[Tuple[List[Dict[str, Any]], Optional[List[Any]]]]:
+        """Страницы выборки (строки со связанными данными) и ключ последней строки страницы.
+
+        При порядке по ключу каждая страница - отдельный запрос "после последнего
+        ключа" (keyset), иначе страницы читаются из одного курсора без ключей.
+        """
+        query = plan['query']
+        columns = plan['columns']
+        size = Config.EXPORT_CHECKPOINT_ROWS
+
+        if plan['order'] is None:
+            cursor = conn.execute(plan['sql'], plan['params'])
+            for rows in iter(lambda: cursor.fetchmany(size), []):
+                yield self._rows_to_dicts(conn, rows, columns, plan['foreign_keys']), None
+            return
 
-    def _get_table_data_with_relations(self, table_name: str) -> List[Dict[str, Any]]:
+        remaining = None if query.limit is None else query.limit - done
+        while remaining is None or remaining > 0:
+            page_size = size if remaining is None else min(size, remaining)
+            sql, params = query.compile_page(plan['available'], plan['order'], after, page_size)
+            rows = conn.execute(sql, params).fetchall()
+            if not rows:
+                return
+            after = list(rows[-1][len(columns):])
+            yield self._rows_to_dicts(conn, [row[:len(columns)] for row in rows], columns,
+                                      plan['foreign_keys']), after
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < page_size:
+                return
+
+    def _get_table_data_with_relations(self, table_name: str,
+                                       query: Optional[ExportQuery] = None) -> List[Dict[str, Any]]:
         """Получает данные таблицы с связанными данными"""
-        conn = self.db_connection.get_connection()
+        with self.snapshot() as conn:
+            return self._read_table_with_relations(conn, table_name, query)
+
+    def _read_table_with_relations(self, conn, table_name: str,
+                                   query: Optional[ExportQuery] = None) -> List[Dict[str, Any]]:
+        """Чтение таблицы и связанных данных через соединение снимка"""
         cursor = conn.cursor()
 
         # Получаем структуру таблицы
         structure = self.get_table_structure(table_name)
-        column_names = [col['name'] for col in structure]
+        available = [col['name'] for col in structure]
 
-        # Получаем внешние ключи
-        foreign_keys = self.get_foreign_keys(table_name)
+        # Колонки, условия и сортировка выполняются в SQL
+        if query is None:
+            query = ExportQuery(table_name)
+        sql, params = query.compile(available)
+        column_names = query.selected_columns(available)
+
+        # Связанные данные подгружаются только для выбранных колонок внешних ключей
+        foreign_keys = [fk for fk in self.get_foreign_keys(table_name) if fk['from'] in column_names]
 
         # Получаем данные
-        cursor.execute(f"SELECT * FROM {table_name}")
-        rows = cursor.fetchall()
+        cursor.execute(sql, params)
+        return self._rows_to_dicts(conn, cursor.fetchall(), column_names, foreign_keys)
+
+    def _rows_to_dicts(self, conn, rows: List[tuple], column_names: List[str],
+                       foreign_keys: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Строки выборки в словари со связанными данными"""
+        # Связанные строки - одним запросом на связь по всем ключам выборки
+        related = {}
+        for fk in foreign_keys:
+            position = column_names.index(fk['from'])
+            keys = {row[position] for row in rows if row[position] is not None}
+            related[fk['from']] = self._fetch_related_rows(conn, fk['table'], fk['to'] or 'id', keys)
 
         # Преобразуем в список словарей
         data = []
         for row in rows:
-            row_dict = dict(zip(column_names, row))
+            row_dict = self._convert_timestamps(dict(zip(column_names, row)))
 
             # Добавляем связанные данные для каждого внешнего ключа
             for fk in foreign_keys:
-                fk_column = fk['from']
-                related_table = fk['table']
-
-                if fk_column in row_dict and row_dict[fk_column] is not None:
-                    related_data = self.get_related_data(
-                        table_name, fk_column, related_table, row_dict[fk_column]
-                    )
-                    if related_data:
-                        # Создаем вложенную структуру для связанных данных
-                        relation_name = f"{related_table}"
-                        row_dict[relation_name] = related_data
+                related_data = related[fk['from']].get(row_dict[fk['from']])
+                if related_data:
+                    # Создаем вложенную структуру для связанных данных
+                    row_dict[fk['table']] = dict(related_data)
 
             data.append(row_dict)
 
-        conn.close()
         return data
 
-    def _export_to_json(self, data: List[Dict[str, Any]]):
-        """Экспорт в JSON"""
-        output_path = os.path.join(self.output_dir, "data.json")
-
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
-        print(f"  JSON: {output_path}")
-
-    def _export_to_csv(self, data: List[Dict[str, Any]]):
-        """Экспорт в CSV"""
-        output_path = os.path.join(self.output_dir, "data.csv")
-
-        if not data:
-            return
-
-        # Получаем все возможные ключи (включая вложенные)
-        all_keys = set()
+    def _fetch_related_rows(self, conn, related_table: str, key_column: str,
+                            keys: set) -> Dict[Any, Dict[str, Any]]:
+        """Связанные строки по множеству ключей (пачками из-за лимита параметров)"""
+        cursor = conn.cursor()
+        keys = list(keys)
+        related = {}
+
+        for start in range(0, len(keys), 900):
+            chunk = keys[start:start + 900]
+            cursor.execute(f"SELECT * FROM {related_table} WHERE {key_column} IN ({', '.join('?' * len(chunk))})",
+                           chunk)
+            columns = [description[0] for description in cursor.description]
+            for related_row in cursor.fetchall():
+                row_dict = self._convert_timestamps(dict(zip(columns, related_row)))
+                related[row_dict[key_column]] = row_dict
+
+        return related
+
+    def _convert_timestamps(self, row_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """Преобразует даты из микросекунд от эпохи в ISO 8601 для выгрузки"""
+        for column in Config.TIMESTAMP_COLUMNS:
+            if column in row_dict:
+                row_dict[column] = timestamp_to_iso(row_dict[column])
+        return row_dict
+
+    def _json_rows(self, f, data: List[Dict[str, Any]], index: int):
+        """Строки JSON-массива; index - сколько строк уже записано.
+
+        Запись по строкам дает тот же текст, что json.dump(data, indent=2)
+        """
+        for i, row in enumerate(data, index):
+            f.write(',\n  ' if i else '\n  ')
+            f.write(json.dumps(row, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+            self._advance()
+
+    def _csv_fieldnames(self, conn, sql: str, params: List[Any], column_names: List[str],
+                        foreign_keys: List[Dict[str, str]]) -> List[str]:
+        """Колонки CSV: колонки выборки и колонки связанной таблицы с префиксом,
+        если связанная строка есть хотя бы у одной строки выборки"""
+        all_keys = set(column_names)
+        for fk in foreign_keys:
+            key_column = fk['to'] or 'id'
+            found = conn.execute(f"SELECT EXISTS (SELECT 1 FROM ({sql}) q "
+                                 f"JOIN {fk['table']} r ON r.{key_column} = q.{fk['from']})", params).fetchone()[0]
+            if found:
+                cursor = conn.execute(f"SELECT * FROM {fk['table']} LIMIT 0")
+                all_keys.update(f"{fk['table']}_{description[0]}" for description in cursor.description)
+                all_keys.discard(fk['table'])
+        return sorted(all_keys)
+
+    def _csv_rows(self, f, data: List[Dict[str, Any]], fieldnames: List[str]):
+        """Строки CSV"""
+        import csv
+
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
         for row in data:
+            # Преобразуем вложенные словари в плоскую структуру для CSV
+            flat_row = {}
             for key, value in row.items():
                 if isinstance(value, dict):
-                    # Для вложенных словарей добавляем префикс
-                    for sub_key in value.keys():
-                        all_keys.add(f"{key}_{sub_key}")
+                    for sub_key, sub_value in value.items():
+                        flat_row[f"{key}_{sub_key}"] = sub_value
                 else:
-                    all_keys.add(key)
+                    flat_row[key] = value
 
-        with open(output_path, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=sorted(all_keys))
-            writer.writeheader()
+            writer.writerow(flat_row)
+            self._advance()
 
-            for row in data:
-                # Преобразуем вложенные словари в плоскую структуру для CSV
-                flat_row = {}
-                for key, value in row.items():
-                    if isinstance(value, dict):
-                        for sub_key, sub_value in value.items():
-                            flat_row[f"{key}_{sub_key}"] = sub_value
-                    else:
-                        flat_row[key] = value
+    def _xml_header(self, plan: Dict[str, Any]) -> str:
+        """Объявление и корневой элемент XML (для пустой выборки - пустой элемент)"""
+        attributes = (f'source_table="{self._xml_text(plan["table"])}" '
+                      f'exported_at="{self._get_current_timestamp()}" total_records="{plan["total"]}"')
+        root = f"<data {attributes}>" if plan['total'] else f"<data {attributes}/>"
+        return '<?xml version="1.0" encoding="utf-8"?>\n' + root
 
-                writer.writerow(flat_row)
+    def _xml_text(self, value: Any) -> str:
+        """Текст элемента XML.
 
-        print(f"  CSV: {output_path}")
+        Формат совпадает с прежней сборкой через ElementTree и minidom: значение
+        после _safe_string экранируется еще раз, переводы строк \\r нормализуются.
+        """
+        text = self._safe_string(value).replace('\r\n', '\n').replace('\r', '\n')
+        return text.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
 
-    def _export_to_xml(self, data: List[Dict[str, Any]], table_name: str):
-        """Экспорт в XML с красивым форматированием"""
-        output_path = os.path.join(self.output_dir, "data.xml")
+    def _xml_element(self, tag: str, value: Any, indent: str) -> str:
+        text = self._xml_text(value)
+        return f"{indent}<{tag}>{text}</{tag}>" if text else f"{indent}<{tag}/>"
 
-        # Создаем корневой элемент
-        root = ET.Element('data')
-        root.set('source_table', table_name)
-        root.set('exported_at', self._get_current_timestamp())
-        root.set('total_records', str(len(data)))
-
-        # Добавляем записи
+    def _xml_rows(self, f, data: List[Dict[str, Any]]):
+        """Элементы record с отступами в два пробела; пустые строки внутри значений опускаются"""
         for record in data:
-            record_element = ET.SubElement(root, 'record')
-
+            lines = ['  <record>']
             for key, value in record.items():
                 if isinstance(value, dict):
                     # Обрабатываем вложенные данные
-                    relation_element = ET.SubElement(record_element, key)
-                    relation_element.set('type', 'relation')
+                    lines.append(f'    <{key} type="relation">')
                     for sub_key, sub_value in value.items():
-                        sub_element = ET.SubElement(relation_element, sub_key)
-                        sub_element.text = self._safe_string(sub_value)
+                        lines.append(self._xml_element(sub_key, sub_value, '      '))
+                    lines.append(f'    </{key}>')
                 else:
-                    element = ET.SubElement(record_element, key)
-                    element.text = self._safe_string(value)
-
-        # Преобразуем в строку с форматированием
-        rough_string = ET.tostring(root, encoding='utf-8')
+                    lines.append(self._xml_element(key, value, '    '))
+            lines.append('  </record>')
 
-        # Используем minidom для красивого форматирования
-        dom = xml.dom.minidom.parseString(rough_string)
-        pretty_xml = dom.toprettyxml(indent="  ", encoding='utf-8')
-
-        # Убираем лишние пустые строки, которые добавляет minidom
-        pretty_xml_str = pretty_xml.decode('utf-8')
-        pretty_xml_str = '\n'.join([line for line in pretty_xml_str.split('\n') if line.strip()])
-
-        # Сохраняем с правильной кодировкой
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(pretty_xml_str)
-
-        print(f"  XML: {output_path}")
+            text = '\n'.join(line for line in '\n'.join(lines).split('\n') if line.strip())
+            f.write('\n' + text)
+            self._advance()
 
     def _export_to_xml_manual(self, data: List[Dict[str, Any]], table_name: str):
         """Альтернативный метод экспорта в XML с ручным форматированием"""
@@ -262,7 +620,7 @@ class DataExporter:
             # Закрываем корневой элемент
             f.write('</data>\n')
 
-        print(f"  XML (manual): {output_path}")
+        self._log(f"  XML (manual): {output_path}")
 
     def _safe_string(self, value: Any) -> str:
         """Безопасное преобразование значения в строку"""
@@ -281,22 +639,367 @@ class DataExporter:
         from datetime import datetime
         return datetime.now().isoformat()
 
-    def _export_to_yaml(self, data: List[Dict[str, Any]]):
-        """Экспорт в YAML"""
-        output_path = os.path.join(self.output_dir, "data.yaml")
+    @contextmanager
+    def _export_source(self):
+        """Файл базы для параллельных читателей.
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+        В режиме WAL это сам файл базы: каждый процесс читает его в своей
+        транзакции snapshot(), писатели их не ждут. Иначе база один раз
+        копируется во временный файл, и процессы читают копию.
+        """
+        conn = self.db_connection.get_connection()
+        try:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            conn.close()
+        if mode.lower() == 'wal':
+            yield self.db_connection.db_path
+            return
 
-        print(f"  YAML: {output_path}")
+        fd, copy_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            source = self.db_connection.get_connection()
+            copy = sqlite3.connect(copy_path)
+            # Одним шагом, как в snapshot()
+            source.backup(copy)
+            source.close()
+            copy.close()
+            yield copy_path
+        finally:
+            os.remove(copy_path)
+
+    def _file_checksum(self, path: str) -> str:
+        """SHA-256 файла (читается блоками)"""
+        import hashlib
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _run_export_workers(self, source_path: str, export_dir: str,
+                            tasks: List[Tuple[str, str, Optional[ExportQuery]]], workers: int,
+                            progress: Optional[Callable[[int, int], None]]) -> Dict[str, Dict[str, Any]]:
+        """Выгрузка задач (имя файлов, таблица, выборка) из файла базы в пуле процессов.
+
+        Задачи запускаются в порядке списка, прогресс - сумма прогресса всех процессов.
+        Возвращает результаты по именам файлов; при ошибке или отмене остальные
+        процессы прерываются.
+        """
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, wait
+
+        results = {}
+        if not tasks:
+            return results
+
+        task_progress = {file_name: (0, 0) for file_name, _, _ in tasks}
+        # Процессы запускаются с нуля (spawn): после fork дочерний процесс унаследовал бы
+        # состояние SQLite родителя с открытыми соединениями к тому же файлу базы
+        context = multiprocessing.get_context('spawn')
+        with context.Manager() as manager:
+            cancel_event = manager.Event()
+            progress_queue = manager.Queue()
+
+            workers = max(1, min(workers, os.cpu_count() or 1, len(tasks)))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                futures = [executor.submit(_export_table_worker, source_path, table, export_dir,
+                                           cancel_event, progress_queue, file_name, query)
+                           for file_name, table, query in tasks]
+                pending = set(futures)
+                try:
+                    while pending:
+                        done, pending = wait(pending, timeout=0.2)
+
+                        # Прогресс по всем задачам: сумма прогресса отдельных процессов
+                        while not progress_queue.empty():
+                            file_name, written, total = progress_queue.get()
+                            task_progress[file_name] = (written, total)
+                        if progress is not None:
+                            progress(sum(value[0] for value in task_progress.values()),
+                                     sum(value[1] for value in task_progress.values()))
+
+                        for future in done:
+                            file_name, result = future.result()
+                            results[file_name] = result
+                            self._log(f"  {file_name}: {result['rows']} строк")
+                except BaseException:
+                    # Остальные процессы прервутся при следующем сообщении о прогрессе
+                    cancel_event.set()
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        return results
+
+    def export_database(self, workers: int = Config.EXPORT_DATABASE_WORKERS,
+                        progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Экспорт всех таблиц в отдельную папку с манифестом, возвращает путь к папке.
+
+        Таблицы читаются параллельно в отдельных процессах
+        (форматирование упирается в процессор, поэтому потоки не помогут), каждая -
+        в свои файлы <таблица>.json/.csv/.xml/.yaml. Манифест содержит число строк,
+        контрольные суммы файлов и время выгрузки каждой таблицы.
+        При ошибке или отмене папка экспорта удаляется целиком.
+        """
+        import shutil
+        import time
+        from datetime import datetime
+
+        started = time.perf_counter()
+        tables = self.list_tables()
+        export_dir = os.path.join(self.output_dir, f"database_{datetime.now():%Y%m%d_%H%M%S_%f}")
+        os.makedirs(export_dir)
+        self._log(f"\nЭкспорт базы данных ({len(tables)} таблиц) в папку: {export_dir}")
+
+        try:
+            with self._export_source() as source_path:
+                # Крупные таблицы запускаются первыми, чтобы общее время было близко ко времени самой большой
+                source = sqlite3.connect(source_path)
+                sizes = {table: source.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+                source.close()
+
+                tasks = [(table, table, None) for table in sorted(tables, key=sizes.get, reverse=True)]
+                results = self._run_export_workers(source_path, export_dir, tasks, workers, progress)
+
+            manifest = {
+                'exported_at': self._get_current_timestamp(),
+                'database': self.db_connection.db_path,
+                'seconds': round(time.perf_counter() - started, 3),
+                'tables': [results[table] for table in tables]
+            }
+            manifest_path = self._write_manifest(export_dir, manifest)
+        except BaseException:
+            shutil.rmtree(export_dir, ignore_errors=True)
+            raise
+
+        self._log(f"  Экспорт базы завершен за {manifest['seconds']} с, манифест: {manifest_path}")
+        return export_dir
+
+    def _write_json(self, path: str, value: Any):
+        """Атомарная запись JSON-файла (через временный файл и переименование)"""
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _write_manifest(self, export_dir: str, manifest: Dict[str, Any]) -> str:
+        """Атомарная запись manifest.json в папку экспорта, возвращает путь к нему"""
+        manifest_path = os.path.join(export_dir, "manifest.json")
+        self._write_json(manifest_path, manifest)
+        return manifest_path
+
+    def _partition_fingerprint(self, conn, table_name: str, column: str, start: int, end: int,
+                               available: List[str]) -> Tuple[int, List[Any]]:
+        """Число строк диапазона и отпечаток его содержимого.
+
+        Удаление и перенос строк меняют число строк и сумму id, изменение строки -
+        сумму updated_at (TOTAL считает в double и не переполняется на больших секциях).
+        """
+        aggregates = ["COUNT(*)"]
+        if 'id' in available:
+            aggregates.append("SUM(id)")
+        if 'updated_at' in available:
+            aggregates.extend(["MAX(updated_at)", "TOTAL(updated_at)"])
+        row = conn.execute(f"SELECT {', '.join(aggregates)} FROM {table_name} WHERE {column} BETWEEN ? AND ?",
+                           (start, end)).fetchone()
+        return row[0], list(row)
+
+    def _plan_partitions(self, conn, table_name: str, partition_by: str,
+                         partition_rows: int) -> List[Dict[str, Any]]:
+        """Границы секций: месяцы created_at или диапазоны id по partition_rows строк.
+
+        Границы находятся поиском по индексу (MIN по условию на колонку), без
+        чтения таблицы; пропуски без данных перескакиваются одним поиском.
+        """
+        import datetime
+        from utils.helpers import from_timestamp, to_timestamp
+
+        if partition_by not in ('month', 'rows'):
+            raise ValueError(f"Неизвестный способ разбиения: {partition_by}")
+        available = [col['name'] for col in self.get_table_structure(table_name)]
+        column = 'created_at' if partition_by == 'month' else 'id'
+        if column not in available:
+            raise Exception(f"В таблице {table_name} нет колонки {column}")
+
+        partitions = []
+        start = conn.execute(f"SELECT MIN({column}) FROM {table_name}").fetchone()[0]
+        while start is not None:
+            if partition_by == 'month':
+                month = from_timestamp(start).date().replace(day=1)
+                next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+                start = to_timestamp(datetime.datetime.combine(month, datetime.time.min))
+                end = to_timestamp(datetime.datetime.combine(next_month, datetime.time.min)) - 1
+                key = f"{month:%Y-%m}"
+            else:
+                end = conn.execute(f"SELECT MAX(id) FROM (SELECT id FROM {table_name} WHERE id >= ? "
+                                   f"ORDER BY id LIMIT ?)", (start, partition_rows)).fetchone()[0]
+                key = f"{start}-{end}"
+
+            rows, fingerprint = self._partition_fingerprint(conn, table_name, column, start, end, available)
+            partitions.append({
+                'key': key,
+                'column': column,
+                'from': start,
+                'to': end,
+                'rows': rows,
+                'fingerprint': fingerprint
+            })
+            start = conn.execute(f"SELECT MIN({column}) FROM {table_name} WHERE {column} > ?",
+                                 (end,)).fetchone()[0]
+
+        return partitions
+
+    def export_partitioned(self, table_name: str, partition_by: str = 'month',
+                           partition_rows: int = Config.EXPORT_PARTITION_ROWS,
+                           export_dir: Optional[str] = None, workers: int = Config.EXPORT_DATABASE_WORKERS,
+                           progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Секционированный экспорт таблицы с манифестом, возвращает путь к папке.
+
+        partition_by='month' - секция на каждый месяц created_at, 'rows' - диапазоны
+        id по partition_rows строк. Каждая секция выгружается в свои файлы
+        <таблица>_<секция>.json/.csv/.xml/.yaml отдельным процессом диапазонным
+        запросом по индексу. Папка по умолчанию постоянная (<output>/<таблица>_partitions):
+        при повторном экспорте секции, отпечаток которых совпадает с манифестом,
+        не перевыгружаются, файлы исчезнувших секций удаляются. Манифест
+        ссылается только на целые файлы: на время перезаписи секций в нем
+        остаются лишь нетронутые, а complete=true ставится в конце.
+        """
+        import time
+
+        started = time.perf_counter()
+        export_dir = export_dir or os.path.join(self.output_dir, f"{table_name}_partitions")
+        os.makedirs(export_dir, exist_ok=True)
+        self._log(f"\nСекционированный экспорт таблицы {table_name} в папку: {export_dir}")
+
+        # Предыдущий манифест: секции с тем же отпечатком и целыми файлами переиспользуются
+        previous = {}
+        manifest_path = os.path.join(export_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                old_manifest = json.load(f)
+            if (old_manifest.get('table'), old_manifest.get('partition_by')) == (table_name, partition_by):
+                previous = {partition['key']: partition for partition in old_manifest['partitions']}
+
+        with self._export_source() as source_path:
+            source = sqlite3.connect(source_path)
+            try:
+                partitions = self._plan_partitions(source, table_name, partition_by, partition_rows)
+            finally:
+                source.close()
+
+            entries = {}
+            tasks = []
+            for partition in partitions:
+                file_name = f"{table_name}_{partition['key']}"
+                old = previous.get(partition['key'])
+                if (old is not None and old['fingerprint'] == partition['fingerprint']
+                        and all(os.path.exists(os.path.join(export_dir, item['file'])) for item in old['files'])):
+                    entries[partition['key']] = old
+                    continue
+
+                order_by = [partition['column'], 'id'] if partition['column'] != 'id' else ['id']
+                query = ExportQuery(table_name, ranges={partition['column']: (partition['from'], partition['to'])},
+                                    order_by=order_by)
+                tasks.append((file_name, table_name, query))
+
+            def manifest(complete: bool) -> Dict[str, Any]:
+                return {
+                    'table': table_name,
+                    'partition_by': partition_by,
+                    'partition_rows': partition_rows if partition_by == 'rows' else None,
+                    'complete': complete,
+                    'exported_at': self._get_current_timestamp(),
+                    'database': self.db_connection.db_path,
+                    'seconds': round(time.perf_counter() - started, 3),
+                    'partitions': [entries[partition['key']] for partition in partitions
+                                   if partition['key'] in entries]
+                }
+
+            # Пока секции перезаписываются, манифест ссылается только на нетронутые файлы
+            if previous and tasks:
+                self._write_manifest(export_dir, manifest(complete=False))
+
+            # Крупные секции запускаются первыми
+            sizes = {f"{table_name}_{partition['key']}": partition['rows'] for partition in partitions}
+            tasks.sort(key=lambda task: sizes[task[0]], reverse=True)
+            self._log(f"  Секций: {len(partitions)}, к выгрузке: {len(tasks)}")
+            results = self._run_export_workers(source_path, export_dir, tasks, workers, progress)
+
+        exported_at = self._get_current_timestamp()
+        for partition in partitions:
+            result = results.get(f"{table_name}_{partition['key']}")
+            if result is None:
+                continue
+            bounds = (partition['from'], partition['to'])
+            if partition['column'] in Config.TIMESTAMP_COLUMNS:
+                bounds = tuple(timestamp_to_iso(value) for value in bounds)
+            entries[partition['key']] = {
+                'key': partition['key'],
+                'column': partition['column'],
+                'from': bounds[0],
+                'to': bounds[1],
+                'rows': result['rows'],
+                'fingerprint': partition['fingerprint'],
+                'exported_at': exported_at,
+                'seconds': result['seconds'],
+                'files': result['files']
+            }
+
+        final = manifest(complete=True)
+        manifest_path = self._write_manifest(export_dir, final)
+
+        # Файлы секций, которых больше нет (после записи манифеста, который на них уже не ссылается)
+        current = {item['file'] for entry in final['partitions'] for item in entry['files']}
+        for old in previous.values():
+            for item in old['files']:
+                path = os.path.join(export_dir, item['file'])
+                if item['file'] not in current and os.path.exists(path):
+                    os.remove(path)
+
+        self._log(f"  Экспорт завершен за {final['seconds']} с, манифест: {manifest_path}")
+        return export_dir
 
     def list_tables(self) -> List[str]:
         """Возвращает список всех таблиц в базе данных"""
-        conn = self.db_connection.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [table[0] for table in cursor.fetchall()]
-
-        conn.close()
-        return tables
\ No newline at end of file
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            tables = [table[0] for table in cursor.fetchall()]
+
+        return tables
+
+
+def _export_table_worker(source_path: str, table_name: str, export_dir: str, cancel_event, progress_queue,
+                         file_name: Optional[str] = None,
+                         query: Optional[ExportQuery] = None) -> Tuple[str, Dict[str, Any]]:
+    """Экспорт таблицы (или ее части по query) из файла базы в отдельном процессе.
+
+    Возвращает имя файлов без расширения и описание выгрузки для манифеста.
+    """
+    import time
+
+    file_name = file_name or table_name
+    started = time.perf_counter()
+    exporter = DataExporter(DatabaseConnection(source_path), verbose=False)
+    exporter.output_dir = export_dir
+
+    def progress(written: int, total: int):
+        progress_queue.put((file_name, written, total))
+        if cancel_event.is_set():
+            raise Exception("Экспорт отменен")
+
+    rows = exporter.export_table_data(table_name, query, progress=progress, file_name=file_name)
+    return file_name, {
+        'table': table_name,
+        'rows': rows,
+        'seconds': round(time.perf_counter() - started, 3),
+        'files': [{
+            'file': os.path.basename(path),
+            'bytes': os.path.getsize(path),
+            'sha256': exporter._file_checksum(path)
+        } for path in exporter.written_files]
+    }
@@ -0,0 +1,176 @@
+# Фоновые задачи экспорта
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from database.connection import DatabaseConnection
+from export.exporter import DataExporter
+from export.query import ExportQuery
+from config import Config
+
+
+class ExportCancelled(Exception):
+    """Экспорт отменен пользователем"""
+
+
+class ExportJob:
+    """Задача экспорта одной таблицы (table_name=None - всей базы) и ее прогресс.
+
+    partition_by - секционированный экспорт таблицы ('month' или 'rows')
+    """
+
+    def __init__(self, job_id: int, table_name: Optional[str], query: Optional[ExportQuery] = None,
+                 partition_by: Optional[str] = None):
+        self.id = job_id
+        self.table_name = table_name
+        self.query = query
+        self.partition_by = partition_by
+        self.status = 'queued'
+        self.rows_written = 0
+        self.rows_total = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.output_dir = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    @property
+    def elapsed(self) -> float:
+        """Время выполнения в секундах"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Скорость записи, строк в секунду"""
+        elapsed = self.elapsed
+        return self.rows_written / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def percent(self) -> float:
+        if self.rows_total == 0:
+            return 100.0 if self.status == 'done' else 0.0
+        return 100.0 * self.rows_written / self.rows_total
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def request_cancel(self):
+        """Запрос отмены: задача остановится при следующем сообщении о прогрессе"""
+        self._cancel_event.set()
+
+    def progress(self, rows_written: int, rows_total: int):
+        """Обратный вызов экспортера; прерывает запись, если задачу отменили"""
+        self.rows_written = rows_written
+        self.rows_total = rows_total
+        if self._cancel_event.is_set():
+            raise ExportCancelled()
+
+
+class ExportJobManager:
+    """Выполняет экспорт в пуле фоновых потоков с ограниченной очередью.
+
+    Каждая задача использует свой DataExporter (снимок базы и соединение
+    принадлежат потоку задачи), поэтому консоль остается доступной.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, workers: int = Config.EXPORT_WORKERS,
+                 queue_size: int = Config.EXPORT_QUEUE_SIZE):
+        self.db_connection = db_connection
+        self.workers = workers
+        self.queue_size = queue_size
+        self.jobs: List[ExportJob] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+
+    def submit(self, table_name: Optional[str], query: Optional[ExportQuery] = None,
+               partition_by: Optional[str] = None) -> ExportJob:
+        """Постановка экспорта в очередь (table_name=None - экспорт всей базы,
+        partition_by - секционированный экспорт таблицы)"""
+        with self._lock:
+            active = sum(1 for job in self.jobs if job.is_active)
+            if active >= self.workers + self.queue_size:
+                raise Exception("Очередь экспорта заполнена, дождитесь завершения текущих задач")
+
+            job = ExportJob(next(self._ids), table_name, query, partition_by)
+            self.jobs.append(job)
+            job.future = self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: ExportJob):
+        """Выполнение задачи в фоновом потоке"""
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            return
+
+        job.status = 'running'
+        job.started_at = time.monotonic()
+        try:
+            exporter = DataExporter(self.db_connection, verbose=False)
+            if job.table_name is None:
+                job.output_dir = exporter.export_database(progress=job.progress)
+            elif job.partition_by is not None:
+                job.output_dir = exporter.export_partitioned(job.table_name, job.partition_by,
+                                                             progress=job.progress)
+            else:
+                # Свое имя файлов у каждой задачи: параллельные задачи не делят файлы и контрольные точки
+                exporter.export_table_data(job.table_name, job.query, progress=job.progress,
+                                           file_name=f"{job.table_name}_{job.id}")
+                job.output_dir = exporter.output_dir
+            job.status = 'done'
+        except ExportCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.monotonic()
+
+    def cancel(self, job_id: int) -> bool:
+        """Отмена задачи: ожидающая снимается с очереди, выполняющаяся прерывается"""
+        job = self.get_job(job_id)
+        if job is None or not job.is_active:
+            return False
+
+        job.request_cancel()
+        if job.future.cancel():
+            job.status = 'cancelled'
+        return True
+
+    def get_job(self, job_id: int) -> Optional[ExportJob]:
+        """Задача по номеру"""
+        for job in self.jobs:
+            if job.id == job_id:
+                return job
+        return None
+
+    def active_jobs(self) -> List[ExportJob]:
+        """Задачи в очереди и в работе"""
+        return [job for job in self.jobs if job.is_active]
+
+    def wait(self, timeout: Optional[float] = None):
+        """Ожидание завершения всех задач"""
+        futures = [job.future for job in self.jobs if job.is_active]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in futures:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.result(remaining)
+            except Exception:
+                pass
+
+    def shutdown(self, cancel: bool = False):
+        """Остановка пула; cancel=True - с отменой незавершенных задач"""
+        if cancel:
+            for job in self.active_jobs():
+                self.cancel(job.id)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,147 @@
+# Описание частичного экспорта: колонки, фильтры и сортировка
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from config import Config
+from utils.helpers import timestamp_bound
+
+
+@dataclass
+class ExportQuery:
+    """Параметры выборки для экспорта, компилируемые в параметризованный SQL.
+
+    filters: {колонка: значение} - значение, список значений (IN) или None (IS NULL);
+    ranges: {колонка: (от, до)} - границы включительно, None - без границы;
+            для колонок дат принимаются datetime, date, ISO-строки и микросекунды;
+    order_by: колонки сортировки, "-колонка" - по убыванию.
+    Условия накладываются на сами колонки, без функций, поэтому SQLite
+    использует индексы (status, created_at), (assigned_to, status) и т.п.
+    """
+    table: str
+    columns: Optional[List[str]] = None
+    filters: Dict[str, Any] = field(default_factory=dict)
+    ranges: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+    order_by: List[str] = field(default_factory=list)
+    limit: Optional[int] = None
+
+    def _check_column(self, column: str, available: List[str]):
+        """Проверка, что колонка есть в таблице (имена подставляются в SQL)"""
+        if column not in available:
+            raise ValueError(f"Колонка {column} отсутствует в таблице {self.table}")
+
+    def _bound(self, column: str, value: Any, upper: bool) -> Any:
+        """Граница диапазона; даты приводятся к микросекундам от эпохи"""
+        if column not in Config.TIMESTAMP_COLUMNS:
+            return value
+        return timestamp_bound(value, upper)
+
+    def selected_columns(self, available: List[str]) -> List[str]:
+        """Колонки выборки в порядке таблицы или в порядке, заданном в columns"""
+        if not self.columns:
+            return list(available)
+        for column in self.columns:
+            self._check_column(column, available)
+        return list(dict.fromkeys(self.columns))
+
+    def _conditions(self, available: List[str]) -> Tuple[List[str], List[Any]]:
+        """Условия WHERE и их параметры"""
+        conditions = []
+        params = []
+
+        for column, value in self.filters.items():
+            self._check_column(column, available)
+            if value is None:
+                conditions.append(f"{column} IS NULL")
+            elif isinstance(value, (list, tuple, set)):
+                values = list(value)
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+
+        for column, (start, end) in self.ranges.items():
+            self._check_column(column, available)
+            if start is not None:
+                conditions.append(f"{column} >= ?")
+                params.append(self._bound(column, start, upper=False))
+            if end is not None:
+                conditions.append(f"{column} <= ?")
+                params.append(self._bound(column, end, upper=True))
+
+        return conditions, params
+
+    def _order(self, order_by: List[str], available: List[str]) -> List[str]:
+        """Выражения ORDER BY"""
+        order = []
+        for item in order_by:
+            column = item.lstrip('-')
+            self._check_column(column, available)
+            order.append(f"{column} DESC" if item.startswith('-') else column)
+        return order
+
+    def compile(self, available: List[str]) -> Tuple[str, List[Any]]:
+        """SQL-запрос и параметры для выборки из таблицы с колонками available"""
+        columns = self.selected_columns(available)
+        conditions, params = self._conditions(available)
+        order = self._order(self.order_by, available)
+
+        query = f"SELECT {', '.join(columns)} FROM {self.table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if order:
+            query += " ORDER BY " + ", ".join(order)
+        if self.limit is not None:
+            query += " LIMIT ?"
+            params.append(self.limit)
+
+        return query, params
+
+    def keyset_order(self, structure: List[Dict[str, Any]]) -> Optional[List[str]]:
+        """Порядок для чтения страницами по ключу: order_by и id для однозначности.
+
+        None - если такой порядок невозможен: в таблице нет id или сортировка
+        идет по колонке, допускающей NULL (сравнение с NULL теряет строки).
+        """
+        not_null = {col['name'] for col in structure if col['notnull'] or col['pk']}
+        if 'id' not in not_null:
+            return None
+        order = list(self.order_by)
+        if not any(item.lstrip('-') == 'id' for item in order):
+            order.append('id')
+        if any(item.lstrip('-') not in not_null for item in order):
+            return None
+        return order
+
+    def compile_page(self, available: List[str], order: List[str], after: Optional[List[Any]],
+                     size: int) -> Tuple[str, List[Any]]:
+        """SQL страницы выборки: строки после ключа after (значения колонок order), не больше size.
+
+        В конец выбранных колонок добавляются колонки order - из последней строки
+        страницы берется ключ следующей. Лимит запроса учитывает вызывающий.
+        """
+        columns = self.selected_columns(available)
+        conditions, params = self._conditions(available)
+        order_columns = [item.lstrip('-') for item in order]
+
+        if after is not None:
+            if len({item.startswith('-') for item in order}) == 1:
+                # Одно направление - сравнение строк, которое SQLite выполняет по индексу
+                operator = '<' if order[0].startswith('-') else '>'
+                conditions.append(f"({', '.join(order_columns)}) {operator} ({', '.join('?' * len(order))})")
+                params.extend(after)
+            else:
+                alternatives = []
+                for i, item in enumerate(order):
+                    parts = [f"{column} = ?" for column in order_columns[:i]]
+                    parts.append(f"{order_columns[i]} {'<' if item.startswith('-') else '>'} ?")
+                    alternatives.append(f"({' AND '.join(parts)})")
+                    params.extend(after[:i + 1])
+                conditions.append(f"({' OR '.join(alternatives)})")
+
+        query = f"SELECT {', '.join(columns + order_columns)} FROM {self.table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY " + ", ".join(self._order(order, available)) + " LIMIT ?"
+        params.append(size)
+
+        return query, params
@@ -1,11 +1,16 @@
 # Главный файл для запуска приложения
-from ui.console_ui import ConsoleUI
+import sys
 
 def main():
-    """Основная функция"""
+    """Основная функция: с аргументами - пакетный режим, без них - консольный интерфейс"""
+    if len(sys.argv) > 1:
+        from ui.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from ui.console_ui import ConsoleUI
     print("Запуск системы учета заявок техподдержки...")
     ui = ConsoleUI()
     ui.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
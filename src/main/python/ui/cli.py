@@ -0,0 +1,302 @@
+# Пакетный (неинтерактивный) режим: подкоманды с выводом в JSON
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+from typing import Iterable, Iterator, List, Optional, Tuple
+from config import Config
+from core.auth import AuthManager
+from core.duplicates import DuplicateDetector
+from core.query import TicketQuery
+from core.ticket_system import TicketSystem
+from database.connection import DatabaseConnection
+from database.persistent import PersistentConnection
+from database.sharding import ShardedDatabaseConnection
+from utils.helpers import parse_id_list
+
+
+class CliError(Exception):
+    """Ошибка пакетной команды (код выхода 2)"""
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Описание подкоманд"""
+    parser = argparse.ArgumentParser(
+        prog='main.py',
+        description="Система учета заявок: пакетный режим. Без аргументов запускается консольный интерфейс.",
+        epilog="Логин и пароль можно передать через переменные окружения TICKETS_USER и TICKETS_PASSWORD."
+    )
+    parser.add_argument('--db', default=Config.DB_NAME, help="файл базы данных")
+    parser.add_argument('--user', default=os.environ.get('TICKETS_USER'), help="логин")
+    parser.add_argument('--password', default=os.environ.get('TICKETS_PASSWORD'), help="пароль")
+    parser.add_argument('--jsonl', action='store_true', help="выводить списки по одному JSON-объекту в строке")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    create = commands.add_parser('create', help="создание заявок")
+    create.add_argument('--title', help="заголовок (одна заявка)")
+    create.add_argument('--description', default='', help="описание")
+    create.add_argument('--priority', default='medium', choices=list(Config.PRIORITY_ORDER))
+    create.add_argument('--file', help="JSON Lines с полями title, description, priority; '-' - stdin")
+
+    listing = commands.add_parser('list', help="список заявок по фильтрам")
+    listing.add_argument('--status', help="статусы через запятую")
+    listing.add_argument('--priority', help="приоритеты через запятую")
+    listing.add_argument('--assigned-to', help="ID исполнителя, 'me' или 'none'")
+    listing.add_argument('--created-by', type=int, help="ID автора")
+    listing.add_argument('--from', dest='created_from', help="создана не раньше (ISO-дата)")
+    listing.add_argument('--to', dest='created_to', help="создана не позже (ISO-дата)")
+    listing.add_argument('--order', default='priority,-created_at',
+                         help="сортировка через запятую: id, priority, created_at, updated_at; '-' - по убыванию")
+    listing.add_argument('--limit', type=int, default=None)
+    listing.add_argument('--archived', action='store_true', help="включая архив")
+
+    for name, help_text in (('status', "массовое изменение статуса"), ('assign', "массовое назначение")):
+        command = commands.add_parser(name, help=help_text)
+        if name == 'status':
+            command.add_argument('value', choices=list(Config.STATUS_SYMBOLS), help="новый статус")
+        else:
+            command.add_argument('value', help="ID саппорта или 'me'")
+        command.add_argument('--ids', help="ID заявок: \"1, 2, 5-10\"")
+        command.add_argument('--where-status', help="фильтр по текущему статусу")
+        command.add_argument('--where-priority', help="фильтр по приоритету")
+
+    stats = commands.add_parser('stats', help="статистика заявок")
+    stats.add_argument('--sla', action='store_true', help="добавить SLA-отчет")
+
+    export = commands.add_parser('export', help="экспорт таблицы или всей базы")
+    export.add_argument('table', nargs='?', help="таблица (без аргумента - вся база)")
+    export.add_argument('--output', default=Config.OUTPUT_DIR, help="папка для файлов")
+    export.add_argument('--partition-by', choices=['month', 'rows'],
+                        help="секционированный экспорт таблицы: по месяцам создания или по числу строк")
+    export.add_argument('--partition-rows', type=int, default=Config.EXPORT_PARTITION_ROWS,
+                        help="строк в секции при --partition-by rows")
+
+    archive = commands.add_parser('archive', help="архивация старых заявок в конечных статусах")
+    archive.add_argument('--older-than', type=float, default=Config.ARCHIVE_AFTER_DAYS,
+                         help="не изменялись дольше N дней")
+    archive.add_argument('--limit', type=int, default=None, help="не больше N заявок за запуск")
+    archive.add_argument('--dry-run', action='store_true', help="только посчитать заявки для архивации")
+    archive.add_argument('--restore', help="вернуть из архива заявки: \"1, 2, 5-10\"")
+
+    compact = commands.add_parser('compact', help="очистка журнала изменений")
+    compact.add_argument('--retention-days', type=float, default=Config.CHANGE_LOG_RETENTION_DAYS,
+                         help="удалять записи старше N дней, даже непрочитанные")
+
+    return parser
+
+
+def _split(value: Optional[str]) -> List[str]:
+    """Список значений через запятую"""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _read_tickets(path: str) -> Iterator[Tuple[str, str, str]]:
+    """Заявки из JSON Lines (файл или stdin) - читаются потоком, по строке"""
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                title = item['title']
+            except (ValueError, KeyError, TypeError):
+                raise CliError(f"Строка {number}: нужен JSON-объект с полем title")
+            priority = item.get('priority', 'medium')
+            if priority not in Config.PRIORITY_ORDER:
+                raise CliError(f"Строка {number}: неизвестный приоритет {priority}")
+            yield title, item.get('description', ''), priority
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    """Разбиение потока на пачки"""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BatchCli:
+    """Выполнение одной подкоманды: одно соединение на базу на весь запуск,
+    без интерактивного меню, фоновых сервисов и ожидания ввода"""
+
+    def __init__(self, args: argparse.Namespace, out=sys.stdout):
+        self.args = args
+        self.out = out
+
+        if Config.SHARD_COUNT > 1:
+            db_connection = ShardedDatabaseConnection(args.db)
+        else:
+            db_connection = DatabaseConnection(args.db)
+        # Сообщения инициализации не должны смешиваться с JSON на stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            db_connection.init_database()
+        self.db_connection = PersistentConnection(db_connection)
+
+        self.auth_manager = AuthManager(self.db_connection)
+        self.ticket_system = TicketSystem(self.db_connection, self.auth_manager)
+        # Индекс похожих заявок обновляется и при пакетном создании
+        self.duplicate_detector = DuplicateDetector(self.db_connection, self.ticket_system)
+
+    def close(self):
+        self.db_connection.close()
+
+    def _emit(self, value):
+        """Вывод результата в JSON"""
+        self.out.write(json.dumps(value, ensure_ascii=False) + "\n")
+
+    def _emit_list(self, items: List[dict]):
+        """Вывод списка: массив JSON или JSON Lines"""
+        if self.args.jsonl:
+            self.out.writelines(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+        else:
+            self._emit(items)
+
+    def login(self):
+        if not self.args.user or not self.args.password:
+            raise CliError("Укажите --user и --password (или TICKETS_USER и TICKETS_PASSWORD)")
+        if not self.auth_manager.login(self.args.user, self.args.password):
+            raise CliError("Неверный логин или пароль")
+
+    def run(self) -> int:
+        self.login()
+        getattr(self, f"cmd_{self.args.command}")()
+        return 0
+
+    def cmd_create(self):
+        if self.args.file:
+            created = []
+            for batch in _batches(_read_tickets(self.args.file), Config.CLI_BATCH_SIZE):
+                created.extend(self.ticket_system.add_tickets(batch))
+        elif self.args.title:
+            created = [self.ticket_system.add_ticket(self.args.title, self.args.description, self.args.priority)]
+        else:
+            raise CliError("Укажите --title или --file")
+        self._emit({'created': len(created), 'ids': created})
+
+    def _user_id(self, value: str) -> int:
+        """ID пользователя из аргумента ('me' - текущий)"""
+        if value == 'me':
+            return self.auth_manager.current_user.id
+        try:
+            return int(value)
+        except ValueError:
+            raise CliError(f"Неверный ID: {value}")
+
+    def cmd_list(self):
+        query = TicketQuery(statuses=_split(self.args.status), priorities=_split(self.args.priority),
+                            created_by=self.args.created_by, created_from=self.args.created_from,
+                            created_to=self.args.created_to, order_by=_split(self.args.order),
+                            limit=self.args.limit, include_archived=self.args.archived)
+        if self.args.assigned_to == 'none':
+            query.unassigned = True
+        elif self.args.assigned_to:
+            query.assigned_to = self._user_id(self.args.assigned_to)
+
+        self._emit_list([ticket.to_dict() for ticket in self.ticket_system.find_tickets(query)])
+
+    def _bulk_target(self) -> Tuple[Optional[List[int]], Optional[dict]]:
+        """Список ID или фильтр для массовой операции"""
+        if self.args.ids:
+            try:
+                return parse_id_list(self.args.ids), None
+            except ValueError:
+                raise CliError(f"Неверный список ID: {self.args.ids}")
+
+        filters = {}
+        if self.args.where_status:
+            filters['status'] = _split(self.args.where_status)
+        if self.args.where_priority:
+            filters['priority'] = _split(self.args.where_priority)
+        if not filters:
+            raise CliError("Укажите --ids или фильтр --where-status/--where-priority")
+        return None, filters
+
+    def cmd_status(self):
+        ticket_ids, filters = self._bulk_target()
+        self._emit({'updated': self.ticket_system.bulk_update_status(self.args.value, ticket_ids, filters)})
+
+    def cmd_assign(self):
+        ticket_ids, filters = self._bulk_target()
+        user_id = self._user_id(self.args.value)
+        self._emit({'updated': self.ticket_system.bulk_assign(user_id, ticket_ids, filters)})
+
+    def cmd_stats(self):
+        stats = self.ticket_system.count_tickets()
+        if self.args.sla:
+            from core.analytics import SlaAnalytics
+            stats['sla'] = SlaAnalytics(self.db_connection).report()
+        self._emit(stats)
+
+    def cmd_export(self):
+        if not self.auth_manager.is_support():
+            raise CliError("Экспорт доступен только для специалистов поддержки")
+        if self.db_connection.shard_count > 1:
+            raise CliError("Экспорт шардированной базы (SHARD_COUNT > 1) не поддерживается")
+
+        from export.exporter import DataExporter
+        # Экспорт читает снимок базы своим соединением
+        exporter = DataExporter(self.db_connection.db_connection, verbose=False)
+        exporter.output_dir = self.args.output
+        os.makedirs(exporter.output_dir, exist_ok=True)
+        if self.args.table:
+            if self.args.table not in exporter.list_tables():
+                raise CliError(f"Таблица {self.args.table} не найдена")
+            if self.args.partition_by:
+                directory = exporter.export_partitioned(self.args.table, self.args.partition_by,
+                                                        self.args.partition_rows)
+                self._emit({'table': self.args.table, 'directory': directory})
+                return
+            rows = exporter.export_table_data(self.args.table, file_name=self.args.table)
+            self._emit({'table': self.args.table, 'rows': rows, 'files': exporter.written_files})
+        else:
+            self._emit({'directory': exporter.export_database()})
+
+    def cmd_archive(self):
+        if not self.auth_manager.is_support():
+            raise CliError("Архивация доступна только для специалистов поддержки")
+
+        from core.archive import ArchiveManager
+        archive = ArchiveManager(self.db_connection)
+        if self.args.restore:
+            try:
+                ticket_ids = parse_id_list(self.args.restore)
+            except ValueError:
+                raise CliError(f"Неверный список ID: {self.args.restore}")
+            self._emit({'restored': archive.restore_tickets(ticket_ids)})
+        elif self.args.dry_run:
+            self._emit({'archivable': archive.count_archivable(self.args.older_than)})
+        else:
+            self._emit({'archived': archive.archive_tickets(self.args.older_than, limit=self.args.limit)})
+
+    def cmd_compact(self):
+        if not self.auth_manager.is_support():
+            raise CliError("Очистка журнала доступна только для специалистов поддержки")
+
+        from core.change_feed import ChangeFeed
+        self._emit({'deleted': ChangeFeed(self.db_connection).compact_all(self.args.retention_days)})
+
+
+def main(argv: List[str]) -> int:
+    """Точка входа пакетного режима, возвращает код выхода"""
+    args = build_parser().parse_args(argv)
+    cli = None
+    try:
+        cli = BatchCli(args)
+        return cli.run()
+    except CliError as e:
+        sys.stderr.write(json.dumps({'error': str(e)}, ensure_ascii=False) + "\n")
+        return 2
+    except Exception as e:
+        sys.stderr.write(json.dumps({'error': str(e)}, ensure_ascii=False) + "\n")
+        return 1
+    finally:
+        if cli is not None:
+            cli.close()
@@ -1,25 +1,95 @@
 # Консольный интерфейс пользователя
-import getpass
-from typing import List
+import datetime
+import json
+import os
+from typing import List, Optional, Tuple
 from database.connection import DatabaseConnection
+from database.sharding import ShardedDatabaseConnection
+from config import Config
 from core.auth import AuthManager
 from core.ticket_system import TicketSystem
-from export.exporter import DataExporter
+from core.dispatcher import TicketDispatcher
+from core.duplicates import DuplicateDetector
 from ui.display import DisplayManager
 from database.models import User, TicketWithRelations
+from utils.helpers import format_duration, parse_id_list
 
 
 class ConsoleUI:
     def __init__(self):
-        self.db_connection = DatabaseConnection()
-        self.auth_manager = AuthManager(self.db_connection)
-        self.ticket_system = TicketSystem(self.db_connection, self.auth_manager)
-        self.data_exporter = DataExporter(self.db_connection)
+        if Config.SHARD_COUNT > 1:
+            self.db_connection = ShardedDatabaseConnection()
+        else:
+            self.db_connection = DatabaseConnection()
+        self.write_queue = None
+        if Config.WRITE_QUEUE:
+            from database.writer import WriteQueue
+            self.write_queue = WriteQueue(self.db_connection)
+        self.auth_manager = AuthManager(self.db_connection, self.write_queue)
+        self.ticket_system = TicketSystem(self.db_connection, self.auth_manager, self.write_queue)
+        self.dispatcher = TicketDispatcher(self.db_connection, self.ticket_system)
+        # Поиск похожих заявок подписан на изменения заявок, поэтому создается сразу
+        # (создание дешевое, индекс строится при первом обращении); SLA-аналитика
+        # и вложения - при первом обращении
+        self.duplicate_detector = DuplicateDetector(self.db_connection, self.ticket_system)
+        self._analytics = None
+        self._attachments = None
+        # Сервис эскалации SLA создается при входе саппорта (см. _start_escalation)
+        self.escalator = None
+        self._breaches = []
+        self._data_exporter = None
+        self._export_jobs = None
         self.display = DisplayManager()
 
-        # Инициализация базы данных
+        # Инициализация базы данных (на теплом старте - только проверка версии схемы)
         self.db_connection.init_database()
 
+    def _start_escalation(self):
+        """Запуск сервиса эскалации SLA (только в сессии саппорта и если он включен)"""
+        if not Config.SLA_ESCALATION or not self.auth_manager.is_support():
+            return
+        if self.escalator is None:
+            from core.escalation import SlaEscalator
+            self.escalator = SlaEscalator(self.db_connection, self.ticket_system, hook=self._breaches.append)
+        self.escalator.start()
+
+    def _stop_escalation(self):
+        """Остановка сервиса эскалации SLA"""
+        if self.escalator is not None:
+            self.escalator.stop()
+
+    @property
+    def data_exporter(self):
+        """Экспортер создается (и импортируется) только при первом экспорте"""
+        if self._data_exporter is None:
+            from export.exporter import DataExporter
+            self._data_exporter = DataExporter(self.db_connection)
+        return self._data_exporter
+
+    @property
+    def analytics(self):
+        """SLA-аналитика создается при первом отчете"""
+        if self._analytics is None:
+            from core.analytics import SlaAnalytics
+            self._analytics = SlaAnalytics(self.db_connection)
+        return self._analytics
+
+    @property
+    def attachments(self):
+        """Хранилище вложений создается при первом обращении"""
+        if self._attachments is None:
+            from core.attachments import AttachmentStore
+            self._attachments = AttachmentStore(self.db_connection, self.ticket_system)
+        return self._attachments
+
+    @property
+    def export_jobs(self):
+        """Пул фоновых экспортов создается при первой задаче"""
+        if self._export_jobs is None:
+            from export.jobs import ExportJobManager
+            self._export_jobs = ExportJobManager(self.db_connection)
+        return self._export_jobs
+
     def auth_menu(self):
         """Меню авторизации"""
         while True:
@@ -101,6 +171,22 @@ class ConsoleUI:
             role_display = "Специалист поддержки" if user.role == 'support' else "Пользователь"
             print(f"Пользователь: {user.full_name} ({role_display})")
 
+    def print_escalations(self):
+        """Печать заявок, эскалированных сервисом SLA с прошлого показа меню"""
+        breaches, self._breaches[:] = list(self._breaches), []
+        if self.escalator is not None and self.escalator.last_error:
+            print(f"\nОшибка эскалации SLA: {self.escalator.last_error}")
+        if not breaches:
+            return
+
+        kinds = {'response': 'срок реакции', 'resolve': 'срок решения'}
+        print(f"\nНарушения SLA: {len(breaches)}")
+        for breach in breaches:
+            line = f"   #{breach.ticket_id}: {kinds.get(breach.kind, breach.kind)} ({breach.priority})"
+            if breach.new_priority:
+                line += f", приоритет повышен до {breach.new_priority}"
+            print(line)
+
     def add_ticket_ui(self):
         """UI для добавления новой заявки"""
         self.display.print_header("ДОБАВЛЕНИЕ НОВОЙ ЗАЯВКИ")
@@ -132,17 +218,117 @@ class ConsoleUI:
         priorities = {'1': 'high', '2': 'medium', '3': 'low'}
         priority = priorities.get(priority_choice, 'medium')
 
+        duplicate_of = None
+        duplicates = self.duplicate_detector.find_duplicates(title, description)
+        if duplicates:
+            duplicate_of = self.choose_duplicate_ui(duplicates, description)
+            if duplicate_of == 0:
+                return
+
         try:
-            ticket_id = self.ticket_system.add_ticket(title, description, priority)
+            ticket_id = self.ticket_system.add_ticket(title, description, priority, duplicate_of)
             print(f"Заявка #{ticket_id} успешно создана!")
         except Exception as e:
             print(f"Ошибка при создании заявки: {e}")
 
+    def choose_duplicate_ui(self, duplicates: List[Tuple[int, float]], description: str) -> Optional[int]:
+        """UI выбора действия при найденных похожих заявках.
+
+        Возвращает ID заявки для связи, None - создать без связи, 0 - заявку создавать не нужно.
+        """
+        print("\nНайдены похожие открытые заявки:")
+        for duplicate_id, similarity in duplicates:
+            ticket = self.ticket_system.get_ticket(duplicate_id)
+            title = ticket.title if ticket else "заявка другого пользователя"
+            print(f"  #{duplicate_id} ({similarity:.0%}) {title}")
+
+        print("\n1. Все равно создать заявку")
+        print("2. Создать и отметить как дубликат похожей заявки")
+        print("3. Добавить описание комментарием к похожей заявке")
+        print("4. Отмена")
+
+        choice = input("Ваш выбор (1-4): ").strip()
+        if choice not in ('2', '3'):
+            return 0 if choice == '4' else None
+
+        default_id = duplicates[0][0]
+        try:
+            target_id = int(input(f"ID похожей заявки (по умолчанию {default_id}): ").strip() or default_id)
+        except ValueError:
+            print("Ошибка: Неверный формат ID!")
+            return 0
+
+        if choice == '2':
+            return target_id
+
+        try:
+            self.ticket_system.add_comment(target_id, description)
+            print(f"Описание добавлено к заявке #{target_id}")
+        except Exception as e:
+            print(f"Ошибка: {e}")
+        return 0
+
     def view_tickets_ui(self):
         """UI для просмотра заявок"""
         tickets = self.ticket_system.get_all_tickets()
+        self.show_tickets_ui("СПИСОК ЗАЯВОК", tickets)
 
-        self.display.print_header("СПИСОК ЗАЯВОК")
+    def find_tickets_ui(self):
+        """UI для поиска заявок по фильтрам (без загрузки всего списка)"""
+        self.display.print_header("ПОИСК ЗАЯВОК")
+
+        from core.query import TicketQuery
+        query = TicketQuery(limit=Config.QUERY_PAGE_SIZE)
+        query.statuses = [value.strip() for value in input("Статусы через запятую (Enter - любые): ").split(',')
+                          if value.strip()]
+        query.priorities = [value.strip() for value in input("Приоритеты через запятую (Enter - любые): ").split(',')
+                            if value.strip()]
+
+        if self.auth_manager.is_support():
+            assignee = input("Исполнитель: ID, 'я' - мои, 'нет' - неназначенные (Enter - любой): ").strip().lower()
+            if assignee == 'я':
+                query.assigned_to = self.auth_manager.current_user.id
+            elif assignee == 'нет':
+                query.unassigned = True
+            elif assignee:
+                try:
+                    query.assigned_to = int(assignee)
+                except ValueError:
+                    print("Ошибка: Неверный формат ID!")
+                    return
+
+        try:
+            query.created_from = self._parse_date(input("Создана с (ДД.ММ.ГГГГ, Enter - без границы): "))
+            query.created_to = self._parse_date(input("Создана по (ДД.ММ.ГГГГ, Enter - без границы): "))
+        except ValueError:
+            print("Ошибка: Неверный формат даты!")
+            return
+
+        orders = {
+            '1': ['priority', '-created_at'],
+            '2': ['-created_at'],
+            '3': ['created_at'],
+            '4': ['-updated_at']
+        }
+        print("Сортировка: 1 - по приоритету, 2 - новые, 3 - старые, 4 - недавно измененные")
+        query.order_by = orders.get(input("Ваш выбор (Enter - 1): ").strip(), orders['1'])
+
+        limit = input(f"Сколько заявок показать (Enter - {Config.QUERY_PAGE_SIZE}): ").strip()
+        if limit:
+            try:
+                query.limit = max(1, int(limit))
+            except ValueError:
+                print("Ошибка: Неверное число!")
+                return
+
+        tickets = self.ticket_system.find_tickets(query)
+        self.show_tickets_ui(f"НАЙДЕНО ЗАЯВОК: {len(tickets)}", tickets)
+
+    def show_tickets_ui(self, title: str, tickets: List[TicketWithRelations]):
+        """Таблица заявок и действия над ними"""
+        self.ticket_system.attach_comment_stats(tickets)
+
+        self.display.print_header(title)
         self.display.print_tickets_table(tickets)
 
         if tickets:
@@ -150,13 +336,19 @@ class ConsoleUI:
             print("1. Просмотреть заявку подробно")
             if self.auth_manager.is_support():
                 print("2. Назначить заявку на себя")
-            print("3. Назад в меню")
+                print("3. Изменить статус нескольких заявок")
+                print("4. Назначить несколько заявок на себя")
+            print("5. Назад в меню")
 
             choice = input("Ваш выбор: ").strip()
             if choice == '1':
                 self.view_single_ticket_ui()
             elif choice == '2' and self.auth_manager.is_support():
                 self.assign_ticket_ui()
+            elif choice == '3' and self.auth_manager.is_support():
+                self.bulk_change_status_ui()
+            elif choice == '4' and self.auth_manager.is_support():
+                self.bulk_assign_ui()
 
     def view_single_ticket_ui(self):
         """UI для просмотра одной заявки"""
@@ -174,12 +366,22 @@ class ConsoleUI:
         self.display.print_header(f"ЗАЯВКА #{ticket_id}")
         self.display.print_ticket_card(ticket)
 
+        duplicate_of = self.ticket_system.get_duplicate_of(ticket_id)
+        if duplicate_of is not None:
+            print(f"Дубликат заявки #{duplicate_of}")
+
         print("\nДействия:")
         if self.auth_manager.is_support():
             print("1. Изменить статус")
             print("2. Назначить на себя")
         print("3. Удалить заявку")
         print("4. Назад к списку")
+        print("5. Обсуждение заявки")
+        print("6. Добавить комментарий" if not self.auth_manager.is_support() else "6. Ответить пользователю")
+        print("7. История изменений")
+        if self.auth_manager.is_support():
+            print("8. Объединить с другой заявкой")
+        print("9. Вложения")
 
         choice = input("Ваш выбор: ").strip()
 
@@ -189,10 +391,129 @@ class ConsoleUI:
             self.assign_ticket_to_self(ticket_id)
         elif choice == '3':
             self.delete_ticket_ui(ticket_id)
+        elif choice == '5':
+            self.view_comments_ui(ticket_id)
+        elif choice == '6':
+            self.add_comment_ui(ticket_id)
+        elif choice == '7':
+            self.display.print_header(f"ИСТОРИЯ ЗАЯВКИ #{ticket_id}")
+            self.display.print_history(self.ticket_system.get_ticket_history(ticket_id))
+        elif choice == '8' and self.auth_manager.is_support():
+            self.merge_ticket_ui(ticket)
+        elif choice == '9':
+            self.attachments_ui(ticket_id)
 
-    def change_status_ui(self, ticket_id: int):
-        """UI для изменения статуса заявки"""
-        print("\nВыберите новый статус:")
+    def attachments_ui(self, ticket_id: int):
+        """UI для вложений заявки: список, добавление, сохранение и удаление"""
+        while True:
+            self.display.print_header(f"ВЛОЖЕНИЯ ЗАЯВКИ #{ticket_id}")
+            try:
+                attachments = self.attachments.get_attachments(ticket_id)
+            except Exception as e:
+                print(f"Ошибка: {e}")
+                return
+            self.display.print_attachments(attachments)
+
+            print("\n1. Добавить файл")
+            if attachments:
+                print("2. Сохранить вложение")
+                print("3. Удалить вложение")
+            print("4. Назад")
+
+            choice = input("Ваш выбор: ").strip()
+            if choice == '1':
+                path = input("Путь к файлу: ").strip()
+                if not os.path.isfile(path):
+                    print("Ошибка: Файл не найден!")
+                    continue
+                try:
+                    attachment = self.attachments.attach_file(ticket_id, path)
+                    print(f"Файл '{attachment.file_name}' прикреплен к заявке")
+                except Exception as e:
+                    print(f"Ошибка: {e}")
+            elif choice in ('2', '3') and attachments:
+                try:
+                    attachment_id = int(input("ID вложения: "))
+                except ValueError:
+                    print("Ошибка: Неверный формат ID!")
+                    continue
+                attachment = next((item for item in attachments if item.id == attachment_id), None)
+                if attachment is None:
+                    print("Ошибка: Вложение не найдено!")
+                    continue
+                try:
+                    if choice == '2':
+                        path = os.path.join(Config.OUTPUT_DIR, 'attachments', str(ticket_id),
+                                            os.path.basename(attachment.file_name))
+                        self.attachments.save_attachment(ticket_id, attachment_id, path)
+                        print(f"Вложение сохранено: {path}")
+                    else:
+                        self.attachments.delete_attachment(ticket_id, attachment_id)
+                        print("Вложение удалено")
+                except Exception as e:
+                    print(f"Ошибка: {e}")
+            elif choice == '4':
+                return
+
+    def merge_ticket_ui(self, ticket: TicketWithRelations):
+        """UI для объединения заявки-дубликата с основной заявкой"""
+        for duplicate_id, similarity in self.duplicate_detector.find_duplicates(
+                ticket.title, ticket.description, exclude_id=ticket.id):
+            print(f"  Похожая: #{duplicate_id} ({similarity:.0%})")
+
+        try:
+            into_id = int(input("ID основной заявки: "))
+        except ValueError:
+            print("Ошибка: Неверный формат ID!")
+            return
+
+        try:
+            self.ticket_system.merge_ticket(ticket.id, into_id)
+            print(f"Заявка #{ticket.id} объединена с заявкой #{into_id} и закрыта")
+        except Exception as e:
+            print(f"Ошибка: {e}")
+
+    def view_comments_ui(self, ticket_id: int):
+        """UI для постраничного просмотра обсуждения заявки"""
+        self.display.print_header(f"ОБСУЖДЕНИЕ ЗАЯВКИ #{ticket_id}")
+
+        last_comment = None
+        while True:
+            comments = self.ticket_system.get_comments(ticket_id, after=last_comment)
+            if last_comment is None or comments:
+                self.display.print_comments(comments)
+            if len(comments) < Config.COMMENTS_PAGE_SIZE:
+                break
+
+            last_comment = comments[-1]
+            more = input("Показать следующие комментарии? (y/N): ").strip().lower()
+            if more != 'y':
+                break
+
+    def add_comment_ui(self, ticket_id: int):
+        """UI для добавления комментария или ответа по заявке"""
+        print("Введите текст (для завершения введите пустую строку):")
+        lines = []
+        while True:
+            line = input().strip()
+            if not line:
+                break
+            lines.append(line)
+
+        body = "\n".join(lines)
+        if not body:
+            print("Ошибка: Комментарий не может быть пустым!")
+            return
+
+        try:
+            self.ticket_system.add_comment(ticket_id, body)
+            print(f"Комментарий к заявке #{ticket_id} добавлен!")
+        except Exception as e:
+            print(f"Ошибка: {e}")
+
+    def choose_status(self, prompt: str = "Выберите новый статус:"):
+        """Выбор статуса из списка, возвращает None при неверном выборе"""
+        print(f"\n{prompt}")
         print("1. Открыта")
         print("2. В работе")
         print("3. Решена")
@@ -200,14 +521,68 @@ class ConsoleUI:
 
         status_choice = input("Ваш выбор (1-4): ").strip()
         status_map = {'1': 'open', '2': 'in_progress', '3': 'resolved', '4': 'closed'}
+        return status_map.get(status_choice)
+
+    def change_status_ui(self, ticket_id: int):
+        """UI для изменения статуса заявки"""
+        new_status = self.choose_status()
 
-        if status_choice in status_map:
-            new_status = status_map[status_choice]
+        if new_status:
             self.ticket_system.update_ticket_status(ticket_id, new_status)
             print(f"Статус заявки #{ticket_id} изменен на '{new_status}'")
         else:
             print("Ошибка: Неверный выбор!")
 
+    def select_tickets_ui(self):
+        """Выбор нескольких заявок: список ID или все заявки с заданным статусом"""
+        text = input("Введите ID заявок через запятую (например 1,2,5-10)\n"
+                     "или оставьте пустым для выбора по текущему статусу: ").strip()
+        if text:
+            try:
+                ticket_ids = parse_id_list(text)
+            except ValueError:
+                print("Ошибка: Неверный формат списка ID!")
+                return None
+            if not ticket_ids:
+                print("Ошибка: Список ID пуст!")
+                return None
+            return {'ticket_ids': ticket_ids}
+
+        current_status = self.choose_status("Выберите текущий статус заявок:")
+        if not current_status:
+            print("Ошибка: Неверный выбор!")
+            return None
+        return {'filters': {'status': current_status}}
+
+    def bulk_change_status_ui(self):
+        """UI для массового изменения статуса заявок"""
+        selection = self.select_tickets_ui()
+        if not selection:
+            return
+
+        new_status = self.choose_status()
+        if not new_status:
+            print("Ошибка: Неверный выбор!")
+            return
+
+        try:
+            count = self.ticket_system.bulk_update_status(new_status, **selection)
+            print(f"Статус изменен на '{new_status}' у заявок: {count}")
+        except Exception as e:
+            print(f"Ошибка: {e}")
+
+    def bulk_assign_ui(self):
+        """UI для массового назначения заявок на себя"""
+        selection = self.select_tickets_ui()
+        if not selection:
+            return
+
+        try:
+            count = self.ticket_system.bulk_assign(self.auth_manager.current_user.id, **selection)
+            print(f"На вас назначено заявок: {count}")
+        except Exception as e:
+            print(f"Ошибка: {e}")
+
     def assign_ticket_ui(self):
         """UI для назначения заявки"""
         try:
@@ -263,14 +638,204 @@ class ConsoleUI:
 
         print(f"\nВсего заявок: {len(tickets)}")
 
+    def sla_statistics_ui(self):
+        """UI SLA-аналитики: динамика заявок и время решения"""
+        days = input(f"За сколько последних дней (по умолчанию {Config.SLA_REPORT_DAYS}): ").strip()
+        try:
+            days = int(days) if days else Config.SLA_REPORT_DAYS
+        except ValueError:
+            print("Ошибка: Введите число!")
+            return
+
+        end = datetime.datetime.now(datetime.timezone.utc).date()
+        start = end - datetime.timedelta(days=max(days, 1) - 1)
+        report = self.analytics.report(start, end)
+
+        self.display.print_header(f"SLA-АНАЛИТИКА {report['period']['start']} - {report['period']['end']}")
+
+        print("Дата         Открыто  Решено  Переоткр.  Остаток")
+        for row in report['daily']:
+            print(f"{row['date']}  {row['opened']:>7}  {row['closed']:>6}  {row['reopened']:>9}  {row['backlog']:>7}")
+
+        percentiles = [f"p{percentile:g}" for percentile in Config.SLA_PERCENTILES]
+        groups = [
+            ("Время решения по приоритетам:", 'by_priority',
+             lambda row: self.display.format_priority(row['priority'])),
+            ("Время решения по исполнителям:", 'by_assignee',
+             lambda row: row['assignee_name'] or 'Не назначена'),
+        ]
+        for title, key, label in groups:
+            print(f"\n{title}")
+            if not report[key]:
+                print("   Нет решенных заявок за период")
+            for row in report[key]:
+                values = "  ".join(f"{name}: {format_duration(row[f'{name}_seconds'])}" for name in percentiles)
+                print(f"   {label(row)[:25]:<25} решено: {row['resolved']:>5}  "
+                      f"среднее: {format_duration(row['mean_seconds'])}  {values}")
+
+        if input("\nСохранить отчет в JSON? (y/N): ").strip().lower() == 'y':
+            os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
+            path = os.path.join(Config.OUTPUT_DIR, "sla_report.json")
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            print(f"Отчет сохранен в {path}")
+
     def export_data_ui(self):
         """UI для экспорта данных"""
         if not self.auth_manager.is_support():
             print("Ошибка: Экспорт данных доступен только для специалистов поддержки!")
             return
+        if self.db_connection.shard_count > 1:
+            print("Ошибка: Экспорт шардированной базы (SHARD_COUNT > 1) не поддерживается!")
+            return
+
+        while True:
+            self.display.print_header("ЭКСПОРТ ДАННЫХ")
+
+            if self._export_jobs is not None and self._export_jobs.jobs:
+                self.print_export_jobs()
+
+            print("1. Новый экспорт таблицы")
+            print("2. Экспорт всей базы")
+            print("3. Обновить список задач")
+            print("4. Отменить задачу экспорта")
+            print("5. Назад")
+
+            choice = input("Ваш выбор: ").strip()
+            if choice == '1':
+                self.new_export_ui()
+            elif choice == '2':
+                self.export_database_ui()
+            elif choice == '4':
+                self.cancel_export_ui()
+            elif choice != '3':
+                return
+
+    def maintenance_ui(self):
+        """UI обслуживания базы: архивация заявок и очистка журнала изменений"""
+        from core.archive import ArchiveManager
+        archive = ArchiveManager(self.db_connection)
+
+        while True:
+            self.display.print_header("ОБСЛУЖИВАНИЕ БАЗЫ")
+
+            print("1. Архивировать старые закрытые заявки")
+            print("2. Вернуть заявки из архива")
+            print("3. Очистить журнал изменений")
+            print("4. Назад")
+
+            choice = input("Ваш выбор: ").strip()
+            if choice == '1':
+                self.archive_tickets_ui(archive)
+            elif choice == '2':
+                self.restore_tickets_ui(archive)
+            elif choice == '3':
+                self.compact_changes_ui()
+            else:
+                return
+
+    def archive_tickets_ui(self, archive):
+        """UI для переноса старых заявок в конечных статусах в архив"""
+        text = input(f"Архивировать заявки, не изменявшиеся дольше N дней "
+                     f"(Enter - {Config.ARCHIVE_AFTER_DAYS}): ").strip()
+        try:
+            days = float(text) if text else Config.ARCHIVE_AFTER_DAYS
+        except ValueError:
+            print("Ошибка: Неверный формат числа!")
+            return
+
+        count = archive.count_archivable(days)
+        print(f"Заявок для архивации: {count}")
+        if not count:
+            return
+
+        confirm = input("Перенести их в архив? (y/N): ").strip().lower()
+        if confirm != 'y':
+            print("Архивация отменена")
+            return
+
+        try:
+            print(f"Перенесено в архив заявок: {archive.archive_tickets(days)}")
+        except Exception as e:
+            print(f"Ошибка при архивации: {e}")
+
+    def restore_tickets_ui(self, archive):
+        """UI для возврата заявок из архива"""
+        try:
+            ticket_ids = parse_id_list(input("Введите ID заявок через запятую (например 1,2,5-10): "))
+        except ValueError:
+            print("Ошибка: Неверный формат списка ID!")
+            return
+        if not ticket_ids:
+            print("Ошибка: Список ID пуст!")
+            return
+
+        try:
+            print(f"Возвращено из архива заявок: {archive.restore_tickets(ticket_ids)}")
+        except Exception as e:
+            print(f"Ошибка при возврате из архива: {e}")
+
+    def compact_changes_ui(self):
+        """UI для удаления прочитанных и устаревших записей журнала изменений"""
+        text = input(f"Хранить записи не старше N дней (Enter - {Config.CHANGE_LOG_RETENTION_DAYS}): ").strip()
+        try:
+            days = float(text) if text else Config.CHANGE_LOG_RETENTION_DAYS
+        except ValueError:
+            print("Ошибка: Неверный формат числа!")
+            return
 
-        self.display.print_header("ЭКСПОРТ ДАННЫХ")
+        from core.change_feed import ChangeFeed
+        try:
+            print(f"Удалено записей журнала: {ChangeFeed(self.db_connection).compact_all(days)}")
+        except Exception as e:
+            print(f"Ошибка при очистке журнала: {e}")
 
+    def print_export_jobs(self):
+        """Список задач экспорта с прогрессом"""
+        statuses = {
+            'queued': 'в очереди',
+            'running': 'выполняется',
+            'done': 'готово',
+            'cancelled': 'отменено',
+            'failed': 'ошибка'
+        }
+        print("Задачи экспорта:")
+        for job in self.export_jobs.jobs:
+            source = job.table_name or "вся база"
+            if job.partition_by is not None:
+                source += " (секции)"
+            line = (f"  #{job.id} {source:<20} {statuses[job.status]:<12} {job.percent:5.1f}%  "
+                    f"{job.rows_written}/{job.rows_total} строк  {job.throughput:.0f} строк/с")
+            if job.error:
+                line += f"  ({job.error})"
+            elif job.status == 'done' and (job.table_name is None or job.partition_by is not None):
+                line += f"  -> {job.output_dir}"
+            print(line)
+        print()
+
+    def export_database_ui(self):
+        """UI для запуска экспорта всех таблиц в фоне"""
+        try:
+            job = self.export_jobs.submit(None)
+            print(f"Экспорт всей базы запущен в фоне (задача #{job.id})")
+        except Exception as e:
+            print(f"Ошибка при экспорте: {e}")
+
+    def cancel_export_ui(self):
+        """UI для отмены задачи экспорта"""
+        try:
+            job_id = int(input("Номер задачи: "))
+        except ValueError:
+            print("Ошибка: Неверный формат номера!")
+            return
+
+        if self.export_jobs.cancel(job_id):
+            print(f"Задача #{job_id} отменена, незавершенные файлы будут удалены")
+        else:
+            print(f"Ошибка: Активная задача #{job_id} не найдена!")
+
+    def new_export_ui(self):
+        """UI для запуска экспорта таблицы в фоне"""
         # Показываем доступные таблицы
         tables = self.data_exporter.list_tables()
         print("Доступные таблицы в базе данных:")
@@ -294,17 +859,116 @@ class ConsoleUI:
             except ValueError:
                 print("Введите корректный номер!")
 
-        # Экспортируем данные
+        # Секции выгружаются целиком, без выбора колонок и фильтров
+        print("Разбить на секции: 1 - по месяцам создания, "
+              f"2 - по {Config.EXPORT_PARTITION_ROWS} строк (Enter - одним файлом)")
+        partition_by = {'1': 'month', '2': 'rows'}.get(input("Ваш выбор: ").strip())
+
+        query = None
+        if partition_by is None and input("Настроить колонки и фильтры? (y/N): ").strip().lower() == 'y':
+            query = self.export_query_ui(table_name)
+            if query is None:
+                return
+
+        # Экспорт выполняется в фоне, прогресс - в списке задач
         try:
-            self.data_exporter.export_table_data(table_name)
+            job = self.export_jobs.submit(table_name, query, partition_by)
+            print(f"Экспорт таблицы {table_name} запущен в фоне (задача #{job.id})")
         except Exception as e:
             print(f"Ошибка при экспорте: {e}")
 
+    def export_query_ui(self, table_name: str):
+        """UI для выбора колонок, фильтров и сортировки экспорта"""
+        from export.query import ExportQuery
+
+        available = [column['name'] for column in self.data_exporter.get_table_structure(table_name)]
+        print(f"Колонки: {', '.join(available)}")
+
+        query = ExportQuery(table_name)
+        columns = input("Колонки через запятую (Enter - все): ").strip()
+        if columns:
+            query.columns = [column.strip() for column in columns.split(',') if column.strip()]
+
+        # Фильтры по значениям: несколько значений через запятую
+        for column, prompt in (('status', "Статусы"), ('priority', "Приоритеты"), ('assigned_to', "ID исполнителя")):
+            if column not in available:
+                continue
+            values = [value.strip() for value in input(f"{prompt} (Enter - любые): ").split(',') if value.strip()]
+            if column == 'assigned_to':
+                try:
+                    values = [int(value) for value in values]
+                except ValueError:
+                    print("Ошибка: Неверный формат ID!")
+                    return None
+            if values:
+                query.filters[column] = values
+
+        for column, prompt in (('created_at', "Дата создания"), ('updated_at', "Дата изменения")):
+            if column not in available:
+                continue
+            try:
+                start = self._parse_date(input(f"{prompt} с (ДД.ММ.ГГГГ, Enter - без границы): "))
+                end = self._parse_date(input(f"{prompt} по (ДД.ММ.ГГГГ, Enter - без границы): "))
+            except ValueError:
+                print("Ошибка: Неверный формат даты!")
+                return None
+            if start or end:
+                query.ranges[column] = (start, end)
+
+        order = input("Сортировка через запятую, -колонка - по убыванию (Enter - без сортировки): ").strip()
+        if order:
+            query.order_by = [column.strip() for column in order.split(',') if column.strip()]
+
+        return query
+
+    def _parse_date(self, text: str):
+        """Дата в формате ДД.ММ.ГГГГ или None для пустой строки"""
+        text = text.strip()
+        if not text:
+            return None
+        return datetime.datetime.strptime(text, "%d.%m.%Y").date()
+
+    def dispatch_tickets_ui(self):
+        """UI для автоматического распределения открытых заявок"""
+        if not self.auth_manager.is_support():
+            print("Ошибка: Распределение заявок доступно только для специалистов поддержки!")
+            return
+
+        self.display.print_header("РАСПРЕДЕЛЕНИЕ ЗАЯВОК")
+
+        pending = self.dispatcher.pending_count()
+        print(f"Открытых неназначенных заявок: {pending}")
+        if not pending:
+            return
+
+        confirm = input("Распределить их между специалистами поддержки? (y/N): ").strip().lower()
+        if confirm != 'y':
+            print("Распределение отменено")
+            return
+
+        try:
+            assignments = self.dispatcher.dispatch()
+        except Exception as e:
+            print(f"Ошибка при распределении: {e}")
+            return
+
+        per_agent = {}
+        for _, user_id in assignments:
+            per_agent[user_id] = per_agent.get(user_id, 0) + 1
+
+        print(f"Распределено заявок: {len(assignments)}")
+        for user_id, count in sorted(per_agent.items()):
+            print(f"   Саппорт #{user_id}: {count}")
+
     def main_menu(self):
         """Главное меню"""
+        self._start_escalation()
         while True:
+            self.ticket_system.process_events()
             self.display.print_header("СИСТЕМА УЧЕТА ЗАЯВОК ТЕХПОДДЕРЖКИ")
             self.print_user_info()
+            if self.auth_manager.is_support():
+                self.print_escalations()
             print()
 
             menu_items = [
@@ -316,7 +980,11 @@ class ConsoleUI:
             # Добавляем пункт экспорта только для саппортов
             if self.auth_manager.is_support():
                 menu_items.append("4. Экспорт данных")
-                menu_items.append("5. Выйти из системы")
+                menu_items.append("5. Распределить заявки")
+                menu_items.append("6. SLA-аналитика")
+                menu_items.append("7. Поиск заявок")
+                menu_items.append("8. Обслуживание базы")
+                menu_items.append("9. Выйти из системы")
             else:
                 menu_items.append("4. Выйти из системы")
 
@@ -333,8 +1001,17 @@ class ConsoleUI:
                 self.show_statistics()
             elif choice == '4' and self.auth_manager.is_support():
                 self.export_data_ui()
+            elif choice == '5' and self.auth_manager.is_support():
+                self.dispatch_tickets_ui()
+            elif choice == '6' and self.auth_manager.is_support():
+                self.sla_statistics_ui()
+            elif choice == '7' and self.auth_manager.is_support():
+                self.find_tickets_ui()
+            elif choice == '8' and self.auth_manager.is_support():
+                self.maintenance_ui()
             elif (choice == '4' and not self.auth_manager.is_support()) or \
-                    (choice == '5' and self.auth_manager.is_support()):
+                    (choice == '9' and self.auth_manager.is_support()):
+                self._stop_escalation()
                 self.auth_manager.logout()
                 print("Выход из системы выполнен.")
                 break
@@ -349,4 +1026,14 @@ class ConsoleUI:
             if self.auth_menu():
                 self.main_menu()
             else:
-                break
\ No newline at end of file
+                break
+
+        if self._export_jobs is not None:
+            if self._export_jobs.active_jobs():
+                print("Ожидание завершения фонового экспорта...")
+            self._export_jobs.shutdown()
+
+        self._stop_escalation()
+
+        if self.write_queue is not None:
+            self.write_queue.close()
\ No newline at end of file
@@ -1,24 +1,81 @@
 # Отображение данных в консоли
+import sys
 import textwrap
-import datetime
-from typing import List, Tuple
-from database.models import TicketWithRelations
+from typing import Iterable, Iterator, List, Tuple
+from database.models import Attachment, Comment, TicketHistoryEntry, TicketWithRelations
 from config import Config
+from utils.helpers import format_datetime, format_short_datetime, format_size
 
 
 class DisplayManager:
-    def __init__(self):
+    STATUS_MAP = {
+        'open': 'ОТКР',
+        'in_progress': 'РАБОТА',
+        'closed': 'ЗАКР',
+        'resolved': 'РЕШЕНА'
+    }
+
+    PRIORITY_MAP = {
+        'high': 'ВЫС',
+        'medium': 'СРЕД',
+        'low': 'НИЗ'
+    }
+
+    TABLE_COLUMNS = ('id', 'title', 'status', 'priority', 'author', 'replies', 'last_reply')
+    TABLE_HEADERS = ('ID', 'ЗАГОЛОВОК', 'СТАТУС', 'ПРИОР.', 'АВТОР', 'ОТВ.', 'ПОСЛ. ОТВЕТ')
+
+    def __init__(self, output=None):
         self.console_width = Config.CONSOLE_WIDTH
+        self.output = output
+        self._precompute_table()
+        self._precompute_card()
+
+    def _precompute_table(self):
+        """Предварительный расчет границ и формата строк таблицы"""
+        widths = Config.COLUMN_WIDTHS
+        self._widths = widths
+        segments = ["─" * widths[column] for column in self.TABLE_COLUMNS]
+
+        self._table_top = "┌" + "┬".join(segments) + "┐"
+        self._table_middle = "├" + "┼".join(segments) + "┤"
+        self._table_bottom = "└" + "┴".join(segments) + "┘"
+
+        # Формат строки данных: выравнивание по колонкам как в заголовке
+        self._row_format = (
+            f"│ {{0:^{widths['id'] - 2}}} │ {{1:<{widths['title'] - 2}}} │ "
+            f"{{2:^{widths['status'] - 2}}} │ {{3:^{widths['priority'] - 2}}} │ "
+            f"{{4:<{widths['author'] - 2}}} │ {{5:^{widths['replies'] - 2}}} │ "
+            f"{{6:^{widths['last_reply'] - 2}}} │"
+        )
+        header_format = "│ " + " │ ".join(
+            f"{{{i}:^{widths[column] - 2}}}" for i, column in enumerate(self.TABLE_COLUMNS)
+        ) + " │"
+        self._table_header = header_format.format(*self.TABLE_HEADERS)
+
+        self._title_limit = widths['title'] - 2
+        self._author_limit = widths['author'] - 2
+
+    def _precompute_card(self):
+        """Предварительный расчет разделителей карточки заявки"""
+        line = '─' * (self.console_width - 2)
+        self._card_top = f"┌{line}┐"
+        self._card_separator = f"├{line}┤"
+        self._card_bottom = f"└{line}┘"
+        self._content_width = self.console_width - 4  # минус границы
+        self._header_rule = "=" * self.console_width
+
+    def _write(self, text: str):
+        """Запись готового блока текста одним вызовом"""
+        stream = self.output or sys.stdout
+        stream.write(text)
 
     def print_header(self, text: str):
         """Печать заголовка"""
-        print("\n" + "=" * self.console_width)
-        print(f" {text}".center(self.console_width))
-        print("=" * self.console_width)
+        self._write(f"\n{self._header_rule}\n{f' {text}'.center(self.console_width)}\n{self._header_rule}\n")
 
     def print_separator(self):
         """Печать разделителя"""
-        print("-" * self.console_width)
+        self._write("-" * self.console_width + "\n")
 
     def wrap_text(self, text: str, width: int) -> List[str]:
         """Разбивает текст на строки заданной ширины"""
@@ -31,53 +88,137 @@ class DisplayManager:
                 lines.append('')
         return lines
 
-    def print_ticket_card(self, ticket: TicketWithRelations):
-        """Печать карточки заявки в псевдографическом стиле"""
+    def render_ticket_card(self, ticket: TicketWithRelations) -> str:
+        """Формирует карточку заявки в псевдографическом стиле"""
         # Символы для статусов и приоритетов
         status_symbol = Config.STATUS_SYMBOLS.get(ticket.status, '[ ]')
         priority_symbol = Config.PRIORITY_SYMBOLS.get(ticket.priority, '!')
 
-        created = datetime.datetime.fromisoformat(ticket.created_at).strftime("%d.%m.%Y %H:%M")
-        updated = datetime.datetime.fromisoformat(ticket.updated_at).strftime("%d.%m.%Y %H:%M")
-
-        content_width = self.console_width - 4  # минус границы
+        created = format_datetime(ticket.created_at)
+        updated = format_datetime(ticket.updated_at)
 
-        print(f"┌{'─' * (self.console_width - 2)}┐")
+        content_width = self._content_width
+        separator = self._card_separator
+        lines = [self._card_top]
 
         # Заголовок с ID, статусом и приоритетом
         header_line = f"ID: #{ticket.id:04d} {status_symbol} {ticket.status.upper():<12} {priority_symbol} {ticket.priority.upper():<8}"
-        print(f"│ {header_line.ljust(content_width)} │")
-        print(f"├{'─' * (self.console_width - 2)}┤")
+        lines.append(f"│ {header_line.ljust(content_width)} │")
+        lines.append(separator)
 
         # Автор и назначенный специалист
         author_line = f"Автор: {ticket.created_by_name}"
         if ticket.assigned_to_name:
             author_line += f" | Назначен: {ticket.assigned_to_name}"
-        print(f"│ {author_line.ljust(content_width)} │")
-        print(f"├{'─' * (self.console_width - 2)}┤")
+        lines.append(f"│ {author_line.ljust(content_width)} │")
+        lines.append(separator)
 
         # Заголовок заявки
         title_line = f"Заголовок: {ticket.title}"
-        title_lines = self.wrap_text(title_line, content_width)
-        for line in title_lines:
-            print(f"│ {line.ljust(content_width)} │")
+        for line in self.wrap_text(title_line, content_width):
+            lines.append(f"│ {line.ljust(content_width)} │")
 
-        print(f"├{'─' * (self.console_width - 2)}┤")
+        lines.append(separator)
 
         # Описание
         desc_lines = self.wrap_text(ticket.description, content_width)
         if desc_lines:
-            print(f"│ {'ОПИСАНИЕ:'.ljust(content_width)} │")
-            print(f"├{'─' * (self.console_width - 2)}┤")
+            lines.append(f"│ {'ОПИСАНИЕ:'.ljust(content_width)} │")
+            lines.append(separator)
             for line in desc_lines:
-                print(f"│ {line.ljust(content_width)} │")
+                lines.append(f"│ {line.ljust(content_width)} │")
 
-        print(f"├{'─' * (self.console_width - 2)}┤")
+        lines.append(separator)
 
         # Даты
-        print(f"│ Создана:  {created.ljust(content_width - 10)} │")
-        print(f"│ Обновлена: {updated.ljust(content_width - 11)} │")
-        print(f"└{'─' * (self.console_width - 2)}┘")
+        lines.append(f"│ Создана:  {created.ljust(content_width - 10)} │")
+        lines.append(f"│ Обновлена: {updated.ljust(content_width - 11)} │")
+        lines.append(self._card_bottom)
+        lines.append('')
+
+        return "\n".join(lines)
+
+    def print_ticket_card(self, ticket: TicketWithRelations):
+        """Печать карточки заявки в псевдографическом стиле"""
+        self._write(self.render_ticket_card(ticket))
+
+    def render_comments(self, comments: List[Comment]) -> str:
+        """Формирует ленту комментариев заявки"""
+        if not comments:
+            return "Комментариев пока нет\n"
+
+        content_width = self._content_width
+        lines = []
+        for comment in comments:
+            lines.append(f"{comment.author_name or 'Неизвестный'}, {format_datetime(comment.created_at)}:")
+            for line in self.wrap_text(comment.body, content_width):
+                lines.append(f"  {line}")
+            lines.append("-" * self.console_width)
+        lines.append('')
+
+        return "\n".join(lines)
+
+    def print_comments(self, comments: List[Comment]):
+        """Печать ленты комментариев заявки"""
+        self._write(self.render_comments(comments))
+
+    # Подписи полей в истории изменений
+    HISTORY_FIELDS = {
+        'status': 'Статус',
+        'assigned_to': 'Исполнитель',
+        'priority': 'Приоритет',
+    }
+
+    def format_history_value(self, field: str, value) -> str:
+        """Значение поля в истории изменений"""
+        if value is None:
+            return '-'
+        if field == 'status':
+            return self.format_status(value)
+        if field == 'assigned_to':
+            return f"#{value}"
+        if field == 'priority':
+            return self.format_priority(value)
+        return str(value)
+
+    def render_history(self, history: List[TicketHistoryEntry]) -> str:
+        """Формирует хронологию изменений заявки"""
+        if not history:
+            return "Изменений пока нет\n"
+
+        lines = []
+        for entry in history:
+            field = self.HISTORY_FIELDS.get(entry.field, entry.field)
+            old_value = self.format_history_value(entry.field, entry.old_value)
+            new_value = self.format_history_value(entry.field, entry.new_value)
+            # Изменения без автора (actor_id NULL) вносит система, например эскалация SLA
+            actor = entry.actor_name or ('Система' if entry.actor_id is None else 'Неизвестный')
+            lines.append(f"{format_datetime(entry.ts)}  {actor}: "
+                         f"{field}: {old_value} -> {new_value}")
+        lines.append('')
+
+        return "\n".join(lines)
+
+    def print_history(self, history: List[TicketHistoryEntry]):
+        """Печать хронологии изменений заявки"""
+        self._write(self.render_history(history))
+
+    def render_attachments(self, attachments: List[Attachment]) -> str:
+        """Формирует список вложений заявки"""
+        if not attachments:
+            return "Вложений нет\n"
+
+        lines = []
+        for attachment in attachments:
+            lines.append(f"#{attachment.id}  {attachment.file_name}  ({format_size(attachment.size)})  "
+                         f"{format_datetime(attachment.created_at)}  {attachment.uploaded_by_name or 'Неизвестный'}")
+        lines.append('')
+
+        return "\n".join(lines)
+
+    def print_attachments(self, attachments: List[Attachment]):
+        """Печать списка вложений заявки"""
+        self._write(self.render_attachments(attachments))
 
     def truncate_text(self, text: str, max_length: int) -> str:
         """Обрезает текст до максимальной длины"""
@@ -85,62 +226,64 @@ class DisplayManager:
             return text
         return text[:max_length - 2] + ".."
 
-    def print_tickets_table(self, tickets: List[TicketWithRelations]):
-        """Печать таблицы заявок"""
-        if not tickets:
-            print("Нет заявок для отображения")
+    def format_ticket_row(self, ticket: TicketWithRelations) -> str:
+        """Форматирует одну строку таблицы заявок"""
+        return self._row_format.format(
+            ticket.id,
+            self.truncate_text(ticket.title, self._title_limit),
+            self.format_status(ticket.status),
+            self.format_priority(ticket.priority),
+            self.truncate_text(ticket.created_by_name or "", self._author_limit),
+            ticket.comment_count,
+            format_short_datetime(ticket.last_reply_at)
+        )
+
+    def iter_tickets_table(self, tickets: Iterable[TicketWithRelations]) -> Iterator[str]:
+        """Построчная генерация таблицы заявок (подходит для потоковой выдачи)"""
+        iterator = iter(tickets)
+        first = next(iterator, None)
+        if first is None:
+            yield "Нет заявок для отображения"
             return
 
-        widths = Config.COLUMN_WIDTHS
+        yield self._table_top
+        yield self._table_header
+        yield self._table_middle
+
+        yield self.format_ticket_row(first)
+        for ticket in iterator:
+            yield self.format_ticket_row(ticket)
 
-        # Верхняя граница
-        print(
-            "┌" + "─" * widths['id'] + "┬" + "─" * widths['title'] + "┬" + "─" * widths['status'] + "┬" + "─" * widths[
-                'priority'] + "┬" + "─" * widths['author'] + "┐")
-
-        # Заголовки
-        headers = ['ID', 'ЗАГОЛОВОК', 'СТАТУС', 'ПРИОР.', 'АВТОР']
-        print(
-            f"│ {headers[0]:^{widths['id'] - 2}} │ {headers[1]:^{widths['title'] - 2}} │ {headers[2]:^{widths['status'] - 2}} │ {headers[3]:^{widths['priority'] - 2}} │ {headers[4]:^{widths['author'] - 2}} │")
-
-        # Разделитель
-        print(
-            "├" + "─" * widths['id'] + "┼" + "─" * widths['title'] + "┼" + "─" * widths['status'] + "┼" + "─" * widths[
-                'priority'] + "┼" + "─" * widths['author'] + "┤")
-
-        # Данные
-        for ticket in tickets:
-            # Форматируем данные с обрезанием
-            id_str = str(ticket.id)
-            title_str = self.truncate_text(ticket.title, widths['title'] - 2)
-            status_str = self.format_status(ticket.status)
-            priority_str = self.format_priority(ticket.priority)
-            author_str = self.truncate_text(ticket.created_by_name or "", widths['author'] - 2)
-
-            # Выводим строку с фиксированными ширинами
-            print(
-                f"│ {id_str:^{widths['id'] - 2}} │ {title_str:<{widths['title'] - 2}} │ {status_str:^{widths['status'] - 2}} │ {priority_str:^{widths['priority'] - 2}} │ {author_str:<{widths['author'] - 2}} │")
-
-        # Нижняя граница
-        print(
-            "└" + "─" * widths['id'] + "┴" + "─" * widths['title'] + "┴" + "─" * widths['status'] + "┴" + "─" * widths[
-                'priority'] + "┴" + "─" * widths['author'] + "┘")
+        yield self._table_bottom
+
+    def iter_table_chunks(self, tickets: Iterable[TicketWithRelations],
+                          chunk_rows: int = Config.RENDER_CHUNK_ROWS) -> Iterator[str]:
+        """Генерация таблицы крупными блоками текста по chunk_rows строк"""
+        buffer = []
+        for line in self.iter_tickets_table(tickets):
+            buffer.append(line)
+            if len(buffer) >= chunk_rows:
+                buffer.append('')
+                yield "\n".join(buffer)
+                buffer = []
+
+        if buffer:
+            buffer.append('')
+            yield "\n".join(buffer)
+
+    def render_tickets_table(self, tickets: Iterable[TicketWithRelations]) -> str:
+        """Формирует таблицу заявок целиком в виде строки"""
+        return "".join(self.iter_table_chunks(tickets))
+
+    def print_tickets_table(self, tickets: Iterable[TicketWithRelations]):
+        """Печать таблицы заявок"""
+        for chunk in self.iter_table_chunks(tickets):
+            self._write(chunk)
 
     def format_status(self, status: str) -> str:
         """Форматирование статуса для таблицы"""
-        status_map = {
-            'open': 'ОТКР',
-            'in_progress': 'РАБОТА',
-            'closed': 'ЗАКР',
-            'resolved': 'РЕШЕНА'
-        }
-        return status_map.get(status, status.upper()[:6])
+        return self.STATUS_MAP.get(status) or status.upper()[:6]
 
     def format_priority(self, priority: str) -> str:
         """Форматирование приоритета для таблицы"""
-        priority_map = {
-            'high': 'ВЫС',
-            'medium': 'СРЕД',
-            'low': 'НИЗ'
-        }
-        return priority_map.get(priority, priority.upper()[:4])
\ No newline at end of file
+        return self.PRIORITY_MAP.get(priority) or priority.upper()[:4]
@@ -1,15 +1,128 @@
 # Вспомогательные функции
 import datetime
-from typing import Any
+import functools
+from typing import Any, List, Optional
 
-def format_datetime(dt_string: str) -> str:
+MICROSECONDS_PER_SECOND = 1_000_000
+MICROSECONDS_PER_MINUTE = 60 * MICROSECONDS_PER_SECOND
+MICROSECONDS_PER_DAY = 86400 * MICROSECONDS_PER_SECOND
+
+
+def now_timestamp() -> int:
+    """Текущее время в микросекундах от начала эпохи"""
+    return to_timestamp(datetime.datetime.now())
+
+
+def to_timestamp(dt: datetime.datetime) -> int:
+    """Преобразование datetime в микросекунды от начала эпохи"""
+    seconds = int(dt.replace(microsecond=0).timestamp())
+    return seconds * MICROSECONDS_PER_SECOND + dt.microsecond
+
+
+def from_timestamp(value: int) -> datetime.datetime:
+    """Преобразование микросекунд от начала эпохи в локальный datetime"""
+    seconds, microseconds = divmod(value, MICROSECONDS_PER_SECOND)
+    return datetime.datetime.fromtimestamp(seconds).replace(microsecond=microseconds)
+
+
+def iso_to_timestamp(value: Optional[str]) -> Optional[int]:
+    """Преобразование строки ISO 8601 в микросекунды от начала эпохи"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    return to_timestamp(datetime.datetime.fromisoformat(value))
+
+
+def timestamp_bound(value: Any, upper: bool = False) -> int:
+    """Граница диапазона дат в микросекундах: datetime, date, ISO-строка или число.
+
+    Дата без времени дает начало дня для нижней границы и конец дня - для верхней.
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime.datetime):
+        return to_timestamp(value)
+    if isinstance(value, datetime.date):
+        return to_timestamp(datetime.datetime.combine(value, datetime.time.max if upper else datetime.time.min))
+    return iso_to_timestamp(value)
+
+
+def timestamp_to_iso(value: Optional[int]) -> Optional[str]:
+    """Преобразование микросекунд от начала эпохи в строку ISO 8601"""
+    if value is None or isinstance(value, str):
+        return value
+    return from_timestamp(value).isoformat()
+
+
+@functools.lru_cache(maxsize=65536)
+def _format_minute(minute: int) -> str:
+    """Форматирование минуты от начала эпохи (результат кешируется)"""
+    return datetime.datetime.fromtimestamp(minute * 60).strftime("%d.%m.%Y %H:%M")
+
+
+@functools.lru_cache(maxsize=65536)
+def _format_minute_short(minute: int) -> str:
+    """Краткое форматирование минуты от начала эпохи (результат кешируется)"""
+    return datetime.datetime.fromtimestamp(minute * 60).strftime("%d.%m %H:%M")
+
+
+def format_short_datetime(value: Optional[int]) -> str:
+    """Краткое форматирование даты и времени для таблиц"""
+    if value is None:
+        return ''
+    return _format_minute_short(value // MICROSECONDS_PER_MINUTE)
+
+
+def format_datetime(value) -> str:
     """Форматирование даты и времени"""
+    if isinstance(value, int):
+        # Формат выводит точность до минуты, поэтому кешируем по минутам
+        return _format_minute(value // MICROSECONDS_PER_MINUTE)
     try:
-        dt = datetime.datetime.fromisoformat(dt_string)
+        dt = datetime.datetime.fromisoformat(value)
         return dt.strftime("%d.%m.%Y %H:%M")
     except:
-        return dt_string
+        return value
+
+def format_duration(seconds: float) -> str:
+    """Форматирование длительности в секундах: 2д 3ч, 5ч 10м, 45м"""
+    minutes = int(seconds) // 60
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}д {hours}ч"
+    if hours:
+        return f"{hours}ч {minutes}м"
+    return f"{minutes}м"
+
+
+def format_size(size: int) -> str:
+    """Форматирование размера в байтах: 512 Б, 1.5 КБ, 20.0 МБ"""
+    value = float(size)
+    for unit in ('Б', 'КБ', 'МБ'):
+        if value < 1024 or unit == 'МБ':
+            return f"{int(value)} {unit}" if unit == 'Б' else f"{value:.1f} {unit}"
+        value /= 1024
+
 
 def safe_get(dictionary: dict, key: str, default: Any = None) -> Any:
     """Безопасное получение значения из словаря"""
-    return dictionary.get(key, default)
\ No newline at end of file
+    return dictionary.get(key, default)
+
+
+def parse_id_list(text: str) -> List[int]:
+    """Разбор списка ID вида "1, 2, 5-10" (порядок сохраняется, дубликаты удаляются)"""
+    ids = []
+    for part in text.replace(' ', '').split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            start, end = int(start), int(end)
+            if start > end:
+                start, end = end, start
+            ids.extend(range(start, end + 1))
+        else:
+            ids.append(int(part))
+    return list(dict.fromkeys(ids))
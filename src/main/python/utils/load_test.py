@@ -0,0 +1,285 @@
+# Нагрузочный тест: несколько процессов-пользователей и саппортов на одной базе
+# Запуск из src/main/python: python -m utils.load_test --users 8 --agents 2 --duration 10
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
+
+from database.connection import DatabaseConnection
+from core.auth import AuthManager
+from core.ticket_system import TicketSystem
+
+# Операции, доступные ролям
+USER_OPERATIONS = ('add', 'list', 'get')
+AGENT_OPERATIONS = ('list', 'get', 'status', 'assign', 'export')
+
+DEFAULT_MIX = "add=30,list=15,get=35,status=10,assign=7,export=3"
+STATUSES = ('open', 'in_progress', 'resolved', 'closed')
+
+
+class BusyRetryConnection(sqlite3.Connection):
+    """Соединение, которое ждет освобождения блокировки само и считает время ожидания.
+
+    Повторяет запрос при "database is locked" с нарастающей паузой до busy_timeout,
+    как стандартный обработчик SQLite, но время ожидания видно тесту.
+    """
+    busy_timeout = 5.0
+    stats = {'lock_wait': 0.0, 'lock_waits': 0}
+
+    def _retry(self, func, *args):
+        deadline = None
+        delay = 0.001
+        while True:
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                now = time.perf_counter()
+                if deadline is None:
+                    deadline = now + self.busy_timeout
+                    self.stats['lock_waits'] += 1
+                if now >= deadline:
+                    raise
+                time.sleep(delay)
+                self.stats['lock_wait'] += time.perf_counter() - now
+                delay = min(delay * 2, 0.05)
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or BusyRetryCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def commit(self):
+        return self._retry(super().commit)
+
+
+class BusyRetryCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return self.connection._retry(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.connection._retry(super().executemany, sql, list(seq_of_parameters))
+
+
+class InstrumentedConnection(DatabaseConnection):
+    """DatabaseConnection, выдающий соединения с учетом ожидания блокировок"""
+
+    def get_connection(self):
+        return sqlite3.connect(self.db_path, timeout=0, factory=BusyRetryConnection)
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """Разбор смеси операций вида "add=30,list=20" """
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in USER_OPERATIONS + AGENT_OPERATIONS:
+            raise ValueError(f"Неизвестная операция: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+def prepare_database(db_path: str, users: int, agents: int, tickets: int) -> List[tuple]:
+    """Создание базы, учетных записей для теста и начальных заявок"""
+    db = DatabaseConnection(db_path)
+    db.init_database()
+    auth = AuthManager(db)
+
+    accounts = []
+    for role, count in (('user', users), ('support', agents)):
+        for i in range(count):
+            username = f"load_{role}_{i}"
+            auth.register_user(username, "load", f"Нагрузка {role} {i}", role)
+            accounts.append((role, username))
+
+    auth.login("load_user_0" if users else "load_support_0", "load")
+    ticket_system = TicketSystem(db, auth)
+    for i in range(tickets):
+        ticket_system.add_ticket(f"Начальная заявка {i}", "Описание", random.choice(('high', 'medium', 'low')))
+
+    return accounts
+
+
+def run_actor(role: str, username: str, db_path: str, output_dir: str, mix: Dict[str, int],
+              duration: float, busy_timeout: float, seed: int, start_event, results):
+    """Процесс одного участника: выполняет операции из смеси до истечения времени"""
+    BusyRetryConnection.busy_timeout = busy_timeout
+    db = InstrumentedConnection(db_path)
+    auth = AuthManager(db)
+    auth.login(username, "load")
+    ticket_system = TicketSystem(db, auth)
+
+    exporter = None
+    rng = random.Random(seed)
+    allowed = USER_OPERATIONS if role == 'user' else AGENT_OPERATIONS
+    operations = [name for name in mix if name in allowed and mix[name] > 0]
+    weights = [mix[name] for name in operations]
+
+    conn = sqlite3.connect(db_path, timeout=busy_timeout)
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 1) FROM tickets").fetchone()[0]
+    conn.close()
+
+    latencies = {name: [] for name in operations}
+    errors = {name: {} for name in operations}
+
+    start_event.wait()
+    deadline = time.perf_counter() + duration
+    while operations and time.perf_counter() < deadline:
+        name = rng.choices(operations, weights)[0]
+        ticket_id = rng.randint(1, max_id)
+        started = time.perf_counter()
+        try:
+            if name == 'add':
+                max_id = max(max_id, ticket_system.add_ticket(f"Нагрузка {rng.random()}", "Описание",
+                                                              rng.choice(('high', 'medium', 'low'))))
+            elif name == 'list':
+                ticket_system.get_all_tickets()
+            elif name == 'get':
+                ticket_system.get_ticket(ticket_id)
+            elif name == 'status':
+                ticket_system.update_ticket_status(ticket_id, rng.choice(STATUSES))
+            elif name == 'assign':
+                ticket_system.assign_ticket(ticket_id, auth.current_user.id)
+            elif name == 'export':
+                from export.exporter import DataExporter
+                from export.query import ExportQuery
+                if exporter is None:
+                    exporter = DataExporter(db, verbose=False)
+                    exporter.output_dir = output_dir
+                exporter.export_table_data('tickets', ExportQuery('tickets', order_by=['-id'], limit=200),
+                                           file_name=f"load_{os.getpid()}")
+            latencies[name].append(time.perf_counter() - started)
+        except Exception as e:
+            kind = 'locked' if 'locked' in str(e) or 'busy' in str(e) else type(e).__name__
+            errors[name][kind] = errors[name].get(kind, 0) + 1
+
+    results.put({
+        'role': role,
+        'latencies': latencies,
+        'errors': errors,
+        'lock_wait': BusyRetryConnection.stats['lock_wait'],
+        'lock_waits': BusyRetryConnection.stats['lock_waits']
+    })
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(share / 100 * len(values))) - 1))
+    return values[index]
+
+
+def summarize(reports: List[dict], duration: float) -> dict:
+    """Сводка по всем процессам"""
+    latencies = {}
+    errors = {}
+    for report in reports:
+        for name, values in report['latencies'].items():
+            latencies.setdefault(name, []).extend(values)
+        for name, kinds in report['errors'].items():
+            for kind, count in kinds.items():
+                errors.setdefault(name, {}).setdefault(kind, 0)
+                errors[name][kind] += count
+
+    operations = {}
+    for name in sorted(set(latencies) | set(errors)):
+        values = sorted(latencies.get(name, []))
+        failed = sum(errors.get(name, {}).values())
+        total = len(values) + failed
+        operations[name] = {
+            'ok': len(values),
+            'errors': errors.get(name, {}),
+            'error_rate': failed / total if total else 0.0,
+            'throughput': len(values) / duration,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000
+        }
+
+    ok = sum(item['ok'] for item in operations.values())
+    failed = sum(sum(item['errors'].values()) for item in operations.values())
+    return {
+        'duration': duration,
+        'processes': len(reports),
+        'throughput': ok / duration,
+        'error_rate': failed / (ok + failed) if ok + failed else 0.0,
+        'lock_wait_seconds': sum(report['lock_wait'] for report in reports),
+        'lock_waits': sum(report['lock_waits'] for report in reports),
+        'operations': operations
+    }
+
+
+def print_summary(summary: dict):
+    """Печать сводки в виде таблицы"""
+    print(f"Процессов: {summary['processes']}, длительность: {summary['duration']:.1f} с")
+    print(f"{'Операция':<10}{'Успешно':>9}{'Ошибок':>8}{'Оп/с':>9}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}")
+    for name, item in summary['operations'].items():
+        print(f"{name:<10}{item['ok']:>9}{sum(item['errors'].values()):>8}{item['throughput']:>9.1f}"
+              f"{item['p50_ms']:>9.1f}{item['p95_ms']:>9.1f}{item['p99_ms']:>9.1f}")
+    print(f"Всего: {summary['throughput']:.1f} оп/с, ошибок: {summary['error_rate']:.2%}")
+    print(f"Ожидание блокировок: {summary['lock_wait_seconds']:.2f} с суммарно, "
+          f"{summary['lock_waits']} ожиданий")
+    for name, item in summary['operations'].items():
+        for kind, count in item['errors'].items():
+            print(f"  {name}: {kind} x{count}")
+
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Нагрузочный тест базы заявок")
+    parser.add_argument('--users', type=int, default=4, help="число процессов-пользователей")
+    parser.add_argument('--agents', type=int, default=2, help="число процессов-саппортов")
+    parser.add_argument('--duration', type=float, default=10.0, help="длительность, секунд")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="веса операций, например add=30,list=20")
+    parser.add_argument('--db', help="файл базы (по умолчанию - временная база)")
+    parser.add_argument('--tickets', type=int, default=200, help="начальное число заявок")
+    parser.add_argument('--busy-timeout', type=float, default=5.0, help="ожидание блокировки, секунд")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="вывести сводку в JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = args.db or os.path.join(workdir, "load_test.db")
+        random.seed(args.seed)
+        accounts = prepare_database(db_path, args.users, args.agents, args.tickets)
+
+        start_event = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=run_actor, args=(
+                role, username, db_path, workdir, mix, args.duration, args.busy_timeout,
+                args.seed + i, start_event, results))
+            for i, (role, username) in enumerate(accounts)
+        ]
+        for process in processes:
+            process.start()
+
+        start_event.set()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    summary = summarize(reports, args.duration)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
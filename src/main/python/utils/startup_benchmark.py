@@ -0,0 +1,73 @@
+# Замер времени импорта и запуска приложения (холодный и теплый старт)
+# Запуск из src/main/python: python -m utils.startup_benchmark [повторы]
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import ui.console_ui
+elapsed = time.perf_counter() - start
+heavy = [name for name in ('yaml', 'csv', 'xml.dom.minidom', 'xml.etree.ElementTree') if name in sys.modules]
+print(elapsed, ','.join(heavy))
+'''
+
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+from ui.console_ui import ConsoleUI
+ConsoleUI()
+print(time.perf_counter() - start, '')
+'''
+
+
+def run_script(script: str, cwd: str):
+    """Запуск замера в отдельном процессе, возвращает (секунды, загруженные тяжелые модули)"""
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+    result = subprocess.run([sys.executable, '-c', script], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    elapsed, _, heavy = result.stdout.strip().splitlines()[-1].partition(' ')
+    return float(elapsed), heavy.strip()
+
+
+def measure(script: str, repeats: int, fresh_database: bool):
+    """Медиана времени по нескольким запускам"""
+    timings = []
+    heavy_modules = set()
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(repeats):
+            if fresh_database:
+                for name in os.listdir(workdir):
+                    os.remove(os.path.join(workdir, name))
+            elapsed, heavy = run_script(script, workdir)
+            timings.append(elapsed)
+            if heavy:
+                heavy_modules.update(heavy.split(','))
+    return statistics.median(timings), heavy_modules
+
+
+def main():
+    """Основная функция"""
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    import_time, heavy_modules = measure(IMPORT_SCRIPT, repeats, fresh_database=False)
+    cold_time, _ = measure(STARTUP_SCRIPT, repeats, fresh_database=True)
+
+    # Для теплого старта первый запуск создает базу, остальные ее переиспользуют
+    warm_time, _ = measure(STARTUP_SCRIPT, repeats + 1, fresh_database=False)
+
+    print(f"Импорт ui.console_ui:       {import_time * 1000:8.1f} мс")
+    print(f"Холодный старт (новая база): {cold_time * 1000:8.1f} мс")
+    print(f"Теплый старт:               {warm_time * 1000:8.1f} мс")
+    if heavy_modules:
+        print(f"Внимание: при запуске загружены модули экспорта: {', '.join(sorted(heavy_modules))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()